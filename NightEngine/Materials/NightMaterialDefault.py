@@ -1,7 +1,8 @@
 # NightMaterialDefault.py
 
 from OpenGL.GL import *
-from NightEngine.NightUtils import NightUtils
+from NightEngine.NightProgram import NightProgram
+from NightEngine.NightState import NightState
 
 class NightMaterialDefault:
     def __init__(self,
@@ -10,7 +11,9 @@ class NightMaterialDefault:
                  gl_point_size=2,
                  gl_culling=True,
                  gl_wireframe=False,
-                 lighting=True):
+                 lighting=True,
+                 transparent=False,
+                 instanced=False):
 
         # ------------------------------------------------------------
         # material attributes
@@ -21,6 +24,8 @@ class NightMaterialDefault:
         self.gl_point_size = gl_point_size
         self.gl_culling = gl_culling
         self.gl_wireframe = gl_wireframe
+        self.transparent = transparent
+        self.instanced = instanced
         self.lighting = lighting
 
         self.shininess = 32.0
@@ -35,23 +40,38 @@ class NightMaterialDefault:
         code_shader_vertex = """
         #version 330 core
         
-        uniform mat4 matrix_projection;
-        uniform mat4 matrix_view;
+        layout(std140, row_major) uniform Camera {
+          mat4 matrix_projection;
+          mat4 matrix_view;
+          vec3 view_pos;
+        };
+
         uniform mat4 matrix_model;
         
         in vec3 vertex_position;
         in vec3 vertex_color;
         in vec3 vertex_normal;
         
+        #ifdef INSTANCED
+        in mat4 instance_model;
+        in vec3 instance_color;
+        #endif
+        
         out vec3 normal;
         out vec3 color;
         out vec3 frag_pos;
         
         void main() {
-          normal = mat3(transpose(inverse(matrix_model))) * vertex_normal;
+        #ifdef INSTANCED
+          mat4 model = matrix_model * instance_model;
+          color = vertex_color * instance_color;
+        #else
+          mat4 model = matrix_model;
           color = vertex_color;
-          frag_pos = vec3(matrix_model * vec4(vertex_position, 1.0));
-          gl_Position = matrix_projection * matrix_view * matrix_model * vec4(vertex_position, 1.0);
+        #endif
+          normal = mat3(transpose(inverse(model))) * vertex_normal;
+          frag_pos = vec3(model * vec4(vertex_position, 1.0));
+          gl_Position = matrix_projection * matrix_view * vec4(frag_pos, 1.0);
         }
         """
 
@@ -72,10 +92,18 @@ class NightMaterialDefault:
           vec3 specular;
         };
 
+        layout(std140, row_major) uniform Camera {
+          mat4 matrix_projection;
+          mat4 matrix_view;
+          vec3 view_pos;
+        };
+
+        layout(std140) uniform Light {
+          LightDirectional light_directional;
+        };
+
         uniform bool bool_lighting;
-        uniform vec3 view_pos;
         
-        uniform LightDirectional light_directional;
         uniform Material material;
         
         in vec3 color;
@@ -116,23 +144,18 @@ class NightMaterialDefault:
         
         # ------------ create program ------------ #
 
-        self.program = NightUtils.create_program(code_shader_vertex,
-                                                 code_shader_fragment)
+        defines = {"INSTANCED": 1} if instanced else None
 
-    def update_draw_settings(self):
+        self.program = NightProgram.get(code_shader_vertex,
+                                        code_shader_fragment,
+                                        defines)
 
-        glPointSize(self.gl_point_size)
-        glLineWidth(self.gl_line_width)
-
-        if self.gl_culling:
-            glEnable(GL_CULL_FACE)
-        else:
-            glDisable(GL_CULL_FACE)
+    def update_draw_settings(self):
 
-        if self.gl_wireframe:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
-        else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+        NightState.point_size(self.gl_point_size)
+        NightState.line_width(self.gl_line_width)
+        NightState.set_capability(GL_CULL_FACE, self.gl_culling)
+        NightState.polygon_mode(GL_LINE if self.gl_wireframe else GL_FILL)
 
-        NightUtils.set_uniform(self.program, "bool_lighting", "bool", self.lighting)
+        self.program.set_bool("bool_lighting", self.lighting)
         
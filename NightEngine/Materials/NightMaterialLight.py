@@ -1,7 +1,8 @@
 # NightMaterialLight
 
 from OpenGL.GL import *
-from NightEngine.NightUtils import NightUtils
+from NightEngine.NightProgram import NightProgram
+from NightEngine.NightState import NightState
 
 class NightMaterialLight:
     def __init__(self,
@@ -10,7 +11,8 @@ class NightMaterialLight:
                  gl_point_size=2,
                  gl_culling=True,
                  gl_wireframe=False,
-                 color=[1.0, 1.0, 1.0]):
+                 color=[1.0, 1.0, 1.0],
+                 transparent=False):
 
         # ------------------------------------------------------------
         # material attributes
@@ -21,6 +23,7 @@ class NightMaterialLight:
         self.gl_point_size = gl_point_size
         self.gl_culling = gl_culling
         self.gl_wireframe = gl_wireframe
+        self.transparent = transparent
         self.color = color
 
         # ------------------------------------------------------------
@@ -29,8 +32,11 @@ class NightMaterialLight:
         
         code_shader_vertex = """
         #version 330 core
-        uniform mat4 matrix_projection;
-        uniform mat4 matrix_view;
+        layout(std140, row_major) uniform Camera {
+          mat4 matrix_projection;
+          mat4 matrix_view;
+          vec3 view_pos;
+        };
         uniform mat4 matrix_model;
         in vec3 vertex_position;
         void main() {
@@ -49,23 +55,15 @@ class NightMaterialLight:
 
         # ------------ create program ------------ #
 
-        self.program = NightUtils.create_program(code_shader_vertex,
-                                                 code_shader_fragment)
+        self.program = NightProgram.get(code_shader_vertex,
+                                        code_shader_fragment)
 
     def update_draw_settings(self):
 
-        glPointSize(self.gl_point_size)
-        glLineWidth(self.gl_line_width)
+        NightState.point_size(self.gl_point_size)
+        NightState.line_width(self.gl_line_width)
+        NightState.set_capability(GL_CULL_FACE, self.gl_culling)
+        NightState.polygon_mode(GL_LINE if self.gl_wireframe else GL_FILL)
 
-        if self.gl_culling:
-            glEnable(GL_CULL_FACE)
-        else:
-            glDisable(GL_CULL_FACE)
-
-        if self.gl_wireframe:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
-        else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
-
-        NightUtils.set_uniform(self.program, "light_color", "vec3", self.color)
+        self.program.set_vec3("light_color", self.color)
         
@@ -1,9 +1,9 @@
 # NightMaterialTexture.py
 
 from OpenGL.GL import *
-from NightEngine.NightUtils import NightUtils
-import numpy as np
-from PIL import Image
+from NightEngine.NightProgram import NightProgram
+from NightEngine.NightState import NightState
+from NightEngine.Materials.NightTextureManager import NightTextureManager
 
 class NightMaterialTexture:
     def __init__(self,
@@ -17,28 +17,25 @@ class NightMaterialTexture:
                  gl_wrap_t=GL_REPEAT,
                  gl_min_filter=GL_LINEAR,
                  gl_mag_filter=GL_LINEAR,
-                 lighting=True):
+                 lighting=True,
+                 transparent=False,
+                 instanced=False):
 
         # ------------------------------------------------------------
         # initialize texture
         # ------------------------------------------------------------
 
-        self.surface = Image.open(filename).convert("RGBA") if filename else None
+        # textures are shared by path and parameters, and decoded in
+        # the background. a placeholder is drawn until then.
 
-        self.gl_texture = glGenTextures(1)
+        self.texture = None
 
-        if self.surface:
-            width, height = self.surface.size
-            pixel_data = np.array(self.surface)
-            glBindTexture(GL_TEXTURE_2D, self.gl_texture)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height,
-                         0, GL_RGBA, GL_UNSIGNED_BYTE, pixel_data.tobytes())
-            glGenerateMipmap(GL_TEXTURE_2D)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, gl_mag_filter)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, gl_min_filter)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, gl_wrap_s)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, gl_wrap_t)
-            glTexParameterfv(GL_TEXTURE_2D, GL_TEXTURE_BORDER_COLOR, [1, 1, 1, 1])
+        if filename:
+            self.texture = NightTextureManager.get(filename,
+                                                   gl_wrap_s,
+                                                   gl_wrap_t,
+                                                   gl_min_filter,
+                                                   gl_mag_filter)
 
         # ------------------------------------------------------------
         # material attributes
@@ -49,6 +46,8 @@ class NightMaterialTexture:
         self.gl_point_size = gl_point_size
         self.gl_culling = gl_culling
         self.gl_wireframe = gl_wireframe
+        self.transparent = transparent
+        self.instanced = instanced
         self.lighting = lighting
 
         self.shininess = 32.0
@@ -63,8 +62,12 @@ class NightMaterialTexture:
         code_shader_vertex = """
         #version 330 core
         
-        uniform mat4 matrix_projection;
-        uniform mat4 matrix_view;
+        layout(std140, row_major) uniform Camera {
+          mat4 matrix_projection;
+          mat4 matrix_view;
+          vec3 view_pos;
+        };
+
         uniform mat4 matrix_model;
         
         in vec3 vertex_position;
@@ -75,17 +78,28 @@ class NightMaterialTexture:
         uniform vec2 uv_repeat;
         uniform vec2 uv_offset;
         
+        #ifdef INSTANCED
+        in mat4 instance_model;
+        in vec3 instance_color;
+        #endif
+        
         out vec3 normal;
         out vec3 color;
         out vec3 frag_pos;
         out vec2 uv;
         
         void main() {
-          normal = mat3(transpose(inverse(matrix_model))) * vertex_normal;
+        #ifdef INSTANCED
+          mat4 model = matrix_model * instance_model;
+          color = vertex_color * instance_color;
+        #else
+          mat4 model = matrix_model;
           color = vertex_color;
-          frag_pos = vec3(matrix_model * vec4(vertex_position, 1.0));
+        #endif
+          normal = mat3(transpose(inverse(model))) * vertex_normal;
+          frag_pos = vec3(model * vec4(vertex_position, 1.0));
           uv = vertex_uv * uv_repeat + uv_offset;
-          gl_Position = matrix_projection * matrix_view * matrix_model * vec4(vertex_position, 1.0);
+          gl_Position = matrix_projection * matrix_view * vec4(frag_pos, 1.0);
         }
         """
 
@@ -106,11 +120,19 @@ class NightMaterialTexture:
           vec3 specular;
         };
 
+        layout(std140, row_major) uniform Camera {
+          mat4 matrix_projection;
+          mat4 matrix_view;
+          vec3 view_pos;
+        };
+
+        layout(std140) uniform Light {
+          LightDirectional light_directional;
+        };
+
         uniform bool bool_lighting;
-        uniform vec3 view_pos;
         uniform sampler2D texture;
         
-        uniform LightDirectional light_directional;
         uniform Material material;
         
         in vec3 color;
@@ -152,23 +174,24 @@ class NightMaterialTexture:
         
         # ------------ create program ------------ #
 
-        self.program = NightUtils.create_program(code_shader_vertex,
-                                                 code_shader_fragment)
+        defines = {"INSTANCED": 1} if instanced else None
 
-    def update_draw_settings(self):
+        self.program = NightProgram.get(code_shader_vertex,
+                                        code_shader_fragment,
+                                        defines)
 
-        glPointSize(self.gl_point_size)
-        glLineWidth(self.gl_line_width)
+    @property
+    def gl_texture(self):
+        if self.texture:
+            return self.texture.gl_texture
+        return NightTextureManager.get_placeholder()
 
-        if self.gl_culling:
-            glEnable(GL_CULL_FACE)
-        else:
-            glDisable(GL_CULL_FACE)
+    def update_draw_settings(self):
 
-        if self.gl_wireframe:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
-        else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+        NightState.point_size(self.gl_point_size)
+        NightState.line_width(self.gl_line_width)
+        NightState.set_capability(GL_CULL_FACE, self.gl_culling)
+        NightState.polygon_mode(GL_LINE if self.gl_wireframe else GL_FILL)
 
-        NightUtils.set_uniform(self.program, "bool_lighting", "bool", self.lighting)
+        self.program.set_bool("bool_lighting", self.lighting)
         
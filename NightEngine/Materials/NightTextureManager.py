@@ -0,0 +1,142 @@
+# NightTextureManager.py
+
+from NightEngine.NightState import NightState
+from concurrent.futures import ThreadPoolExecutor
+from OpenGL.GL import *
+from PIL import Image
+import numpy as np
+import os
+
+class NightTexture:
+    def __init__(self, filename, parameters):
+
+        """handle to a cached texture. gl_texture is the shared
+        placeholder until the decoded image has been uploaded."""
+
+        self.filename = filename
+        self.parameters = parameters
+        self._gl_texture = None
+        self.loaded = False
+
+    @property
+    def gl_texture(self):
+        # the placeholder is created on first use, not with the handle,
+        # so materials can be created without a gl context
+        if self._gl_texture is None:
+            return NightTextureManager.get_placeholder()
+        return self._gl_texture
+
+class NightTextureManager:
+
+    """caches gl textures by path and sampling parameters. images are
+    decoded on a thread pool and uploaded on the gl thread by
+    process_uploads, which the engine calls every frame."""
+
+    max_workers = 4
+
+    _textures = {}
+    _pending = [] # (texture, future)
+    _executor = None
+    _placeholder = None
+
+    @staticmethod
+    def get(filename,
+            gl_wrap_s=GL_REPEAT,
+            gl_wrap_t=GL_REPEAT,
+            gl_min_filter=GL_LINEAR,
+            gl_mag_filter=GL_LINEAR):
+        """returns the texture for filename and parameters, starting a
+        background decode on first request. raises if the file does
+        not exist."""
+
+        parameters = (gl_wrap_s, gl_wrap_t, gl_min_filter, gl_mag_filter)
+        key = (os.path.abspath(filename), parameters)
+
+        texture = NightTextureManager._textures.get(key)
+        if texture is None:
+            if not os.path.isfile(filename):
+                raise Exception(f"NightTextureManager: image {filename} not found.")
+            texture = NightTexture(filename, parameters)
+            NightTextureManager._textures[key] = texture
+            if NightTextureManager._executor is None:
+                NightTextureManager._executor = ThreadPoolExecutor(max_workers=NightTextureManager.max_workers)
+            future = NightTextureManager._executor.submit(NightTextureManager._decode, filename)
+            NightTextureManager._pending.append((texture, future))
+        return texture
+
+    @staticmethod
+    def get_placeholder():
+        """returns a 1x1 white texture shown while images load."""
+        if NightTextureManager._placeholder is None:
+            placeholder = glGenTextures(1)
+            NightState.bind_texture(0, placeholder)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, 1, 1,
+                         0, GL_RGBA, GL_UNSIGNED_BYTE, bytes([255, 255, 255, 255]))
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+            NightTextureManager._placeholder = placeholder
+        return NightTextureManager._placeholder
+
+    @staticmethod
+    def _decode(filename):
+        """runs on a worker thread. returns the pixels as rgba bytes."""
+        surface = Image.open(filename).convert("RGBA")
+        return np.array(surface)
+
+    @staticmethod
+    def process_uploads(max_uploads=None):
+        """uploads decoded images. must run on the gl thread. returns
+        the number of textures uploaded. raises if an image could not
+        be decoded, after uploading the others."""
+
+        uploaded = 0
+        still_pending = []
+        failed = None
+
+        for texture, future in NightTextureManager._pending:
+            if not future.done() or (max_uploads is not None and uploaded >= max_uploads):
+                still_pending.append((texture, future))
+                continue
+            try:
+                pixel_data = future.result()
+            except Exception as error:
+                # dropped from the cache, so a later request decodes again
+                key = (os.path.abspath(texture.filename), texture.parameters)
+                NightTextureManager._textures.pop(key, None)
+                failed = failed or (texture, error)
+                continue
+            NightTextureManager._upload(texture, pixel_data)
+            uploaded += 1
+
+        NightTextureManager._pending = still_pending
+        if failed is not None:
+            texture, error = failed
+            raise Exception(f"NightTextureManager: could not load image {texture.filename} ({error}).")
+        return uploaded
+
+    @staticmethod
+    def wait():
+        """blocks until every requested texture is uploaded."""
+        for _, future in NightTextureManager._pending:
+            future.exception()
+        NightTextureManager.process_uploads()
+
+    @staticmethod
+    def _upload(texture, pixel_data):
+
+        gl_wrap_s, gl_wrap_t, gl_min_filter, gl_mag_filter = texture.parameters
+        height, width = pixel_data.shape[0:2]
+
+        gl_texture = glGenTextures(1)
+        NightState.bind_texture(0, gl_texture)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height,
+                     0, GL_RGBA, GL_UNSIGNED_BYTE, pixel_data.tobytes())
+        glGenerateMipmap(GL_TEXTURE_2D)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, gl_mag_filter)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, gl_min_filter)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, gl_wrap_s)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, gl_wrap_t)
+        glTexParameterfv(GL_TEXTURE_2D, GL_TEXTURE_BORDER_COLOR, [1, 1, 1, 1])
+
+        texture._gl_texture = gl_texture
+        texture.loaded = True
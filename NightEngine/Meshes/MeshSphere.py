@@ -1,89 +1,60 @@
 # MeshSphere.py
 
-# ------------------------------------------------------------
-# generated with AI!
-# ------------------------------------------------------------
-
 from NightEngine.Meshes.NightMesh import NightMesh
+from NightEngine.Meshes.NightGeometryCache import NightGeometryCache
 import pybullet as p
-import math
+import numpy as np
 
 class MeshSphere(NightMesh):
     def __init__(self, radius=1.0, segments=16, color=[1.0, 1.0, 1.0], collision=True):
         super().__init__()
 
-        positions = []   # List to hold vertex positions
-        colors = []      # List to hold vertex colors
-        normals = []     # List to hold vertex normals
-        uvs = []         # List to hold texture coordinates
-
-        # Generate vertices for triangles
-        for lat in range(segments):  # Latitude: 0 to segments - 1
-            theta0 = math.pi * lat / segments         # Starting latitude angle
-            theta1 = math.pi * (lat + 1) / segments     # Ending latitude angle
-            sin_theta0, cos_theta0 = math.sin(theta0), math.cos(theta0)
-            sin_theta1, cos_theta1 = math.sin(theta1), math.cos(theta1)
+        key = ("sphere", float(radius), int(segments), tuple(color))
 
-            for lon in range(segments):  # Longitude: 0 to segments - 1
-                phi0 = 2 * math.pi * lon / segments         # Starting longitude angle
-                phi1 = 2 * math.pi * (lon + 1) / segments     # Ending longitude angle
-                sin_phi0, cos_phi0 = math.sin(phi0), math.cos(phi0)
-                sin_phi1, cos_phi1 = math.sin(phi1), math.cos(phi1)
+        if not NightGeometryCache.load(key, self):
 
-                # Four corner vertices of the current quad
-                v0 = [radius * sin_theta0 * cos_phi0, radius * cos_theta0, radius * sin_theta0 * sin_phi0]
-                v1 = [radius * sin_theta1 * cos_phi0, radius * cos_theta1, radius * sin_theta1 * sin_phi0]
-                v2 = [radius * sin_theta1 * cos_phi1, radius * cos_theta1, radius * sin_theta1 * sin_phi1]
-                v3 = [radius * sin_theta0 * cos_phi1, radius * cos_theta0, radius * sin_theta0 * sin_phi1]
+            # ------------ vertex grid ------------ #
 
-                # Compute normals by normalizing the vertex positions
-                n0 = [v0[i] / radius for i in range(3)]
-                n1 = [v1[i] / radius for i in range(3)]
-                n2 = [v2[i] / radius for i in range(3)]
-                n3 = [v3[i] / radius for i in range(3)]
+            # (segments + 1)^2 vertices on a latitude/longitude grid.
+            # the seam and the poles are duplicated, as their uvs
+            # differ.
 
-                # Assign colors for the vertices (customize as needed)
-                # c0 = [0.5 + 0.2 * cos_phi0, 0.5 + 0.2 * sin_theta0, 0.5 + 0.2 * cos_theta0]
-                # c1 = [0.5 + 0.2 * cos_phi0, 0.5 + 0.2 * sin_theta1, 0.5 + 0.2 * cos_theta1]
-                # c2 = [0.5 + 0.2 * cos_phi1, 0.5 + 0.2 * sin_theta1, 0.5 + 0.2 * cos_theta1]
-                # c3 = [0.5 + 0.2 * cos_phi1, 0.5 + 0.2 * sin_theta0, 0.5 + 0.2 * cos_theta0]
+            steps = np.arange(segments + 1, dtype=np.float64) / segments
+            lat, lon = np.meshgrid(steps, steps, indexing="ij")
+            theta = np.pi * lat.ravel()
+            phi = 2 * np.pi * lon.ravel()
 
-                c0 = color
-                c1 = color
-                c2 = color
-                c3 = color
+            normals = np.stack([np.sin(theta) * np.cos(phi),
+                                np.cos(theta),
+                                np.sin(theta) * np.sin(phi)], axis=1).astype(np.float32)
+            positions = normals * np.float32(radius)
+            colors = np.tile(np.array(color, dtype=np.float32), (len(positions), 1))
+            uvs = np.stack([lon.ravel(), lat.ravel()], axis=1).astype(np.float32)
 
-                # Calculate UV coordinates
-                uv0 = [lon / segments, lat / segments]
-                uv1 = [lon / segments, (lat + 1) / segments]
-                uv2 = [(lon + 1) / segments, (lat + 1) / segments]
-                uv3 = [(lon + 1) / segments, lat / segments]
+            # ------------- triangles ------------- #
 
-                # First triangle of the quad
-                positions.extend([v0, v2, v1])
-                normals.extend([n0, n2, n1])
-                colors.extend([c0, c2, c1])
-                # colors.extend(color)
-                uvs.extend([uv0, uv2, uv1])
+            # two triangles per quad (v0, v2, v1) and (v0, v3, v2), with
+            # v0 at (lat, lon), v1 at (lat + 1, lon), v2 at
+            # (lat + 1, lon + 1) and v3 at (lat, lon + 1).
 
-                # Second triangle of the quad
-                positions.extend([v0, v3, v2])
-                normals.extend([n0, n3, n2])
-                colors.extend([c0, c3, c2])
-                # colors.extend(color)
-                uvs.extend([uv0, uv3, uv2])
+            row = segments + 1
+            quad_lat, quad_lon = np.meshgrid(np.arange(segments), np.arange(segments), indexing="ij")
+            v0 = (quad_lat * row + quad_lon).ravel()
+            v1 = v0 + row
+            v2 = v1 + 1
+            v3 = v0 + 1
+            indices = np.stack([v0, v2, v1, v0, v3, v2], axis=1)
 
-        # Add attributes to the MeshSphere
-        self.add_attribute("vertex_position", "vec3", positions)
-        self.add_attribute("vertex_color", "vec3", colors)
-        self.add_attribute("vertex_normal", "vec3", normals)  # Add normals
-        self.add_attribute("vertex_uv", "vec2", uvs)        # Add texture coordinates
+            self.add_attribute("vertex_position", "vec3", positions)
+            self.add_attribute("vertex_color", "vec3", colors)
+            self.add_attribute("vertex_normal", "vec3", normals)
+            self.add_attribute("vertex_uv", "vec2", uvs)
+            self.vertex_count = len(positions)
+            self.set_indices(indices)
 
-        # Store the vertex count
-        self.vertex_count = len(positions)
+            NightGeometryCache.store(key, self)
 
         # add collision shape
         if collision:
-            self.set_collision_shape(p.createCollisionShape(p.GEOM_SPHERE,
-                                                            radius=radius))
-        
+            self.create_collision_shape(shapeType=p.GEOM_SPHERE,
+                                        radius=radius)
@@ -0,0 +1,59 @@
+# NightGeometryCache.py
+
+class NightGeometryCache:
+
+    """process wide cache of generated geometry, keyed by generator
+    parameters. meshes loaded from the cache share the same read-only
+    arrays (and content keys for NightMeshCache), so a generator runs
+    once per distinct set of parameters."""
+
+    enabled = True
+
+    _entries = {}
+
+    @staticmethod
+    def load(key, mesh):
+        """fills mesh from the cache. returns False on a miss."""
+        if not NightGeometryCache.enabled:
+            return False
+        entry = NightGeometryCache._entries.get(key)
+        if entry is None:
+            return False
+
+        # the attribute dicts are copied, the arrays are shared
+        mesh.attributes = {name: dict(attribute) for name, attribute in entry["attributes"].items()}
+        mesh.vertex_count = entry["vertex_count"]
+        mesh.indices = entry["indices"]
+        mesh.index_count = entry["index_count"]
+        mesh.bounds_min, mesh.bounds_max, mesh.bounds_center, mesh.bounds_radius = entry["bounds"]
+        mesh._content_keys = entry["content_keys"]
+        return True
+
+    @staticmethod
+    def store(key, mesh):
+        """stores the geometry of a freshly generated mesh. its arrays
+        become read-only."""
+        if not NightGeometryCache.enabled:
+            return
+
+        for attribute in mesh.attributes.values():
+            attribute["data"].flags.writeable = False
+        if mesh.indices is not None:
+            mesh.indices.flags.writeable = False
+
+        NightGeometryCache._entries[key] = {
+            "attributes": {name: dict(attribute) for name, attribute in mesh.attributes.items()},
+            "vertex_count": mesh.vertex_count,
+            "indices": mesh.indices,
+            "index_count": mesh.index_count,
+            "bounds": (mesh.bounds_min, mesh.bounds_max, mesh.bounds_center, mesh.bounds_radius),
+            "content_keys": mesh._content_keys,
+        }
+
+    @staticmethod
+    def clear():
+        NightGeometryCache._entries.clear()
+
+    @staticmethod
+    def get_stats():
+        return {"entries": len(NightGeometryCache._entries)}
@@ -1,13 +1,126 @@
 # NightMesh.py
 
+from NightEngine.Meshes.NightVertexLayout import NightVertexLayout
+from NightEngine.NightWorld import NightWorld
+import numpy as np
+
 class NightMesh:
     def __init__(self):
         self.attributes = {}
         self.vertex_count = 0
-        self.collision_shape = None # pybullet collision shape
+        self.indices = None # optional index buffer data
+        self.index_count = 0
+        self.interleaved = True # pack attributes into one buffer
+        self.vertex_alignment = 4 # stride alignment in bytes
+        self._collision_shape = None # shape id in the default world
+        self.collision_shape_args = None # createCollisionShape arguments
+
+        # bounding volumes in mesh space, set with vertex_position
+        self.bounds_min = None
+        self.bounds_max = None
+        self.bounds_center = None
+        self.bounds_radius = None
+
+        # layout key -> content key, filled by NightMeshCache. replaced
+        # (not cleared) on change, as meshes with identical geometry
+        # may share it.
+        self._content_keys = {}
 
     def add_attribute(self, variable_name:str, data_type:str, data:list):
         self.attributes[variable_name] = {"data_type": data_type, "data": data}
+        self._content_keys = {}
+        if variable_name == "vertex_position":
+            self._compute_bounds(data)
+
+    def _compute_bounds(self, positions):
+        """computes the aabb and a bounding sphere centered on it."""
+        positions = np.array(positions, dtype=np.float32).reshape(-1, 3)
+        if len(positions) == 0:
+            return
+        self.bounds_min = positions.min(axis=0)
+        self.bounds_max = positions.max(axis=0)
+        self.bounds_center = (self.bounds_min + self.bounds_max) / 2
+        self.bounds_radius = float(np.sqrt(np.max(np.sum((positions - self.bounds_center)**2, axis=1))))
+
+    def set_indices(self, indices):
+        """sets the index buffer data. the mesh is then drawn with
+        glDrawElements."""
+        self.indices = np.array(indices, dtype=np.uint32).ravel()
+        self.index_count = len(self.indices)
+        self._content_keys = {}
+
+    def weld(self):
+        """merges vertices whose attributes are all identical and
+        replaces the vertex list with an index buffer. vertices keep
+        the order of their first occurrence."""
+
+        if not self.attributes:
+            return
+
+        # ---------- one row per vertex ---------- #
+
+        names = list(self.attributes.keys())
+        columns = [np.array(self.attributes[name]["data"], dtype=np.float32).reshape(self.vertex_count, -1)
+                   for name in names]
+        vertices = np.hstack(columns)
+
+        # ----------- find duplicates ----------- #
+
+        _, first, inverse = np.unique(vertices, axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+
+        # renumber unique vertices by first occurrence
+        order = np.argsort(first)
+        remap = np.empty_like(order)
+        remap[order] = np.arange(len(order))
+        kept = first[order]
+
+        indices = remap[inverse]
+        if self.indices is not None:
+            indices = indices[self.indices]
+
+        # ---------- replace attributes ---------- #
+
+        for name, column in zip(names, columns):
+            self.attributes[name]["data"] = column[kept]
+
+        self.vertex_count = len(kept)
+        self.set_indices(indices)
+
+    def get_vertex_layout(self, variable_names=None):
+        """returns the interleaved layout for the given attributes (all
+        attributes if None), in the order they were added."""
+        return NightVertexLayout([(name, attribute["data_type"])
+                                  for name, attribute in self.attributes.items()
+                                  if variable_names is None or name in variable_names],
+                                 self.vertex_alignment)
+
+    def get_interleaved(self, layout:NightVertexLayout):
+        """returns the vertex data packed according to layout, as a
+        float32 array of one row per vertex."""
+        data = np.zeros((self.vertex_count, layout.stride // 4), dtype=np.float32)
+        for variable_name, data_type, offset in layout.attributes:
+            components = NightVertexLayout.COMPONENTS[data_type]
+            column = offset // 4
+            data[:, column:column + components] = np.array(self.attributes[variable_name]["data"],
+                                                           dtype=np.float32).reshape(self.vertex_count, components)
+        return data
+
+    @property
+    def collision_shape(self):
+        """the collision shape id in the default world. use
+        NightWorld.get_collision_shape for other worlds."""
+        if self._collision_shape is None and self.collision_shape_args is not None:
+            self._collision_shape = NightWorld.get_default().get_collision_shape(self)
+        return self._collision_shape
 
     def set_collision_shape(self, collision_shape):
-        self.collision_shape = collision_shape
+        """sets a shape id created in the default world."""
+        self._collision_shape = collision_shape
+        self.collision_shape_args = None
+
+    def create_collision_shape(self, **kwargs):
+        """records the p.createCollisionShape arguments. each physics
+        world creates the shape from them on first use."""
+        self.collision_shape_args = kwargs
+        self._collision_shape = None
@@ -0,0 +1,113 @@
+# NightMeshCache.py
+
+from NightEngine.NightUtils import NightUtils
+from OpenGL.GL import *
+import hashlib
+
+class NightMeshBuffer:
+    def __init__(self, key, layout, vbo, ebo):
+
+        """gpu resident vertex and index buffers of one mesh packed
+        with one layout."""
+
+        self.key = key
+        self.layout = layout
+        self.vbo = vbo
+        self.ebo = ebo
+        self.ref_count = 0
+
+        # program id -> [vao, ref count]
+        self.vaos = {}
+
+class NightMeshCache:
+
+    """uploads each distinct mesh once. buffers are keyed by a hash of
+    their packed contents and reference counted, so objects built from
+    the same (or an identical) mesh share one vbo, and objects that
+    also share a program share one vao."""
+
+    _buffers = {}
+
+    @staticmethod
+    def get_key(mesh, layout):
+        """returns the content key of mesh packed with layout. the key
+        is remembered on the mesh, so each mesh is hashed once per
+        layout."""
+        key = mesh._content_keys.get(layout.key)
+        if key is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(repr(layout.key).encode("utf-8"))
+            digest.update(mesh.get_interleaved(layout).tobytes())
+            if mesh.indices is not None:
+                digest.update(mesh.indices.tobytes())
+            key = digest.hexdigest()
+            mesh._content_keys[layout.key] = key
+        return key
+
+    @staticmethod
+    def acquire(mesh, layout):
+        """returns the buffer for mesh, uploading it on first use."""
+        key = NightMeshCache.get_key(mesh, layout)
+        buffer = NightMeshCache._buffers.get(key)
+        if buffer is None:
+            vbo = NightUtils.create_vbo(mesh.get_interleaved(layout))
+            ebo = None
+            if mesh.indices is not None:
+                # buffers are typeless: upload the indices through
+                # GL_ARRAY_BUFFER so no vao is needed, vaos bind it as
+                # their element buffer later.
+                ebo = glGenBuffers(1)
+                glBindBuffer(GL_ARRAY_BUFFER, ebo)
+                glBufferData(GL_ARRAY_BUFFER, mesh.indices, GL_STATIC_DRAW)
+            buffer = NightMeshBuffer(key, layout, vbo, ebo)
+            NightMeshCache._buffers[key] = buffer
+        buffer.ref_count += 1
+        return buffer
+
+    @staticmethod
+    def release(buffer:NightMeshBuffer):
+        """drops one reference. buffers are deleted when unused."""
+        buffer.ref_count -= 1
+        if buffer.ref_count > 0:
+            return
+        for vao, _ in buffer.vaos.values():
+            NightUtils.delete_vao(vao)
+        glDeleteBuffers(1, [buffer.vbo])
+        if buffer.ebo is not None:
+            glDeleteBuffers(1, [buffer.ebo])
+        del NightMeshCache._buffers[buffer.key]
+
+    @staticmethod
+    def create_vao(buffer:NightMeshBuffer, program):
+        """creates a new vao reading buffer with program's attribute
+        locations. the caller owns it."""
+        vao = NightUtils.create_vao()
+        buffer.layout.apply(program, buffer.vbo)
+        if buffer.ebo is not None:
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, buffer.ebo)
+        return vao
+
+    @staticmethod
+    def acquire_vao(buffer:NightMeshBuffer, program):
+        """returns the vao shared by every object drawing buffer with
+        program."""
+        entry = buffer.vaos.get(program.id)
+        if entry is None:
+            entry = [NightMeshCache.create_vao(buffer, program), 0]
+            buffer.vaos[program.id] = entry
+        entry[1] += 1
+        return entry[0]
+
+    @staticmethod
+    def release_vao(buffer:NightMeshBuffer, program):
+        entry = buffer.vaos[program.id]
+        entry[1] -= 1
+        if entry[1] <= 0:
+            NightUtils.delete_vao(entry[0])
+            del buffer.vaos[program.id]
+
+    @staticmethod
+    def get_stats():
+        """returns (distinct buffers, total references)."""
+        buffers = NightMeshCache._buffers.values()
+        return len(buffers), sum(buffer.ref_count for buffer in buffers)
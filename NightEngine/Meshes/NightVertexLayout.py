@@ -0,0 +1,35 @@
+# NightVertexLayout.py
+
+class NightVertexLayout:
+
+    """describes how mesh attributes are packed into one interleaved
+    vertex buffer: the byte offset of each attribute and the stride of
+    a vertex."""
+
+    COMPONENTS = {"float": 1, "vec2": 2, "vec3": 3, "vec4": 4}
+
+    def __init__(self, attributes, alignment=4):
+
+        """attributes is a list of (variable_name, data_type) in buffer
+        order. the stride is rounded up to a multiple of alignment
+        bytes."""
+
+        self.attributes = [] # (variable_name, data_type, offset)
+
+        offset = 0
+        for variable_name, data_type in attributes:
+            if data_type not in NightVertexLayout.COMPONENTS:
+                raise Exception(f"Warning: Wrong attribute type: {data_type}.")
+            self.attributes.append((variable_name, data_type, offset))
+            offset += 4 * NightVertexLayout.COMPONENTS[data_type]
+
+        self.stride = -(-offset // alignment) * alignment
+
+        # hashable description, equal for equal layouts
+        self.key = (tuple(self.attributes), self.stride)
+
+    def apply(self, program, buffer):
+        """sets the attribute pointers of the bound vao for every
+        attribute in the layout."""
+        for variable_name, data_type, offset in self.attributes:
+            program.set_attribute_pointer(buffer, variable_name, data_type, self.stride, offset)
@@ -0,0 +1,342 @@
+# NightBVH.py
+
+import numpy as np
+
+class NightBVHNode:
+
+    __slots__ = ("aabb_min", "aabb_max", "parent", "left", "right", "obj")
+
+    def __init__(self, aabb_min, aabb_max, obj=None):
+        self.aabb_min = aabb_min
+        self.aabb_max = aabb_max
+        self.parent = None
+        self.left = None
+        self.right = None
+        self.obj = obj
+
+    def is_leaf(self):
+        return self.left is None
+
+class NightBVH:
+    def __init__(self, margin=0.5):
+
+        """dynamic aabb tree over object world bounds. leaves store a
+        fattened aabb, so objects that move a little stay in place;
+        only objects marked dirty are checked on refit, and only those
+        that left their fat aabb are reinserted. objects without bounds
+        are kept aside in unbounded until they get bounds."""
+
+        self.margin = margin
+        self.root = None
+        self.leaves = {} # obj -> leaf
+        self.unbounded = set()
+        self.dirty = set()
+
+    # ------------------------------------------------------------
+    # helpers
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def _get_tight_aabb(obj):
+        """returns the world aabb of the object's bounding sphere."""
+        bounds = obj.get_world_bounds()
+        if bounds is None:
+            return None
+        center, radius = bounds
+        center = np.asarray(center, dtype=np.float32)
+        return center - radius, center + radius
+
+    @staticmethod
+    def _area(aabb_min, aabb_max):
+        d = aabb_max - aabb_min
+        return 2.0 * (d[0]*d[1] + d[1]*d[2] + d[2]*d[0])
+
+    @staticmethod
+    def _contains(outer_min, outer_max, inner_min, inner_max):
+        return bool(np.all(outer_min <= inner_min) and np.all(inner_max <= outer_max))
+
+    # ------------------------------------------------------------
+    # building
+    # ------------------------------------------------------------
+
+    def rebuild(self, objects):
+        """builds a balanced tree from scratch by median splits."""
+
+        self.root = None
+        self.leaves = {}
+        self.unbounded = set()
+        self.dirty = set()
+
+        leaves = []
+        for obj in objects:
+            obj._bvh = self
+            aabb = NightBVH._get_tight_aabb(obj)
+            if aabb is None:
+                self.unbounded.add(obj)
+                continue
+            leaf = NightBVHNode(aabb[0] - self.margin, aabb[1] + self.margin, obj)
+            self.leaves[obj] = leaf
+            leaves.append(leaf)
+
+        if leaves:
+            self.root = self._build(leaves)
+
+    def _build(self, leaves):
+        if len(leaves) == 1:
+            return leaves[0]
+        centers = np.array([(leaf.aabb_min + leaf.aabb_max) / 2 for leaf in leaves])
+        axis = int(np.argmax(centers.max(axis=0) - centers.min(axis=0)))
+        order = np.argsort(centers[:, axis])
+        middle = len(leaves) // 2
+        left = self._build([leaves[i] for i in order[:middle]])
+        right = self._build([leaves[i] for i in order[middle:]])
+        node = NightBVHNode(np.minimum(left.aabb_min, right.aabb_min),
+                            np.maximum(left.aabb_max, right.aabb_max))
+        node.left, node.right = left, right
+        left.parent = right.parent = node
+        return node
+
+    def insert(self, obj):
+        """adds object to the tree. objects without bounds go to
+        unbounded and enter the tree on the refit after they get
+        bounds."""
+        if obj in self.leaves or obj in self.unbounded:
+            return
+        obj._bvh = self
+        aabb = NightBVH._get_tight_aabb(obj)
+        if aabb is None:
+            self.unbounded.add(obj)
+            return
+        leaf = NightBVHNode(aabb[0] - self.margin, aabb[1] + self.margin, obj)
+        self.leaves[obj] = leaf
+        self._insert_leaf(leaf)
+
+    def remove(self, obj):
+        leaf = self.leaves.pop(obj, None)
+        if leaf is None and obj not in self.unbounded:
+            return
+        self.unbounded.discard(obj)
+        self.dirty.discard(obj)
+        obj._bvh = None
+        if leaf is not None:
+            self._remove_leaf(leaf)
+
+    def mark_dirty(self, obj):
+        """records that the object moved since the last refit."""
+        self.dirty.add(obj)
+
+    def refit(self):
+        """reinserts the dirty objects that left their fat aabb."""
+        for obj in self.dirty:
+            leaf = self.leaves.get(obj)
+            if leaf is None:
+                if obj in self.unbounded:
+                    # moves it to the tree if it has bounds by now
+                    self.unbounded.discard(obj)
+                    self.insert(obj)
+                continue
+            aabb = NightBVH._get_tight_aabb(obj)
+            if aabb is None or NightBVH._contains(leaf.aabb_min, leaf.aabb_max, aabb[0], aabb[1]):
+                continue
+            self._remove_leaf(leaf)
+            leaf.aabb_min = aabb[0] - self.margin
+            leaf.aabb_max = aabb[1] + self.margin
+            self._insert_leaf(leaf)
+        self.dirty.clear()
+
+    def _insert_leaf(self, leaf):
+
+        if self.root is None:
+            self.root = leaf
+            leaf.parent = None
+            return
+
+        # ----------- choose sibling ----------- #
+
+        # descend towards the child whose aabb grows the least in
+        # surface area when the leaf is added.
+
+        node = self.root
+        while not node.is_leaf():
+            area = NightBVH._area(node.aabb_min, node.aabb_max)
+            combined = NightBVH._area(np.minimum(node.aabb_min, leaf.aabb_min),
+                                      np.maximum(node.aabb_max, leaf.aabb_max))
+            cost_here = 2.0 * combined
+            inheritance = 2.0 * (combined - area)
+
+            costs = []
+            for child in (node.left, node.right):
+                child_combined = NightBVH._area(np.minimum(child.aabb_min, leaf.aabb_min),
+                                                np.maximum(child.aabb_max, leaf.aabb_max))
+                if child.is_leaf():
+                    costs.append(child_combined + inheritance)
+                else:
+                    costs.append(child_combined - NightBVH._area(child.aabb_min, child.aabb_max) + inheritance)
+
+            if cost_here < costs[0] and cost_here < costs[1]:
+                break
+            node = node.left if costs[0] < costs[1] else node.right
+
+        # ------------ new parent ------------ #
+
+        sibling = node
+        parent_old = sibling.parent
+        parent = NightBVHNode(np.minimum(sibling.aabb_min, leaf.aabb_min),
+                              np.maximum(sibling.aabb_max, leaf.aabb_max))
+        parent.parent = parent_old
+        parent.left, parent.right = sibling, leaf
+        sibling.parent = leaf.parent = parent
+
+        if parent_old is None:
+            self.root = parent
+        elif parent_old.left is sibling:
+            parent_old.left = parent
+        else:
+            parent_old.right = parent
+
+        self._refit_ancestors(parent.parent)
+
+    def _remove_leaf(self, leaf):
+
+        if leaf is self.root:
+            self.root = None
+            return
+
+        parent = leaf.parent
+        grandparent = parent.parent
+        sibling = parent.right if parent.left is leaf else parent.left
+
+        if grandparent is None:
+            self.root = sibling
+            sibling.parent = None
+        else:
+            if grandparent.left is parent:
+                grandparent.left = sibling
+            else:
+                grandparent.right = sibling
+            sibling.parent = grandparent
+            self._refit_ancestors(grandparent)
+
+        leaf.parent = None
+
+    def _refit_ancestors(self, node):
+        while node is not None:
+            node.aabb_min = np.minimum(node.left.aabb_min, node.right.aabb_min)
+            node.aabb_max = np.maximum(node.left.aabb_max, node.right.aabb_max)
+            node = node.parent
+
+    # ------------------------------------------------------------
+    # queries
+    # ------------------------------------------------------------
+
+    def _collect(self, node, result):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.is_leaf():
+                result.append(node.obj)
+            else:
+                stack.append(node.left)
+                stack.append(node.right)
+
+    def query_frustum(self, planes:np.ndarray):
+        """returns the objects whose fat aabb intersects the frustum
+        given as (6, 4) inward planes. subtrees fully inside are
+        accepted without testing their children."""
+
+        result = []
+        if self.root is None:
+            return result
+
+        normals = planes[:, 0:3]
+        positive = normals > 0
+
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            # farthest and nearest corners along each plane normal
+            corner_far = np.where(positive, node.aabb_max, node.aabb_min)
+            corner_near = np.where(positive, node.aabb_min, node.aabb_max)
+            if np.any(np.sum(normals * corner_far, axis=1) + planes[:, 3] < 0):
+                continue
+            if np.all(np.sum(normals * corner_near, axis=1) + planes[:, 3] >= 0) or node.is_leaf():
+                self._collect(node, result)
+            else:
+                stack.append(node.left)
+                stack.append(node.right)
+        return result
+
+    def query_aabb(self, aabb_min, aabb_max):
+        """returns the objects whose fat aabb overlaps the region."""
+
+        result = []
+        if self.root is None:
+            return result
+
+        aabb_min = np.asarray(aabb_min, dtype=np.float32)
+        aabb_max = np.asarray(aabb_max, dtype=np.float32)
+
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if np.any(node.aabb_max < aabb_min) or np.any(aabb_max < node.aabb_min):
+                continue
+            if node.is_leaf():
+                result.append(node.obj)
+            else:
+                stack.append(node.left)
+                stack.append(node.right)
+        return result
+
+    def query_ray(self, origin, direction, max_distance=np.inf):
+        """returns (distance, object) pairs for the objects whose
+        bounding sphere the ray hits, nearest first."""
+
+        hits = []
+        if self.root is None:
+            return hits
+
+        origin = np.asarray(origin, dtype=np.float32)
+        direction = np.asarray(direction, dtype=np.float32)
+        direction = direction / np.linalg.norm(direction)
+        with np.errstate(divide="ignore"):
+            inverse = 1.0 / direction
+
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+
+            # ------------- slab test ------------- #
+
+            with np.errstate(invalid="ignore"):
+                t1 = (node.aabb_min - origin) * inverse
+                t2 = (node.aabb_max - origin) * inverse
+            t_near = np.nanmax(np.minimum(t1, t2))
+            t_far = np.nanmin(np.maximum(t1, t2))
+            if t_near > t_far or t_far < 0 or t_near > max_distance:
+                continue
+
+            if not node.is_leaf():
+                stack.append(node.left)
+                stack.append(node.right)
+                continue
+
+            # ---------- sphere test on leaf ---------- #
+
+            bounds = node.obj.get_world_bounds()
+            if bounds is None:
+                continue
+            center, radius = bounds
+            offset = origin - center
+            b = float(np.dot(offset, direction))
+            c = float(np.dot(offset, offset)) - radius * radius
+            discriminant = b * b - c
+            if discriminant < 0 or (c > 0 and b > 0):
+                # missed, or the sphere is behind the origin
+                continue
+            distance = max(-b - float(np.sqrt(discriminant)), 0.0)
+            if distance <= max_distance:
+                hits.append((distance, node.obj))
+
+        hits.sort(key=lambda hit: hit[0])
+        return hits
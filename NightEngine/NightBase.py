@@ -3,48 +3,71 @@
 from NightEngine.Materials.NightMaterialDefault import NightMaterialDefault
 from NightEngine.Materials.NightMaterialTexture import NightMaterialTexture
 from NightEngine.Materials.NightMaterialLight import NightMaterialLight
+from NightEngine.Materials.NightTextureManager import NightTextureManager
 from NightEngine.Objects.NightObject import NightObject
 from NightEngine.Objects.NightLink import NightLink
-from NightEngine.NightUtils import NightUtils
+from NightEngine.Objects.ObjectInstanced import ObjectInstanced
+from NightEngine.Objects.ObjectLOD import ObjectLOD
+from NightEngine.Objects.ObjectStaticBatch import ObjectStaticBatch
 from NightEngine.NightCamera import NightCamera
-from scipy.spatial.transform import Rotation as R
+from NightEngine.NightState import NightState
+from NightEngine.NightRenderQueue import NightRenderQueue
+from NightEngine.NightUniformBuffer import NightUniformBuffer
+from NightEngine.NightBVH import NightBVH
+from NightEngine.NightTransformStore import NightTransformStore
+from NightEngine.NightPhysicsSync import NightPhysicsSync
+from NightEngine.NightPhysicsWorker import NightPhysicsWorker
+from NightEngine.NightWorld import NightWorld
 from OpenGL.GL import *
 import numpy as np
-import pybullet as p
 import glfw
+import time
 
 class NightBase:
     def __init__(self,
                  width=900,
                  height=900,
-                 title="NightEngine"):
+                 title="NightEngine",
+                 headless=False,
+                 world=None):
 
-        # ------------------------------------------------------------
-        # initialize and configure glfw
-        # ------------------------------------------------------------
+        """with headless, no window or gl context is created and nothing
+        is drawn, so no display is needed. setup() and update() run as
+        usual, and physics is stepped as fast as possible unless
+        time_scale is set. world is the NightWorld simulated, the
+        default world if None."""
 
-        if not glfw.init():
-            raise Exception("Problem initializing glfw.")
+        self.headless = headless
+        self.window = None
 
-        glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 3)
-        glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 3)
-        glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
+        if not headless:
 
-        self.window = glfw.create_window(width, height, title, None, None)
-        if not self.window:
-            glfw.terminate()
-            raise Exception("Problem creating glfw window.")
+            # ------------------------------------------------------------
+            # initialize and configure glfw
+            # ------------------------------------------------------------
 
-        glfw.make_context_current(self.window)
+            if not glfw.init():
+                raise Exception("Problem initializing glfw.")
 
-        # ------------------------------------------------------------
-        # callbacks and glfw config
-        # ------------------------------------------------------------
-        
-        glfw.set_framebuffer_size_callback(self.window, self._callback_framebuffer_size)
-        glfw.set_cursor_pos_callback      (self.window, self._callback_cursor_pos)
-        glfw.set_scroll_callback          (self.window, self._callback_scroll)
-        # glfw.set_input_mode               (self.window, glfw.CURSOR, glfw.CURSOR_HIDDEN)
+            glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 3)
+            glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 3)
+            glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
+
+            self.window = glfw.create_window(width, height, title, None, None)
+            if not self.window:
+                glfw.terminate()
+                raise Exception("Problem creating glfw window.")
+
+            glfw.make_context_current(self.window)
+
+            # ------------------------------------------------------------
+            # callbacks and glfw config
+            # ------------------------------------------------------------
+
+            glfw.set_framebuffer_size_callback(self.window, self._callback_framebuffer_size)
+            glfw.set_cursor_pos_callback      (self.window, self._callback_cursor_pos)
+            glfw.set_scroll_callback          (self.window, self._callback_scroll)
+            # glfw.set_input_mode               (self.window, glfw.CURSOR, glfw.CURSOR_HIDDEN)
 
         # ------------------------------------------------------------
         # variables
@@ -57,11 +80,53 @@ class NightBase:
         self.time_delta = 0
         self.time_last = 0
 
+        # simulated seconds per real second. None runs as fast as
+        # possible, advancing fast_time_delta per loop iteration
+        self.time_scale = None if headless else 1.0
+        self.fast_time_delta = 1.0 / 60.0
+        # minimum real seconds between drawn frames, 0 draws every one
+        self.render_interval = 0.0
+        self._render_frame = not headless
+        self._running = False
+        # counters of the last drawn frame, see get_frame_stats
+        self._frame_stats = {"state_changes_issued": 0, "state_changes_skipped": 0}
+
         self.width, self.height = width, height
 
         # ---------------- scene ---------------- #
         
         self._scene = None
+        self._render_queue = NightRenderQueue()
+        self.frustum_culling = True
+        # maximum triangles drawn by ObjectLOD objects per frame, or None
+        self.lod_triangle_budget = None
+        # merge static objects with alike materials into one draw call
+        self.static_batching = False
+        self._static_batches = {} # group key -> ObjectStaticBatch
+
+        # ---------------- physics ---------------- #
+
+        # run the physics world in a separate process (set before run)
+        self.physics_process = False
+        # fixed physics steps per second. objects are drawn between the
+        # last two steps, so rates well below the frame rate stay smooth
+        self.physics_rate = 240.0
+        self.physics_interpolation = True
+        self._physics_worker = None
+        # simulated time, advanced by every fixed step
+        self.physics_time = 0.0
+        # fraction of a step drawn past the last one, see sync_physics
+        self._physics_alpha = None
+        # worker steps seen and the last step commands were sent to
+        self._physics_steps = 0
+        self._physics_target = 0
+        self._fixed_time_step = 1.0 / self.physics_rate
+        # callbacks run in the fixed step loop: those registered with
+        # add_physics_callback, then the objects' physics_update
+        self._physics_callbacks = []
+        self._physics_objects = {} # object -> callback entry
+        self._physics_objects_traversal = None
+        self._physics_entries = None
         self.light_directional = {
             "direction": [0, -1, 0],
             "ambient": [0.3, 0.3, 0.3],
@@ -69,21 +134,38 @@ class NightBase:
             "specular": [1.0, 1.0, 1.0]
         }
 
+        if not headless:
+            self._init_gl()
+
+        # ------------------------------------------------------------
+        # init pybullet
+        # ------------------------------------------------------------
+
+        self.world = world or NightWorld.get_default()
+        self._physics_sync = NightPhysicsSync(self.world)
+
+    def _init_gl(self):
+        """sets the initial gl state and creates the per-frame uniform
+        blocks."""
+
         # ------------------------------------------------------------
         # opengl states
         # ------------------------------------------------------------
 
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_MULTISAMPLE)
-        glEnable(GL_BLEND)
+        NightState.set_capability(GL_DEPTH_TEST, True)
+        NightState.set_capability(GL_MULTISAMPLE, True)
+        NightState.set_capability(GL_BLEND, False)
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
         glClearColor(0.0, 0.0, 0.0, 1)
 
         # ------------------------------------------------------------
-        # init pybullet
+        # per-frame uniform blocks
         # ------------------------------------------------------------
 
-        p.connect(p.DIRECT)
+        self._camera_data = np.zeros(36, dtype=np.float32)
+        self._light_data = np.zeros(16, dtype=np.float32)
+        self._ubo_camera = NightUniformBuffer("Camera", self._camera_data.nbytes)
+        self._ubo_light = NightUniformBuffer("Light", self._light_data.nbytes)
 
     def setup(self):
         # override
@@ -93,44 +175,273 @@ class NightBase:
         # override
         pass
 
-    def run(self):
-        """runs the setup and engine loop."""
+    def run(self, duration=None):
+        """runs the setup and engine loop, until the window is closed,
+        stop() is called or, with a duration, that many simulated
+        seconds have passed."""
         # run setup
         self.setup()
         if not self._scene:
             raise Exception("run: scene not created. run create_scene.")
         # init multiobjects (not links)
-        descendants = self._scene.get_descendants(include_self=False)
-        for obj in descendants:
+        for obj in self._scene.get_traversal():
             if isinstance(obj, NightLink):
                 continue
-            obj.init_multibody()
+            obj.init_multibody(self.world)
+        self._physics_sync.invalidate()
+        # merge static objects before the first frame
+        if self.static_batching and not self.headless:
+            self.build_static_batches()
         # set time step
-        fixed_time_step = 1.0 / 240.0
+        fixed_time_step = 1.0 / self.physics_rate
+        self._fixed_time_step = fixed_time_step
         accumulated_time = 0.0
-        p.setTimeStep(fixed_time_step)
+        self.world.set_time_step(fixed_time_step)
+        # start the physics process, which steps on its own, or in lock
+        # step with this loop without a time scale
+        if self.physics_process:
+            self._physics_worker = NightPhysicsWorker(self._scene, fixed_time_step, self.world.gravity, self.world,
+                                                      self.time_scale)
+            self._physics_worker.start()
+            self._physics_steps = self._physics_target = 0
         # run loop
-        while not glfw.window_should_close(self.window):
-            # calculate time
-            self.time_current = glfw.get_time()
-            self.time_delta = self.time_current - self.time_last
-            self.time_delta = min(self.time_delta, 1.0 / 30.0)
-            self.time_last = self.time_current
-            self.time += self.time_delta
-            accumulated_time += self.time_delta
-            # step physics simulation
-            while accumulated_time >= fixed_time_step:
-                p.stepSimulation()
-                accumulated_time -= fixed_time_step
-            # process input
-            glfw.poll_events()
-            # update scene
-            self.update()
-            # draw
-            glfw.swap_buffers(self.window)
+        self._running = True
+        self.time_last = time.perf_counter()
+        time_render = None
+        try:
+            while self._running:
+                if self.window is not None and glfw.window_should_close(self.window):
+                    break
+                if duration is not None and self.time >= duration:
+                    break
+                # calculate time. real time deltas are clamped, so a
+                # stall does not cause a burst of physics steps
+                self.time_current = time.perf_counter()
+                if self.time_scale is None:
+                    self.time_delta = self.fast_time_delta
+                else:
+                    self.time_delta = min(self.time_current - self.time_last, 1.0 / 30.0) * self.time_scale
+                self.time_last = self.time_current
+                self.time += self.time_delta
+                # draw this frame, at most every render_interval
+                self._render_frame = self.window is not None and (
+                    time_render is None or self.time_current - time_render >= self.render_interval)
+                if self._render_frame:
+                    time_render = self.time_current
+                # step physics simulation. a physics process steps on its
+                # own, only its callbacks run here.
+                accumulated_time += self.time_delta
+                steps = int(accumulated_time / fixed_time_step)
+                accumulated_time -= steps * fixed_time_step
+                alpha = None
+                if self._physics_worker is None:
+                    for step in range(steps):
+                        if step == steps - 1 and steps > 1:
+                            # poses before the last step
+                            self._physics_sync.record(self._scene)
+                        self._step_physics(fixed_time_step)
+                    if steps:
+                        self._physics_sync.record(self._scene)
+                    alpha = accumulated_time / fixed_time_step
+                else:
+                    self._step_physics_worker(fixed_time_step)
+                    if self.time_scale is None:
+                        # the steps of this frame, as in the local loop
+                        self._physics_worker.advance(steps)
+                        alpha = accumulated_time / fixed_time_step
+                # copy body poses to the scene, once per frame
+                self.sync_physics(alpha)
+                if self.window is not None:
+                    # upload textures decoded in the background
+                    NightTextureManager.process_uploads()
+                    # process input
+                    glfw.poll_events()
+                # update scene
+                self.update()
+                # draw
+                if self._render_frame:
+                    glfw.swap_buffers(self.window)
+                    self._frame_stats = {"state_changes_issued": NightState.calls_issued,
+                                         "state_changes_skipped": NightState.calls_skipped}
+                    NightState.reset_counters()
+                elif self.time_scale is not None:
+                    # nothing drawn, so no vsync to wait for. sleep until
+                    # the next physics step or frame is due
+                    time_next = self.time_current + (fixed_time_step - accumulated_time) / self.time_scale
+                    if time_render is not None:
+                        time_next = min(time_next, time_render + self.render_interval)
+                    wait = time_next - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+        finally:
+            self._running = False
+            if self._physics_worker is not None:
+                self._physics_worker.stop()
+                self._physics_worker = None
+
+    def stop(self):
+        """ends run() after the current loop iteration."""
+        self._running = False
+
+    def get_frame_stats(self):
+        """returns the gl state changes issued and those skipped as
+        redundant by NightState during the last drawn frame."""
+        return dict(self._frame_stats)
+
+    def _step_physics(self, time_step):
+        """runs one fixed step: the pre-step callbacks, the pybullet
+        step and the post-step callbacks."""
+        self._run_physics_callbacks(False)
+        self.world.step()
+        self.physics_time += time_step
+        self._run_physics_callbacks(True)
+
+    def _step_physics_worker(self, time_step):
+        """runs the callbacks once for every step the physics process
+        took since the last frame. each round sends its commands to its
+        own worker step, after the steps of earlier rounds, so the
+        forces of a round act on exactly one step. like the local loop
+        after a stall, rounds are skipped rather than letting the
+        commands run more than 1/30 s ahead of the worker. without a
+        time scale the worker waits for this loop, so none are skipped."""
+
+        worker = self._physics_worker
+        steps = worker.get_step_count()
+        self._physics_target = max(self._physics_target, steps)
+        rounds = steps - self._physics_steps
+        if self.time_scale is not None:
+            steps_max = max(int(1.0 / 30.0 / time_step), 1)
+            rounds = min(rounds, steps_max - (self._physics_target - steps))
+        self._physics_steps = steps
+
+        for _ in range(rounds):
+            self._physics_target += 1
+            worker.target_step = self._physics_target
+            self.physics_time = (self._physics_target - 1) * time_step
+            self._run_physics_callbacks(False)
+            worker.target_step = self._physics_target + 1
+            self.physics_time = self._physics_target * time_step
+            self._run_physics_callbacks(True)
+
+        # commands sent outside the callbacks run on the next step
+        worker.target_step = 0
+
+    def add_physics_callback(self, callback, rate=None, post=False):
+        """registers callback(dt) to run in the fixed step loop, before
+        every physics step or, with post, after it. with a rate (calls
+        per simulated second) it runs at most that often. dt is the
+        simulated time since its last call. while it runs the objects
+        hold the current body poses, not the interpolated ones drawn.
+        with physics_process the callbacks still run in this process,
+        once for each step it takes, and see its latest poses. they
+        must change the world through physics_call, whose calls are
+        applied on the step the callback ran for. returns a handle for
+        remove_physics_callback."""
+        entry = self._create_physics_entry(callback, rate, post)
+        self._physics_callbacks.append(entry)
+        self._physics_entries = None
+        return entry
+
+    def remove_physics_callback(self, handle):
+        self._physics_callbacks.remove(handle)
+        self._physics_entries = None
+
+    def _create_physics_entry(self, callback, rate, post):
+        return {"callback": callback,
+                "interval": 1.0 / rate if rate else 0.0,
+                "post": post,
+                "time_next": self.physics_time,
+                "time_last": None}
+
+    def _get_physics_entries(self):
+        """returns the registered callbacks followed by the physics_update
+        of every scene object that overrides it."""
+        traversal = self._scene.get_traversal()
+        if traversal is not self._physics_objects_traversal:
+            objects = {}
+            for obj in traversal:
+                if type(obj).physics_update is NightObject.physics_update:
+                    continue
+                entry = self._physics_objects.get(obj)
+                if entry is None:
+                    entry = self._create_physics_entry(obj.physics_update, obj.physics_update_rate, False)
+                objects[obj] = entry
+            self._physics_objects = objects
+            self._physics_objects_traversal = traversal
+            self._physics_entries = None
+        if self._physics_entries is None:
+            self._physics_entries = self._physics_callbacks + list(self._physics_objects.values())
+        return self._physics_entries
+
+    def _run_physics_callbacks(self, post):
+        now = self.physics_time
+        # the objects hold the interpolated poses drawn last frame, so
+        # the live ones are written before the first callback that runs
+        refresh = True
+        for entry in self._get_physics_entries():
+            # small tolerance, as physics_time is a sum of steps
+            if entry["post"] != post or now < entry["time_next"] - 1e-9:
+                continue
+            if refresh:
+                self._physics_sync.refresh(self._scene, self._physics_worker)
+                refresh = False
+            if entry["time_last"] is None:
+                dt = max(entry["interval"], self._fixed_time_step)
+            else:
+                dt = now - entry["time_last"]
+            entry["time_last"] = now
+            # keep the average rate, but never queue up missed calls
+            entry["time_next"] = max(entry["time_next"] + entry["interval"], now)
+            entry["callback"](dt)
+
+    def sync_physics(self, alpha=None):
+        """updates the scene objects to the current poses of their
+        physics bodies. called by run() after stepping, with alpha the
+        fraction of a step elapsed since the last one: draw_scene then
+        draws them that far between the last two steps, and puts the
+        current poses back afterwards, so update() reads and writes the
+        live state. without alpha the current poses are read."""
+        self._physics_alpha = alpha
+        if self._physics_worker is not None:
+            self._physics_worker.check()
+            self._physics_sync.update(self._scene, self._physics_worker)
+        elif alpha is None:
+            self._physics_sync.update(self._scene)
+        else:
+            self._physics_sync.apply(self._scene, 1.0)
+
+    def _interpolate_physics(self):
+        """writes the drawn poses of the bodies. returns True if they
+        must be restored after drawing."""
+        if not self.physics_interpolation:
+            return False
+        if self._physics_worker is not None and self.time_scale is not None:
+            return self._physics_sync.interpolate()
+        if self._physics_alpha is None:
+            return False
+        return self._physics_sync.interpolate(self._physics_alpha)
+
+    def physics_call(self, name, *args, **kwargs):
+        """calls p.<name>(*args, **kwargs) in the engine's world. with
+        physics_process the
+        call is sent to the physics process instead and returns None,
+        so use it for calls that change the world (forces, velocities,
+        dynamics) and read poses from the objects."""
+        if self._physics_worker is not None:
+            self._physics_worker.call(name, *args, **kwargs)
+            return None
+        return self.world.call(name, *args, **kwargs)
 
     def draw_scene(self, camera: NightCamera):
-        """draws a scene from a camera perspective."""
+        """draws a scene from a camera perspective. does nothing when
+        headless or on frames skipped by render_interval."""
+
+        if not self._render_frame:
+            return
+
+        # bodies are drawn between the last two physics steps, the
+        # camera included if it is attached to one
+        interpolated = self._interpolate_physics()
 
         # ------------------------------------------------------------
         # clear
@@ -146,75 +457,314 @@ class NightBase:
         camera.update()
 
         # ------------------------------------------------------------
-        # draw objects
+        # update per-frame uniform blocks
         # ------------------------------------------------------------
 
-        descendants = self._scene.get_descendants(include_self=False)
+        # std140: the camera block stores both matrices row major
+        # followed by view_pos. every vec3 in the light block is padded
+        # to a vec4.
+
+        self._camera_data[0:16] = camera.matrix_projection.ravel()
+        self._camera_data[16:32] = camera.matrix_view.ravel()
+        self._camera_data[32:35] = camera.get_position()
+        self._ubo_camera.update(self._camera_data)
 
-        for obj in descendants:
+        self._light_data[0:3] = self.light_directional["direction"]
+        self._light_data[4:7] = self.light_directional["ambient"]
+        self._light_data[8:11] = self.light_directional["diffuse"]
+        self._light_data[12:15] = self.light_directional["specular"]
+        self._ubo_light.update(self._light_data)
+
+        # ------------------------------------------------------------
+        # draw objects
+        # ------------------------------------------------------------
 
-            if not obj.visible:
+        # with a bvh only the objects it finds in the frustum are
+        # looked at, along with those without bounds, which it keeps
+        # aside and which are never culled. otherwise every visible
+        # object is culled by its bounding sphere below.
+
+        bvh = self._scene.scene_bvh
+        culling_bvh = self.frustum_culling and bvh is not None
+        traversal = self._scene.get_traversal(visible_only=True)
+
+        if culling_bvh:
+            bvh.refit()
+            inside = bvh.query_frustum(camera.get_frustum_planes())
+            candidates = [obj for obj in inside if obj._visible]
+            candidates.extend(obj for obj in bvh.unbounded if obj._visible)
+        else:
+            candidates = traversal
+
+        renderables = []
+        for obj in candidates:
+            if self.static_batching and self._is_batchable(obj):
                 continue
+            if obj.mesh and obj.material:
+                renderables.append(obj)
+
+        # batches are built from all static objects, wherever the
+        # camera looks. the batches are not in the bvh, objects alone
+        # in their group are.
+        if self.static_batching:
+            static_objects = [obj for obj in traversal if self._is_batchable(obj)]
+            batched = self._update_static_batches(static_objects)
+            if culling_bvh:
+                inside = set(inside)
+                batched = [obj for obj in batched if obj not in bvh.leaves or obj in inside]
+            renderables.extend(batched)
 
-            # ------------------------------------------------------------
-            # update objects from physics
-            # ------------------------------------------------------------
+        # ------------------------------------------------------------
+        # frustum culling
+        # ------------------------------------------------------------
 
-            if obj.physics_id != None:
-                # update render based on object physical position and orientation
-                pos, orn = p.getBasePositionAndOrientation(obj.physics_id)
-                obj.set_position(pos, reset_base=False)
-                obj.set_rotation(R.from_quat(orn).as_matrix(), reset_base=False)
-                # update object link visual representations
-                for i in range(p.getNumJoints(obj.physics_id)):
-                    link_data = p.getLinkState(obj.physics_id, i)
-                    link_pos = link_data[0]
-                    link_orn = link_data[1]
-                    obj.linkReferences[i].set_position(link_pos, reset_base=False)
-                    obj.linkReferences[i].set_rotation(R.from_quat(link_orn).as_matrix(), reset_base=False)
-                    
-            glUseProgram(obj.material.program)
-            glBindVertexArray(obj.vao)
-            
-            NightUtils.set_uniform(obj.material.program, "matrix_projection", "mat4", camera.matrix_projection)
-            NightUtils.set_uniform(obj.material.program, "matrix_view",       "mat4", camera.matrix_view)
-            NightUtils.set_uniform(obj.material.program, "matrix_model",      "mat4", obj.get_world_matrix())
-
-            if isinstance(obj.material, NightMaterialDefault):
-                # set directional light
-                NightUtils.set_uniform(obj.material.program, "light_directional.direction", "vec3", self.light_directional["direction"])
-                NightUtils.set_uniform(obj.material.program, "light_directional.ambient", "vec3", self.light_directional["ambient"])
-                NightUtils.set_uniform(obj.material.program, "light_directional.diffuse", "vec3", self.light_directional["diffuse"])
-                NightUtils.set_uniform(obj.material.program, "light_directional.specular", "vec3", self.light_directional["specular"])
-                # set material qualities
-                NightUtils.set_uniform(obj.material.program, "material.shininess", "float", obj.material.shininess)
-                NightUtils.set_uniform(obj.material.program, "material.ambient", "vec3", obj.material.ambient)
-                NightUtils.set_uniform(obj.material.program, "material.diffuse", "vec3", obj.material.diffuse)
-                NightUtils.set_uniform(obj.material.program, "material.specular", "vec3", obj.material.specular)
-                # camera pos for specular reflection
-                NightUtils.set_uniform(obj.material.program, "view_pos", "vec3", camera.get_position())
-
-            if isinstance(obj.material, NightMaterialTexture):
-                # set directional light
-                NightUtils.set_uniform(obj.material.program, "light_directional.direction", "vec3", self.light_directional["direction"])
-                NightUtils.set_uniform(obj.material.program, "light_directional.ambient", "vec3", self.light_directional["ambient"])
-                NightUtils.set_uniform(obj.material.program, "light_directional.diffuse", "vec3", self.light_directional["diffuse"])
-                NightUtils.set_uniform(obj.material.program, "light_directional.specular", "vec3", self.light_directional["specular"])
-                # set material qualities
-                NightUtils.set_uniform(obj.material.program, "material.shininess", "float", obj.material.shininess)
-                NightUtils.set_uniform(obj.material.program, "material.ambient", "vec3", obj.material.ambient)
-                NightUtils.set_uniform(obj.material.program, "material.diffuse", "vec3", obj.material.diffuse)
-                NightUtils.set_uniform(obj.material.program, "material.specular", "vec3", obj.material.specular)
-                # camera pos for specular reflection
-                NightUtils.set_uniform(obj.material.program, "view_pos", "vec3", camera.get_position())
-                # texture setup
-                NightUtils.set_uniform(obj.material.program, "uv_repeat", "vec2", [1.0, 1.0])
-                NightUtils.set_uniform(obj.material.program, "uv_offset", "vec2", [0.0, 0.0])
-                NightUtils.set_uniform(obj.material.program, "texture", "sampler2D", [obj.material.gl_texture, 1])
+        world_matrices = [obj.get_world_matrix() for obj in renderables]
+
+        if self.frustum_culling and not culling_bvh and renderables:
+            in_frustum = self._cull(camera, renderables, world_matrices)
+            renderables = [obj for obj, keep in zip(renderables, in_frustum) if keep]
+            world_matrices = [matrix for matrix, keep in zip(world_matrices, in_frustum) if keep]
+
+        # gpu resources are created on first draw
+        for obj in renderables:
+            if obj.vao is None:
+                obj.init_buffers()
+
+        camera_position = np.array(camera.get_position(world=True), dtype=np.float32)
+
+        # ------------------------------------------------------------
+        # level of detail
+        # ------------------------------------------------------------
+
+        lod_objects = [obj for obj in renderables if isinstance(obj, ObjectLOD)]
+        if lod_objects:
+            self._select_lods(camera, camera_position, lod_objects)
+
+        # ------------------------------------------------------------
+        # queue objects
+        # ------------------------------------------------------------
+
+        self._render_queue.clear()
 
-            obj.material.update_draw_settings()
+        for obj, world_matrix in zip(renderables, world_matrices):
+            self._render_queue.add(obj, camera_position, world_matrix)
 
-            glDrawArrays(obj.material.gl_draw_style, 0, obj.mesh.vertex_count)
+        self._render_queue.sort()
+
+        # ------------------------------------------------------------
+        # submit queue
+        # ------------------------------------------------------------
+
+        for render_pass, obj, world_matrix in self._render_queue:
+
+            material = obj.material
+
+            # blending and depth writes only for blended objects
+            blended = render_pass == NightRenderQueue.PASS_BLENDED
+            NightState.set_capability(GL_BLEND, blended)
+            NightState.depth_mask(not blended)
+
+            program = material.program
+            program.use()
+            NightState.bind_vertex_array(obj.vao)
+
+            program.set_mat4("matrix_model", world_matrix)
+
+            if isinstance(material, (NightMaterialDefault, NightMaterialTexture)):
+                # set material qualities
+                program.set_float("material.shininess", material.shininess)
+                program.set_vec3("material.ambient", material.ambient)
+                program.set_vec3("material.diffuse", material.diffuse)
+                program.set_vec3("material.specular", material.specular)
+
+            if isinstance(material, NightMaterialTexture):
+                # texture setup
+                program.set_vec2("uv_repeat", [1.0, 1.0])
+                program.set_vec2("uv_offset", [0.0, 0.0])
+                program.set_sampler2D("texture", [material.gl_texture, 1])
+
+            material.update_draw_settings()
+
+            mesh = obj.mesh
+
+            if isinstance(obj, ObjectInstanced):
+                obj.upload_instances()
+                if mesh.indices is not None:
+                    glDrawElementsInstanced(material.gl_draw_style, mesh.index_count, GL_UNSIGNED_INT, ctypes.c_void_p(0), obj.instance_count)
+                else:
+                    glDrawArraysInstanced(material.gl_draw_style, 0, mesh.vertex_count, obj.instance_count)
+            elif mesh.indices is not None:
+                glDrawElements(material.gl_draw_style, mesh.index_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+            else:
+                glDrawArrays(material.gl_draw_style, 0, mesh.vertex_count)
+
+        NightState.depth_mask(True)
+
+        if interpolated:
+            self._physics_sync.restore()
+
+    def _cull(self, camera, objects, world_matrices):
+        """returns a mask of the objects whose world bounding sphere
+        intersects the camera frustum. objects without bounds are
+        never culled."""
+
+        count = len(objects)
+        centers = np.zeros((count, 3), dtype=np.float32)
+        radii = np.full(count, np.inf, dtype=np.float32)
+        for i, obj in enumerate(objects):
+            bounds = obj.get_local_bounds()
+            if bounds is not None:
+                centers[i], radii[i] = bounds
+
+        # transform all spheres to world space at once
+        worlds = np.stack(world_matrices)
+        centers = np.einsum("nij,nj->ni", worlds[:, 0:3, 0:3], centers) + worlds[:, 0:3, 3]
+        scales = np.sqrt(np.max(np.sum(worlds[:, 0:3, 0:3]**2, axis=1), axis=1))
+        radii = np.where(np.isinf(radii), np.inf, radii * scales)
+
+        return camera.cull(centers, radii)
+
+    def _select_lods(self, camera, camera_position, objects):
+        """picks each object's level from its projected diameter in
+        pixels. if lod_triangle_budget is set and exceeded, the objects
+        smallest on screen are coarsened first, one level at a time."""
+
+        # pixels per world unit at distance 1
+        pixels = self.height / (2.0 * np.tan(np.radians(camera.fov) / 2.0))
+
+        sizes = []
+        for obj in objects:
+            center, radius = obj.get_world_bounds()
+            distance = max(float(np.linalg.norm(center - camera_position)), camera.near)
+            size = 2.0 * radius * pixels / distance
+            obj.set_level(obj.select_level(size))
+            sizes.append(size)
+
+        if self.lod_triangle_budget is None:
+            return
+
+        # ------------- triangle budget ------------- #
+
+        total = sum(obj.get_triangle_count() for obj in objects)
+        order = [objects[i] for i in np.argsort(sizes)]
+
+        while total > self.lod_triangle_budget:
+            coarsened = False
+            for obj in order:
+                if obj.level == obj.get_level_count() - 1:
+                    continue
+                total -= obj.get_triangle_count() - obj.get_triangle_count(obj.level + 1)
+                obj.set_level(obj.level + 1)
+                coarsened = True
+                if total <= self.lod_triangle_budget:
+                    break
+            if not coarsened:
+                break
+
+    def _is_batchable(self, obj):
+        return (obj.static and obj.mass == 0 and obj.mesh and obj.material
+                and not obj.material.transparent
+                and not isinstance(obj, (ObjectInstanced, ObjectLOD, ObjectStaticBatch)))
+
+    @staticmethod
+    def _get_material_key(material):
+        """returns a key that is equal for materials which draw alike:
+        same class, same program and texture objects (both shared
+        through their caches) and equal settings. objects usually get a
+        material each, so batching by material identity would never
+        merge anything."""
+        values = []
+        for name, value in sorted(vars(material).items()):
+            if isinstance(value, list):
+                value = tuple(value)
+            elif not isinstance(value, (bool, int, float, str, tuple, type(None))):
+                value = id(value)
+            values.append((name, value))
+        return (type(material), tuple(values))
+
+    def _update_static_batches(self, objects):
+        """groups static objects by material and mesh attributes and
+        returns what to draw for them: one batch per group, or the
+        object itself if it is alone in its group. a batch is rebuilt
+        only when its members changed or one of them moved."""
+
+        groups = {}
+        for obj in objects:
+            attributes = tuple((name, attribute["data_type"]) for name, attribute in obj.mesh.attributes.items())
+            groups.setdefault((NightBase._get_material_key(obj.material), attributes), []).append(obj)
+
+        drawn = []
+        batches = {}
+        for key, members in groups.items():
+            if len(members) < 2:
+                drawn.extend(members)
+                continue
+            batch = self._static_batches.pop(key, None)
+            if batch is None or batch.dirty or batch.member_ids != tuple(id(obj) for obj in members):
+                batch_new = ObjectStaticBatch(members, members[0].material)
+                if batch is not None:
+                    batch.release()
+                batch = batch_new
+            batches[key] = batch
+            drawn.append(batch)
+
+        # groups that no longer exist
+        for batch in self._static_batches.values():
+            batch.release()
+        self._static_batches = batches
+
+        return drawn
+
+    def build_static_batches(self):
+        """merges the visible static objects of the scene now, instead
+        of on the next draw. returns the batches."""
+        if not self._scene:
+            raise Exception("build_static_batches: scene not created. run create_scene.")
+        objects = [obj for obj in self._scene.get_traversal(visible_only=True)
+                   if self._is_batchable(obj)]
+        self._update_static_batches(objects)
+        return list(self._static_batches.values())
+
+    def enable_bvh(self, margin=0.5):
+        """builds a bvh over the world bounds of all scene objects. it
+        is kept up to date as objects move or are added and removed,
+        and used for frustum culling and queries."""
+        if not self._scene:
+            raise Exception("enable_bvh: scene not created. run create_scene.")
+        self._scene.scene_bvh = NightBVH(margin)
+        self._scene.scene_bvh.rebuild(self._scene.get_traversal())
+        return self._scene.scene_bvh
+
+    def enable_transform_store(self, capacity=64):
+        """moves the transforms of all scene objects into one
+        NightTransformStore, so world matrices are computed for the
+        whole scene in a few batched numpy calls. objects added to the
+        scene later join it."""
+        if not self._scene:
+            raise Exception("enable_transform_store: scene not created. run create_scene.")
+        store = NightTransformStore(capacity)
+        store.add_tree(self._scene)
+        return store
+
+    def query_region(self, aabb_min, aabb_max):
+        """returns the scene objects overlapping the aabb region. needs
+        enable_bvh."""
+        bvh = self._scene.scene_bvh
+        bvh.refit()
+        return bvh.query_aabb(aabb_min, aabb_max)
+
+    def pick(self, camera: NightCamera, x, y):
+        """returns the nearest visible object under window pixel (x, y),
+        or None. needs enable_bvh. the ray starts on the near plane,
+        which is inside the camera's own box, so the camera is
+        skipped."""
+        bvh = self._scene.scene_bvh
+        bvh.refit()
+        origin, direction = camera.get_ray(x, y, self.width, self.height)
+        for distance, obj in bvh.query_ray(origin, direction):
+            if obj is not camera and obj.visible:
+                return obj
+        return None
 
     def create_scene(self):
         self._scene = NightObject()
@@ -222,7 +772,9 @@ class NightBase:
 
     def set_gravity(self, x=0.0, y=-9.8, z=0.0):
         """wrpper for pybullet setGravity"""
-        p.setGravity(x, y, z)
+        self.world.set_gravity(x, y, z)
+        if self._physics_worker is not None:
+            self._physics_worker.call("setGravity", x, y, z)
         
     def _callback_framebuffer_size(self, window, width, height):
         """updates viewport and recalculates camera aspect ratio."""
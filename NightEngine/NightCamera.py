@@ -53,6 +53,40 @@ class NightCamera(NightObject):
                                                              self.near,
                                                              self.far)
 
+    def get_frustum_planes(self):
+        """returns the six frustum planes (left, right, bottom, top,
+        near, far) as rows (a, b, c, d) with normalized normals
+        pointing inwards, from the current view and projection."""
+        m = self.matrix_projection @ self.matrix_view
+        planes = np.array([m[3] + m[0],
+                           m[3] - m[0],
+                           m[3] + m[1],
+                           m[3] - m[1],
+                           m[3] + m[2],
+                           m[3] - m[2]], dtype=np.float32)
+        planes /= np.linalg.norm(planes[:, 0:3], axis=1)[:, None]
+        return planes
+
+    def cull(self, centers:np.ndarray, radii:np.ndarray):
+        """returns a boolean mask of the bounding spheres (N x 3
+        centers, N radii) that intersect the view frustum."""
+        planes = self.get_frustum_planes()
+        distances = centers @ planes[:, 0:3].T + planes[:, 3]
+        return np.all(distances >= -radii[:, None], axis=1)
+
+    def get_ray(self, x, y, width, height):
+        """returns (origin, direction) in world space of the ray through
+        window pixel (x, y), for picking."""
+        ndc_x = 2.0 * x / width - 1.0
+        ndc_y = 1.0 - 2.0 * y / height
+        inverse = np.linalg.inv(self.matrix_projection @ self.matrix_view)
+        near = inverse @ np.array([ndc_x, ndc_y, -1.0, 1.0])
+        far = inverse @ np.array([ndc_x, ndc_y, 1.0, 1.0])
+        near = near[0:3] / near[3]
+        far = far[0:3] / far[3]
+        direction = far - near
+        return near, direction / np.linalg.norm(direction)
+
     def move(self, window, time_delta: float):
         """default camera movement configuration."""
 
@@ -115,3 +149,4 @@ class NightCamera(NightObject):
 
         self.transform[0:3, 0] = right
         self.transform[0:3, 1] = true_up
+        self._on_transform_changed()
@@ -0,0 +1,197 @@
+# NightPhysicsSync.py
+
+from NightEngine.Objects.ObjectInstanced import ObjectInstanced
+from NightEngine.NightQuaternion import NightQuaternion
+from NightEngine.NightWorld import NightWorld
+import pybullet as p
+import numpy as np
+import time
+
+class NightPhysicsSync:
+    def __init__(self, world=None):
+
+        """copies body and link poses from a pybullet world (or a
+        physics worker process) to the scene objects. the poses of all bodies and
+        links are gathered first, then every quaternion is converted to
+        a matrix in one call and the results are written to the
+        transforms. the last two recorded poses are kept, so objects
+        can be drawn between physics steps while they otherwise hold
+        the current poses."""
+
+        self.world = world or NightWorld.get_default()
+        self._traversal = None
+        self._worker = None
+
+        # (physics id, link count) per body, in gather order
+        self._bodies = []
+        # object per gathered pose of a plain body or link
+        self._targets = []
+        # (object, first pose, pose count) per instanced object
+        self._instanced = []
+        # rows of the gathered poses in the worker snapshot
+        self._rows = None
+
+        # (N, 7) poses after the last two recorded steps
+        self._previous = None
+        self._current = None
+        # perf_counter time the worker published the current poses
+        self._published = None
+
+    def invalidate(self):
+        """forces the body list to be rebuilt, e.g. after bodies were
+        created for objects already in the scene."""
+        self._traversal = None
+
+    @staticmethod
+    def gather_poses(bodies, client=0):
+        """returns a (N, 7) array of position and quaternion for each
+        (physics id, link count) body of physics client: the base, then
+        its links."""
+        poses = []
+        for physics_id, link_count in bodies:
+            position, orientation = p.getBasePositionAndOrientation(physics_id, physicsClientId=client)
+            poses.append(position + orientation)
+            if link_count:
+                for state in p.getLinkStates(physics_id, range(link_count), physicsClientId=client):
+                    poses.append(state[0] + state[1])
+        return np.array(poses, dtype=np.float64).reshape(-1, 7)
+
+    def _collect(self, traversal, worker):
+        self._traversal = traversal
+        self._worker = worker
+        self._bodies = []
+        self._targets = []
+        self._instanced = []
+
+        instanced = []
+        for obj in traversal:
+            if isinstance(obj, ObjectInstanced):
+                if obj.instance_physics_ids:
+                    instanced.append(obj)
+            elif obj.physics_id is not None and not obj.static:
+                links = obj.linkReferences[:p.getNumJoints(obj.physics_id, physicsClientId=self.world.client)]
+                self._bodies.append((obj.physics_id, len(links)))
+                self._targets.append(obj)
+                self._targets.extend(links)
+
+        # instance poses follow those of the plain bodies and links
+        start = len(self._targets)
+        for obj in instanced:
+            count = len(obj.instance_physics_ids)
+            self._instanced.append((obj, start, count))
+            self._bodies.extend((physics_id, 0) for physics_id in obj.instance_physics_ids)
+            start += count
+
+        # ----------- rows in the worker snapshot ----------- #
+
+        if worker is not None:
+            rows = []
+            for physics_id, link_count in self._bodies:
+                rows.append(worker.slot_index[(physics_id, -1)])
+                rows.extend(worker.slot_index[(physics_id, link)] for link in range(link_count))
+            self._rows = np.array(rows, dtype=np.int64)
+
+    def _prepare(self, scene, worker):
+        """rebuilds the body list if the scene changed. returns True if
+        it was rebuilt."""
+        traversal = scene.get_traversal()
+        if traversal is self._traversal and worker is self._worker:
+            return False
+        self._collect(traversal, worker)
+        self._previous = self._current = None
+        return True
+
+    def record(self, scene):
+        """gathers the current poses from pybullet. the poses recorded
+        before become the previous ones."""
+        self._prepare(scene, None)
+        poses = NightPhysicsSync.gather_poses(self._bodies, self.world.client)
+        self._previous = poses if self._current is None else self._current
+        self._current = poses
+
+    def refresh(self, scene, worker=None):
+        """writes the current poses from pybullet, or the latest
+        snapshot of a worker, to the objects without recording them, so
+        code running between steps sees the live, uninterpolated
+        state."""
+        if worker is not None:
+            self._prepare(scene, worker)
+            if self._bodies:
+                poses = worker.read(self._rows)[0][:, 7:14]
+                self._write(poses, poses, 1.0)
+            return
+        self._prepare(scene, None)
+        poses = NightPhysicsSync.gather_poses(self._bodies, self.world.client)
+        self._write(poses, poses, 1.0)
+
+    def apply(self, scene, alpha=1.0):
+        """writes the recorded poses to the objects, interpolated from
+        the previous (alpha = 0) to the current ones (alpha = 1)."""
+        if self._prepare(scene, None) or self._current is None:
+            self.record(scene)
+        self._write(self._previous, self._current, alpha)
+
+    def update(self, scene, worker=None):
+        """records and applies the current poses. with a worker, they
+        are read from its latest snapshot."""
+        if worker is None:
+            self.record(scene)
+            self.apply(scene)
+            return
+        self._prepare(scene, worker)
+        if not self._bodies:
+            return
+        poses, self._published = worker.read(self._rows)
+        self._previous = poses[:, 0:7]
+        self._current = poses[:, 7:14]
+        self._write(self._previous, self._current, 1.0)
+
+    def interpolate(self, alpha=None):
+        """writes the poses between the last two recorded ones, for
+        drawing. with a worker and no alpha, alpha is the time since
+        its snapshot was published, in steps of its step_interval. returns True if the
+        objects no longer hold the current poses, see restore."""
+        if self._current is None:
+            return False
+        if alpha is None:
+            alpha = (time.perf_counter() - self._published) / self._worker.step_interval
+        if alpha >= 1.0:
+            return False
+        self._write(self._previous, self._current, max(alpha, 0.0))
+        return True
+
+    def restore(self):
+        """writes the current poses again after interpolate."""
+        self._write(self._current, self._current, 1.0)
+
+    def _write(self, previous, current, alpha):
+
+        if not self._bodies:
+            return
+
+        # ------------------------------------------------------------
+        # interpolate
+        # ------------------------------------------------------------
+
+        if alpha >= 1.0:
+            positions = current[:, 0:3].astype(np.float32)
+            orientations = current[:, 3:7].astype(np.float32)
+        else:
+            positions = (previous[:, 0:3] + (current[:, 0:3] - previous[:, 0:3]) * alpha).astype(np.float32)
+            orientations = NightQuaternion.slerp(previous[:, 3:7], current[:, 3:7], alpha).astype(np.float32)
+
+        # ------------------------------------------------------------
+        # write back
+        # ------------------------------------------------------------
+
+        count = len(self._targets)
+        if count:
+            rotations = NightQuaternion.to_matrix(orientations[:count])
+            for obj, position, rotation in zip(self._targets, positions, rotations):
+                transform = obj.transform
+                transform[0:3, 0:3] = rotation
+                transform[0:3, 3] = position
+                obj._on_transform_changed()
+
+        for obj, start, count in self._instanced:
+            obj.set_instance_poses(positions[start:start + count], orientations[start:start + count])
@@ -0,0 +1,301 @@
+# NightPhysicsWorker.py
+
+from NightEngine.Objects.ObjectInstanced import ObjectInstanced
+from NightEngine.NightPhysicsSync import NightPhysicsSync
+from NightEngine.NightWorld import NightWorld
+from multiprocessing import shared_memory
+import multiprocessing
+import pybullet as p
+import numpy as np
+import queue
+import time
+
+class NightPhysicsWorker:
+
+    # snapshot header: latest buffer, sequence of buffer 0, sequence of
+    # buffer 1, steps simulated, steps allowed without a time scale.
+    # followed by the publish time of each
+    # buffer and the buffers, which hold the previous and current pose
+    # of every slot.
+    HEADER = 5
+    POSE = 14
+
+    def __init__(self, scene, fixed_time_step, gravity=(0.0, -9.8, 0.0), world=None, time_scale=1.0):
+
+        """runs the pybullet world of a scene in a separate process.
+        the bodies created in this process are created again there,
+        from their recorded arguments, with the same ids. after every
+        step the worker publishes the pose of every body and link into
+        one of two shared memory buffers and marks it as the latest, so
+        the render process always reads a complete snapshot without
+        waiting. pybullet calls that change the world must be sent with
+        call(); world, in this process, keeps a stale copy. the worker
+        steps at time_scale times real time or, if it is None, only
+        when advance() lets it."""
+
+        self.fixed_time_step = fixed_time_step
+        self.time_scale = time_scale
+        # real time between two steps
+        self.step_interval = fixed_time_step / time_scale if time_scale else None
+        # worker step the commands sent now apply to, 0 for the next one
+        self.target_step = 0
+        self.gravity = tuple(gravity)
+        self.world = world or NightWorld.get_default()
+
+        shapes, bodies = NightPhysicsWorker.describe(scene, self.world)
+        self._shapes = shapes
+        self._bodies = bodies
+
+        # ---------------- slots ---------------- #
+
+        # one pose slot for every body base and link
+        self.link_counts = [(physics_id, p.getNumJoints(physics_id, physicsClientId=self.world.client))
+                            for physics_id, _ in bodies]
+        self.slots = []
+        for physics_id, link_count in self.link_counts:
+            self.slots.append((physics_id, -1))
+            self.slots.extend((physics_id, link) for link in range(link_count))
+        self.slot_index = {slot: index for index, slot in enumerate(self.slots)}
+
+        # ----------- shared snapshot ----------- #
+
+        count = max(len(self.slots), 1)
+        self._shared = shared_memory.SharedMemory(create=True, size=NightPhysicsWorker.get_size(count))
+        self._header, self._times, self._buffers = NightPhysicsWorker._get_views(self._shared, count)
+        self._header[:] = 0
+
+        # both buffers start with the current poses
+        if self.slots:
+            poses = NightPhysicsSync.gather_poses(self.link_counts, self.world.client)
+            self._buffers[:, :, 0:7] = poses
+            self._buffers[:, :, 7:14] = poses
+        self._times[:] = time.perf_counter()
+
+        # --------------- process --------------- #
+
+        # spawn, as forking a process with a gl context is unsafe
+        context = multiprocessing.get_context("spawn")
+        self._commands = context.Queue()
+        self._errors = context.Queue()
+        self._ready = context.Event()
+        self._stop = context.Event()
+        self._process = context.Process(target=NightPhysicsWorker._run,
+                                        args=(self._shared.name, count, shapes, bodies, self.link_counts,
+                                              self.gravity, fixed_time_step, time_scale, self._commands, self._errors,
+                                              self._ready, self._stop),
+                                        daemon=True)
+
+    # ------------------------------------------------------------
+    # render process
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def describe(scene, world):
+        """returns the collision shapes {id: arguments} and bodies
+        [(id, arguments)] of the scene in world, sorted by body id."""
+
+        bodies = []
+        meshes = []
+        for obj in scene.get_traversal():
+            if isinstance(obj, ObjectInstanced):
+                bodies.extend(zip(obj.instance_physics_ids, obj.instance_multibody_args))
+                meshes.append(obj.mesh)
+            elif obj.physics_id is not None:
+                bodies.append((obj.physics_id, obj.multibody_args))
+                meshes.append(obj.mesh)
+                meshes.extend(link.mesh for link in obj.linkReferences)
+
+        shapes = {}
+        for mesh in meshes:
+            shape = world.get_collision_shape(mesh)
+            if shape is None:
+                continue
+            if mesh.collision_shape_args is None:
+                raise Exception(f"NightPhysicsWorker: collision shape {shape} was not created with create_collision_shape.")
+            shapes[shape] = mesh.collision_shape_args
+
+        bodies.sort(key=lambda body: body[0])
+        return shapes, bodies
+
+    @staticmethod
+    def get_size(count):
+        return 8 * (NightPhysicsWorker.HEADER + 2 + 2 * count * NightPhysicsWorker.POSE)
+
+    @staticmethod
+    def _get_views(shared, count):
+        header = np.ndarray((NightPhysicsWorker.HEADER,), dtype=np.int64, buffer=shared.buf)
+        times = np.ndarray((2,), dtype=np.float64, buffer=shared.buf,
+                           offset=8 * NightPhysicsWorker.HEADER)
+        buffers = np.ndarray((2, count, NightPhysicsWorker.POSE), dtype=np.float64, buffer=shared.buf,
+                             offset=8 * (NightPhysicsWorker.HEADER + 2))
+        return header, times, buffers
+
+    def start(self, timeout=30.0):
+        """starts the worker and waits until it rebuilt the world and
+        steps."""
+        self._process.start()
+        time_end = time.perf_counter() + timeout
+        try:
+            while not self._ready.wait(0.05):
+                self.check()
+                if time.perf_counter() > time_end:
+                    raise Exception("NightPhysicsWorker: physics process did not start in time.")
+        except Exception:
+            self.stop()
+            raise
+
+    def check(self):
+        """raises if the worker process has exited."""
+        if self._process.is_alive() or self._stop.is_set():
+            return
+        try:
+            error = self._errors.get(timeout=1.0)
+        except queue.Empty:
+            error = f"exit code {self._process.exitcode}"
+        raise Exception(f"NightPhysicsWorker: physics process stopped ({error}).")
+
+    def stop(self):
+        """stops the worker and frees the shared memory."""
+        self._stop.set()
+        self._process.join(timeout=2.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        # views must be dropped before the block is closed
+        self._header = self._times = self._buffers = None
+        self._shared.close()
+        self._shared.unlink()
+
+    def call(self, name, *args, **kwargs):
+        """runs p.<name>(*args, **kwargs) in the worker before step
+        target_step, or before its next step if that one has passed.
+        the result is discarded."""
+        self._commands.put((self.target_step, name, args, kwargs))
+
+    def get_step_count(self):
+        return int(self._header[3])
+
+    def advance(self, steps):
+        """lets a worker without time scale take steps more steps and
+        waits until it has."""
+        self._header[4] += steps
+        limit = int(self._header[4])
+        while int(self._header[3]) < limit:
+            self.check()
+            time.sleep(0.0001)
+
+    def read(self, rows):
+        """returns a copy of the (len(rows), 14) previous and current
+        poses of the given slots from the latest complete snapshot, and
+        the perf_counter time it was published. the rows are copied
+        out of shared memory, as the worker may rewrite the buffer as
+        soon as it is no longer the latest."""
+        header = self._header
+        while True:
+            latest = int(header[0])
+            sequence = int(header[1 + latest])
+            if sequence % 2 == 0:
+                poses = self._buffers[latest][rows]
+                published = float(self._times[latest])
+                # the buffer was not rewritten while reading
+                if int(header[1 + latest]) == sequence:
+                    return poses, published
+
+    # ------------------------------------------------------------
+    # worker process
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def _run(name, count, shapes, bodies, link_counts, gravity, fixed_time_step, time_scale, commands, errors, ready, stop):
+        try:
+            NightPhysicsWorker._simulate(name, count, shapes, bodies, link_counts, gravity, fixed_time_step, time_scale,
+                                         commands, ready, stop)
+        except Exception as error:
+            # read by check() in the render process
+            errors.put(f"{type(error).__name__}: {error}")
+            raise
+
+    @staticmethod
+    def _simulate(name, count, shapes, bodies, link_counts, gravity, fixed_time_step, time_scale, commands, ready, stop):
+
+        client = p.connect(p.DIRECT)
+
+        # ------------- rebuild world ------------- #
+
+        shape_ids = {shape: p.createCollisionShape(**args, physicsClientId=client) for shape, args in sorted(shapes.items())}
+        for physics_id, args in bodies:
+            args = dict(args)
+            args["baseCollisionShapeIndex"] = shape_ids[args["baseCollisionShapeIndex"]]
+            if args.get("linkCollisionShapeIndices"):
+                args["linkCollisionShapeIndices"] = [shape_ids[shape] for shape in args["linkCollisionShapeIndices"]]
+            if p.createMultiBody(**args, physicsClientId=client) != physics_id:
+                raise Exception("NightPhysicsWorker: body ids differ from the render process. create all bodies through the engine.")
+
+        p.setGravity(*gravity, physicsClientId=client)
+        p.setTimeStep(fixed_time_step, physicsClientId=client)
+
+        try:
+            shared = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # python < 3.13
+            shared = shared_memory.SharedMemory(name=name)
+        header, times, buffers = NightPhysicsWorker._get_views(shared, count)
+        # poses after the last published step
+        previous = buffers[int(header[0]), :, 7:14].copy()
+        # (step, name, args, kwargs) of commands for later steps
+        pending = []
+
+        # ------------------ loop ------------------ #
+
+        ready.set()
+        time_next = time.perf_counter()
+        while not stop.is_set():
+
+            # without a time scale, wait for the render process
+            if time_scale is None and header[3] >= header[4]:
+                time.sleep(0.0001)
+                continue
+
+            # run the commands for this step, and late ones, in the
+            # order they were sent
+            while True:
+                try:
+                    pending.append(commands.get_nowait())
+                except queue.Empty:
+                    break
+            step = int(header[3]) + 1
+            if any(command[0] <= step for command in pending):
+                due = [command for command in pending if command[0] <= step]
+                pending = [command for command in pending if command[0] > step]
+                for _, command, args, kwargs in due:
+                    getattr(p, command)(*args, physicsClientId=client, **kwargs)
+
+            p.stepSimulation(physicsClientId=client)
+
+            # write the buffer that is not the latest. an odd sequence
+            # marks it as being written.
+            if link_counts:
+                current = NightPhysicsSync.gather_poses(link_counts, client)
+                target = 1 - int(header[0])
+                header[1 + target] += 1
+                buffers[target, :, 0:7] = previous
+                buffers[target, :, 7:14] = current
+                times[target] = time.perf_counter()
+                header[1 + target] += 1
+                header[0] = target
+                previous = current
+            header[3] += 1
+
+            if time_scale is None:
+                continue
+
+            # keep scaled real time, without catching up after long
+            # stalls
+            time_next += fixed_time_step / time_scale
+            delay = time_next - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -0.1:
+                time_next = time.perf_counter()
+
+        del header, times, buffers
+        shared.close()
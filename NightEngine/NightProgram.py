@@ -0,0 +1,339 @@
+# NightProgram.py
+
+from NightEngine.NightUtils import NightUtils
+from NightEngine.NightState import NightState
+from NightEngine.NightUniformBuffer import NightUniformBuffer
+from OpenGL.GL import *
+import numpy as np
+import hashlib
+import os
+
+class NightProgram:
+
+    # programs already linked in this process, keyed by source and
+    # defines
+    _cache = {}
+
+    # directory for linked program binaries. None disables the disk
+    # cache.
+    cache_directory = os.path.join(os.path.expanduser("~"), ".cache", "NightEngine", "programs")
+
+    def __init__(self, vertex_shader_code, fragment_shader_code, defines=None):
+
+        """holds the program source. it is compiled and linked, and its
+        active uniforms and attributes reflected into location tables,
+        on first use, so materials can be created without a gl context.
+        defines is a dict of preprocessor macros inserted after
+        #version. use NightProgram.get to share identical programs."""
+
+        self.defines = dict(defines) if defines else {}
+
+        self._vertex_shader_code = NightProgram.apply_defines(vertex_shader_code, self.defines)
+        self._fragment_shader_code = NightProgram.apply_defines(fragment_shader_code, self.defines)
+
+        self._id = None
+
+        # name -> (location, gl type)
+        self._uniforms = {}
+        self._attributes = {}
+
+        # names already reported as missing, to warn only once
+        self._missing = set()
+
+    @property
+    def id(self):
+        if self._id is None:
+            self._link()
+        return self._id
+
+    @property
+    def uniforms(self):
+        if self._id is None:
+            self._link()
+        return self._uniforms
+
+    @property
+    def attributes(self):
+        if self._id is None:
+            self._link()
+        return self._attributes
+
+    def _link(self):
+        """loads the cached binary or compiles the program."""
+
+        binary_path = NightProgram._get_binary_path(self._vertex_shader_code, self._fragment_shader_code)
+
+        program = None
+        if binary_path:
+            program = NightProgram._load_binary(binary_path)
+
+        if program is None:
+            program = NightUtils.create_program(self._vertex_shader_code,
+                                                self._fragment_shader_code,
+                                                retrievable=binary_path is not None)
+            if binary_path:
+                NightProgram._save_binary(program, binary_path)
+
+        self._id = program
+        self._reflect()
+
+    @staticmethod
+    def get(vertex_shader_code, fragment_shader_code, defines=None):
+        """returns the program for this source and defines, creating it
+        on first use. materials with identical shaders share it."""
+        key = (vertex_shader_code, fragment_shader_code,
+               tuple(sorted((defines or {}).items())))
+        program = NightProgram._cache.get(key)
+        if program is None:
+            program = NightProgram(vertex_shader_code, fragment_shader_code, defines)
+            NightProgram._cache[key] = program
+        return program
+
+    # ------------------------------------------------------------
+    # program binary cache
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def _get_binary_path(vertex_shader_code, fragment_shader_code):
+        """returns the cache file for this source on this driver, or
+        None if binaries are unsupported or the cache is disabled."""
+
+        if not NightProgram.cache_directory:
+            return None
+        if not bool(glGetProgramBinary) or not bool(glProgramBinary):
+            return None
+        if glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) == 0:
+            return None
+
+        # binaries are only valid for the driver that produced them
+        digest = hashlib.sha256()
+        for part in (glGetString(GL_VENDOR), glGetString(GL_RENDERER), glGetString(GL_VERSION)):
+            digest.update(part or b"")
+        digest.update(vertex_shader_code.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(fragment_shader_code.encode("utf-8"))
+
+        return os.path.join(NightProgram.cache_directory, digest.hexdigest() + ".bin")
+
+    @staticmethod
+    def _load_binary(path):
+        """returns a program created from the cached binary, or None if
+        there is none or the driver rejects it."""
+
+        if not os.path.isfile(path):
+            return None
+
+        with open(path, "rb") as file:
+            data = file.read()
+        binary_format = int.from_bytes(data[:4], "little")
+        binary = np.frombuffer(data[4:], dtype=np.uint8)
+
+        program = glCreateProgram()
+        try:
+            glProgramBinary(program, binary_format, binary, len(binary))
+        except GLError:
+            glDeleteProgram(program)
+            return None
+
+        if not glGetProgramiv(program, GL_LINK_STATUS):
+            # stale binary (e.g. driver update), recompile
+            glDeleteProgram(program)
+            return None
+
+        return program
+
+    @staticmethod
+    def _save_binary(program, path):
+        """writes the linked binary of program to path. failures only
+        cost the next launch a compile."""
+
+        try:
+            size = glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH)
+            if size <= 0:
+                return
+            length = np.zeros(1, dtype=np.int32)
+            binary_format = np.zeros(1, dtype=np.uint32)
+            binary = np.zeros(size, dtype=np.uint8)
+            glGetProgramBinary(program, size, length, binary_format, binary)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            path_temporary = path + f".{os.getpid()}.tmp"
+            with open(path_temporary, "wb") as file:
+                file.write(int(binary_format[0]).to_bytes(4, "little"))
+                file.write(binary[:int(length[0])].tobytes())
+            os.replace(path_temporary, path)
+        except (GLError, OSError) as error:
+            print(f"Warning: Could not cache program binary: {error}")
+
+    @staticmethod
+    def apply_defines(shader_code, defines):
+        """returns shader code with a #define line for each entry of
+        defines, placed right after the #version directive."""
+        if not defines:
+            return shader_code
+        lines = shader_code.strip().split("\n")
+        macros = [f"#define {name} {value}" for name, value in sorted(defines.items())]
+        if lines[0].strip().startswith("#version"):
+            return "\n".join([lines[0].strip()] + macros + lines[1:])
+        return "\n".join(macros + lines)
+
+    def _reflect(self):
+        """queries the active uniforms, attributes and uniform blocks
+        once after linking."""
+
+        # --------------- uniforms --------------- #
+
+        for index in range(glGetProgramiv(self.id, GL_ACTIVE_UNIFORMS)):
+            name, size, gl_type = glGetActiveUniform(self.id, index)
+            name = name.decode("utf-8") if isinstance(name, bytes) else name
+            location = glGetUniformLocation(self.id, name)
+            if location == -1:
+                # uniforms inside blocks have no location
+                continue
+            self._uniforms[name] = (location, gl_type)
+            # arrays are reported as "name[0]"
+            if name.endswith("[0]"):
+                self._uniforms[name[:-3]] = (location, gl_type)
+
+        # -------------- attributes -------------- #
+
+        for index in range(glGetProgramiv(self.id, GL_ACTIVE_ATTRIBUTES)):
+            name, size, gl_type = glGetActiveAttrib(self.id, index)
+            name = name.decode("utf-8") if isinstance(name, bytes) else name
+            location = glGetAttribLocation(self.id, name)
+            if location == -1:
+                # built-ins such as gl_VertexID
+                continue
+            self._attributes[name] = (location, gl_type)
+
+        # ------------ uniform blocks ------------ #
+
+        for block_name, binding in NightUniformBuffer.BINDINGS.items():
+            block_index = glGetUniformBlockIndex(self.id, block_name)
+            if block_index != GL_INVALID_INDEX:
+                glUniformBlockBinding(self.id, block_index, binding)
+
+    def use(self):
+        """binds the program if it is not already bound."""
+        NightState.use_program(self.id)
+
+    def get_uniform_location(self, variable_name):
+        """returns the cached uniform location, or -1 if the uniform is
+        not active in the program."""
+        uniform = self.uniforms.get(variable_name)
+        if uniform is None:
+            if variable_name not in self._missing:
+                self._missing.add(variable_name)
+                print(f"Warning: Uniform {variable_name} not found in program {self.id}.")
+            return -1
+        return uniform[0]
+
+    def get_attribute_location(self, variable_name):
+        """returns the cached attribute location, or -1 if the attribute
+        is not active in the program."""
+        attribute = self.attributes.get(variable_name)
+        if attribute is None:
+            if variable_name not in self._missing:
+                self._missing.add(variable_name)
+                print(f"Warning: Attribute {variable_name} not found in program {self.id}")
+            return -1
+        return attribute[0]
+
+    # ------------------------------------------------------------
+    # attributes
+    # ------------------------------------------------------------
+
+    def set_attribute_pointer(self, buffer, variable_name, data_type, stride=0, offset=None, divisor=0):
+        """sets the attribute pointer for variable using the cached
+        location. a divisor of 1 advances the attribute per instance
+        instead of per vertex."""
+
+        location = self.get_attribute_location(variable_name)
+        if location == -1:
+            return
+
+        glBindBuffer(GL_ARRAY_BUFFER, buffer)
+
+        # -------------- mat4 (columns) -------------- #
+
+        # a mat4 attribute takes four consecutive locations, one per
+        # column. the buffer must hold column major matrices.
+
+        if data_type == "mat4":
+            stride = stride or 64
+            offset = offset or 0
+            for column in range(4):
+                glVertexAttribPointer(location + column, 4, GL_FLOAT, False, stride, ctypes.c_void_p(offset + 16*column))
+                glEnableVertexAttribArray(location + column)
+                glVertexAttribDivisor(location + column, divisor)
+            return
+
+        # --------------- vectors --------------- #
+
+        sizes = {"float": 1, "vec2": 2, "vec3": 3, "vec4": 4}
+        if data_type not in sizes:
+            raise Exception(f"Warning: Wrong attribute type: {data_type}.")
+
+        glVertexAttribPointer(location, sizes[data_type], GL_FLOAT, False, stride, ctypes.c_void_p(offset))
+        glEnableVertexAttribArray(location)
+        if divisor:
+            glVertexAttribDivisor(location, divisor)
+
+    # ------------------------------------------------------------
+    # typed uniform setters
+    # ------------------------------------------------------------
+
+    def set_int(self, variable_name, data):
+        location = self.get_uniform_location(variable_name)
+        if location != -1:
+            self.use()
+            glUniform1i(location, int(data))
+
+    def set_bool(self, variable_name, data):
+        self.set_int(variable_name, data)
+
+    def set_float(self, variable_name, data):
+        location = self.get_uniform_location(variable_name)
+        if location != -1:
+            self.use()
+            glUniform1f(location, data)
+
+    def set_vec2(self, variable_name, data):
+        location = self.get_uniform_location(variable_name)
+        if location != -1:
+            self.use()
+            glUniform2f(location, data[0], data[1])
+
+    def set_vec3(self, variable_name, data):
+        location = self.get_uniform_location(variable_name)
+        if location != -1:
+            self.use()
+            glUniform3f(location, data[0], data[1], data[2])
+
+    def set_vec4(self, variable_name, data):
+        location = self.get_uniform_location(variable_name)
+        if location != -1:
+            self.use()
+            glUniform4f(location, data[0], data[1], data[2], data[3])
+
+    def set_mat4(self, variable_name, data):
+        location = self.get_uniform_location(variable_name)
+        if location != -1:
+            self.use()
+            glUniformMatrix4fv(location, 1, GL_TRUE, data)
+
+    def set_sampler2D(self, variable_name, data):
+        location = self.get_uniform_location(variable_name)
+        if location != -1:
+            texture, unit = data
+            self.use()
+            NightState.bind_texture(unit, texture)
+            glUniform1i(location, unit)
+
+    def set_uniform(self, variable_name, data_type, data):
+        """generic setter with the same data types as
+        NightUtils.set_uniform."""
+        setter = getattr(self, "set_" + data_type, None)
+        if setter is None:
+            raise Exception(f"Warning: Wrong uniform type {data_type}.")
+        setter(variable_name, data)
@@ -0,0 +1,172 @@
+# NightQuaternion.py
+
+import numpy as np
+
+class NightQuaternion:
+
+    """quaternion and transform math on arrays. quaternions are stored
+    (x, y, z, w) like pybullet. every function takes a single value or
+    an array of N along the leading axes, and writes into out if
+    given."""
+
+    @staticmethod
+    def get_identity(count=None):
+        if count is None:
+            return np.array([0.0, 0.0, 0.0, 1.0])
+        q = np.zeros((count, 4))
+        q[:, 3] = 1.0
+        return q
+
+    @staticmethod
+    def normalize(q, out=None):
+        q = np.asarray(q)
+        return np.divide(q, np.linalg.norm(q, axis=-1, keepdims=True), out=out)
+
+    @staticmethod
+    def multiply(a, b, out=None):
+        """returns the hamilton product a * b (b applied first)."""
+        a = np.asarray(a)
+        b = np.asarray(b)
+        ax, ay, az, aw = a[..., 0], a[..., 1], a[..., 2], a[..., 3]
+        bx, by, bz, bw = b[..., 0], b[..., 1], b[..., 2], b[..., 3]
+        if out is None:
+            out = np.empty(np.broadcast_shapes(a.shape, b.shape), dtype=np.result_type(a, b, np.float32))
+        out[..., 0] = aw*bx + ax*bw + ay*bz - az*by
+        out[..., 1] = aw*by - ax*bz + ay*bw + az*bx
+        out[..., 2] = aw*bz + ax*by - ay*bx + az*bw
+        out[..., 3] = aw*bw - ax*bx - ay*by - az*bz
+        return out
+
+    @staticmethod
+    def conjugate(q, out=None):
+        q = np.asarray(q)
+        if out is None:
+            out = np.empty_like(q, dtype=np.result_type(q, np.float32))
+        out[..., 0:3] = -q[..., 0:3]
+        out[..., 3] = q[..., 3]
+        return out
+
+    # ------------------------------------------------------------
+    # matrices
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def to_matrix(q, out=None):
+        """returns the (..., 3, 3) rotation matrices of unit
+        quaternions."""
+        q = np.asarray(q)
+        x, y, z, w = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+        if out is None:
+            out = np.empty(q.shape[:-1] + (3, 3), dtype=np.result_type(q, np.float32))
+        xx, yy, zz = x*x, y*y, z*z
+        xy, xz, yz = x*y, x*z, y*z
+        wx, wy, wz = w*x, w*y, w*z
+        out[..., 0, 0] = 1 - 2*(yy + zz)
+        out[..., 0, 1] = 2*(xy - wz)
+        out[..., 0, 2] = 2*(xz + wy)
+        out[..., 1, 0] = 2*(xy + wz)
+        out[..., 1, 1] = 1 - 2*(xx + zz)
+        out[..., 1, 2] = 2*(yz - wx)
+        out[..., 2, 0] = 2*(xz - wy)
+        out[..., 2, 1] = 2*(yz + wx)
+        out[..., 2, 2] = 1 - 2*(xx + yy)
+        return out
+
+    @staticmethod
+    def from_matrix(m, out=None):
+        """returns the unit quaternions of (..., 3, 3) rotation
+        matrices (or the rotation part of (..., 4, 4) matrices)."""
+        m = np.asarray(m, dtype=np.float64)[..., 0:3, 0:3]
+        if m.ndim == 2:
+            return NightQuaternion._from_matrix_single(m, out)
+        m00, m11, m22 = m[..., 0, 0], m[..., 1, 1], m[..., 2, 2]
+        trace = m00 + m11 + m22
+
+        # each candidate is 4 times the quaternion scaled by one of its
+        # components. the one built on the largest component is the
+        # most accurate.
+        candidates = np.stack([
+            np.stack([1 + m00 - m11 - m22, m[..., 0, 1] + m[..., 1, 0], m[..., 0, 2] + m[..., 2, 0], m[..., 2, 1] - m[..., 1, 2]], axis=-1),
+            np.stack([m[..., 0, 1] + m[..., 1, 0], 1 - m00 + m11 - m22, m[..., 1, 2] + m[..., 2, 1], m[..., 0, 2] - m[..., 2, 0]], axis=-1),
+            np.stack([m[..., 0, 2] + m[..., 2, 0], m[..., 1, 2] + m[..., 2, 1], 1 - m00 - m11 + m22, m[..., 1, 0] - m[..., 0, 1]], axis=-1),
+            np.stack([m[..., 2, 1] - m[..., 1, 2], m[..., 0, 2] - m[..., 2, 0], m[..., 1, 0] - m[..., 0, 1], 1 + trace], axis=-1),
+        ], axis=-2)
+        choice = np.argmax(np.stack([m00, m11, m22, trace], axis=-1), axis=-1)
+        q = np.take_along_axis(candidates, choice[..., None, None], axis=-2)[..., 0, :]
+        return NightQuaternion.normalize(q, out=out)
+
+    @staticmethod
+    def _from_matrix_single(m, out=None):
+        """scalar version of from_matrix, much faster for one matrix."""
+        (m00, m01, m02), (m10, m11, m12), (m20, m21, m22) = m.tolist()
+        trace = m00 + m11 + m22
+        if trace >= m00 and trace >= m11 and trace >= m22:
+            q = (m21 - m12, m02 - m20, m10 - m01, 1 + trace)
+        elif m00 >= m11 and m00 >= m22:
+            q = (1 + m00 - m11 - m22, m01 + m10, m02 + m20, m21 - m12)
+        elif m11 >= m22:
+            q = (m01 + m10, 1 - m00 + m11 - m22, m12 + m21, m02 - m20)
+        else:
+            q = (m02 + m20, m12 + m21, 1 - m00 - m11 + m22, m10 - m01)
+        if out is None:
+            out = np.empty(4)
+        out[:] = q
+        out /= np.sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2] + q[3]*q[3])
+        return out
+
+    # ------------------------------------------------------------
+    # transforms
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def compose(positions, quaternions, scales=None, out=None):
+        """returns (..., 4, 4) float32 matrices translating, rotating
+        and scaling (applied in reverse order)."""
+        positions = np.asarray(positions)
+        quaternions = np.asarray(quaternions)
+        if out is None:
+            out = np.zeros(quaternions.shape[:-1] + (4, 4), dtype=np.float32)
+        else:
+            out[..., 3, 0:3] = 0.0
+        NightQuaternion.to_matrix(quaternions, out=out[..., 0:3, 0:3])
+        if scales is not None:
+            out[..., 0:3, 0:3] *= np.asarray(scales)[..., None, :]
+        out[..., 0:3, 3] = positions
+        out[..., 3, 3] = 1.0
+        return out
+
+    @staticmethod
+    def decompose(matrices):
+        """returns (positions, quaternions, scales) of (..., 4, 4)
+        matrices without shear."""
+        matrices = np.asarray(matrices)
+        positions = matrices[..., 0:3, 3].copy()
+        scales = np.linalg.norm(matrices[..., 0:3, 0:3], axis=-2)
+        rotations = matrices[..., 0:3, 0:3] / scales[..., None, :]
+        return positions, NightQuaternion.from_matrix(rotations), scales
+
+    # ------------------------------------------------------------
+    # interpolation
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def slerp(a, b, t, out=None):
+        """spherical interpolation from a (t = 0) to b (t = 1) along
+        the shortest arc. t may be a scalar or one value per pair."""
+        a = np.asarray(a, dtype=np.float64)
+        b = np.asarray(b, dtype=np.float64)
+        t = np.asarray(t, dtype=np.float64)[..., None]
+
+        dot = np.sum(a * b, axis=-1, keepdims=True)
+        # take the shortest arc
+        b = np.where(dot < 0, -b, b)
+        dot = np.abs(dot)
+
+        # nearly parallel: fall back to normalized lerp
+        linear = dot > 0.9995
+        angle = np.arccos(np.clip(dot, -1.0, 1.0))
+        sin_angle = np.where(linear, 1.0, np.sin(angle))
+        weight_a = np.where(linear, 1 - t, np.sin((1 - t) * angle) / sin_angle)
+        weight_b = np.where(linear, t, np.sin(t * angle) / sin_angle)
+
+        return NightQuaternion.normalize(weight_a * a + weight_b * b, out=out)
@@ -0,0 +1,56 @@
+# NightRenderQueue.py
+
+import numpy as np
+
+class NightRenderQueue:
+
+    """collects the objects to draw in a frame and sorts them so that
+    program, texture and vao switches happen as rarely as possible."""
+
+    PASS_OPAQUE = 0
+    PASS_BLENDED = 1
+
+    def __init__(self):
+        self.items = []
+
+    def clear(self):
+        self.items.clear()
+
+    def add(self, obj, camera_position, world_matrix=None):
+        """adds object to the queue. the world matrix is computed once
+        (here, unless given) and reused when drawing."""
+
+        if world_matrix is None:
+            world_matrix = obj.get_world_matrix()
+        offset = world_matrix[0:3, 3] - camera_position
+        depth = float(np.dot(offset, offset))
+
+        material = obj.material
+        program = material.program.id
+        texture = getattr(material, "gl_texture", 0)
+
+        # ------------------------------------------------------------
+        # sort keys
+        # ------------------------------------------------------------
+
+        # opaque objects are grouped by state and drawn front to back
+        # within each group. blended objects must be drawn back to
+        # front, so depth comes before state.
+
+        if material.transparent:
+            key = (NightRenderQueue.PASS_BLENDED, -depth, program, texture, obj.vao)
+        else:
+            key = (NightRenderQueue.PASS_OPAQUE, program, texture, obj.vao, depth)
+
+        self.items.append((key, obj, world_matrix))
+
+    def sort(self):
+        self.items.sort(key=lambda item: item[0])
+
+    def __iter__(self):
+        """yields (render pass, object, world matrix) in draw order."""
+        for key, obj, world_matrix in self.items:
+            yield key[0], obj, world_matrix
+
+    def __len__(self):
+        return len(self.items)
@@ -0,0 +1,115 @@
+# NightState.py
+
+from OpenGL.GL import *
+
+class NightState:
+
+    """shadows the current gl state and only issues gl calls when a
+    value actually changes. there is a single gl context, so the state
+    is stored on the class."""
+
+    _program = None
+    _vao = None
+    _point_size = None
+    _line_width = None
+    _polygon_mode = None
+    _depth_mask = None
+    _capabilities = {}
+    _active_texture = None
+    _textures = {}
+
+    calls_issued = 0
+    calls_skipped = 0
+
+    @staticmethod
+    def reset():
+        """forgets the shadowed state. call after issuing gl calls
+        outside of NightState."""
+        NightState._program = None
+        NightState._vao = None
+        NightState._point_size = None
+        NightState._line_width = None
+        NightState._polygon_mode = None
+        NightState._depth_mask = None
+        NightState._capabilities = {}
+        NightState._active_texture = None
+        NightState._textures = {}
+
+    @staticmethod
+    def reset_counters():
+        NightState.calls_issued = 0
+        NightState.calls_skipped = 0
+
+    @staticmethod
+    def _changed(changed):
+        """updates call counters. returns whether to issue the call."""
+        if changed:
+            NightState.calls_issued += 1
+        else:
+            NightState.calls_skipped += 1
+        return changed
+
+    # ------------------------------------------------------------
+    # state setters
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def use_program(program):
+        if NightState._changed(NightState._program != program):
+            glUseProgram(program)
+            NightState._program = program
+
+    @staticmethod
+    def bind_vertex_array(vao):
+        if NightState._changed(NightState._vao != vao):
+            glBindVertexArray(vao)
+            NightState._vao = vao
+
+    @staticmethod
+    def point_size(size):
+        if NightState._changed(NightState._point_size != size):
+            glPointSize(size)
+            NightState._point_size = size
+
+    @staticmethod
+    def line_width(width):
+        if NightState._changed(NightState._line_width != width):
+            glLineWidth(width)
+            NightState._line_width = width
+
+    @staticmethod
+    def polygon_mode(mode):
+        if NightState._changed(NightState._polygon_mode != mode):
+            glPolygonMode(GL_FRONT_AND_BACK, mode)
+            NightState._polygon_mode = mode
+
+    @staticmethod
+    def depth_mask(enabled):
+        enabled = bool(enabled)
+        if NightState._changed(NightState._depth_mask != enabled):
+            glDepthMask(GL_TRUE if enabled else GL_FALSE)
+            NightState._depth_mask = enabled
+
+    @staticmethod
+    def set_capability(capability, enabled):
+        """enables or disables a gl capability such as GL_CULL_FACE."""
+        enabled = bool(enabled)
+        if NightState._changed(NightState._capabilities.get(capability) != enabled):
+            if enabled:
+                glEnable(capability)
+            else:
+                glDisable(capability)
+            NightState._capabilities[capability] = enabled
+
+    @staticmethod
+    def bind_texture(unit, texture, target=GL_TEXTURE_2D):
+        """binds texture to texture unit."""
+        if NightState._textures.get((unit, target)) == texture:
+            NightState._changed(False)
+            return
+        if NightState._changed(NightState._active_texture != unit):
+            glActiveTexture(GL_TEXTURE0 + unit)
+            NightState._active_texture = unit
+        NightState._changed(True)
+        glBindTexture(target, texture)
+        NightState._textures[(unit, target)] = texture
@@ -0,0 +1,148 @@
+# NightTransformStore.py
+
+from NightEngine.NightMatrix import NightMatrix
+import numpy as np
+
+class NightTransformStore:
+    def __init__(self, capacity=64):
+
+        """scene wide structure of arrays for transforms. the local
+        transforms of all member objects live in one (N, 4, 4) array
+        and the objects' transform is a view into it. world matrices
+        are computed for all members at once, one hierarchy level per
+        batched matmul, whenever any member moved."""
+
+        self.local = np.tile(NightMatrix.get_identity(), (capacity, 1, 1))
+        self.world = self.local.copy()
+        self.parents = np.full(capacity, -1, dtype=np.int32) # -1 for roots
+        self.objects = [None] * capacity
+        self.count = 0 # slots in use, including freed ones
+        self.free = []
+        self.dirty = True
+        self._levels = None # slot indices per depth, None if stale
+
+    # ------------------------------------------------------------
+    # membership
+    # ------------------------------------------------------------
+
+    def add_tree(self, obj):
+        """adds object and its descendants."""
+        for node in obj.get_descendants():
+            self.add(node)
+
+    def add(self, obj):
+        if obj._store is self:
+            return
+        if obj._store is not None:
+            obj._store.remove(obj)
+
+        if self.free:
+            index = self.free.pop()
+        else:
+            if self.count == len(self.objects):
+                self._grow()
+            index = self.count
+            self.count += 1
+
+        self.local[index] = obj._transform
+        self.objects[index] = obj
+        obj._store = self
+        obj._store_index = index
+        obj._transform = self.local[index]
+
+        # link to the parent and to children already in the store
+        parent = obj.parent
+        self.parents[index] = parent._store_index if parent is not None and parent._store is self else -1
+        for child in obj.children:
+            if child._store is self:
+                self.parents[child._store_index] = index
+
+        self._levels = None
+        self.dirty = True
+
+    def remove(self, obj):
+        """removes object and its descendants, which get their own
+        copies of their transforms. members therefore never have an
+        ancestor outside the store below one inside it."""
+        if obj._store is not self:
+            return
+        for node in obj.get_descendants():
+            if node._store is not self:
+                continue
+            index = node._store_index
+            node._transform = self.local[index].copy()
+            node._store = None
+            node._store_index = -1
+            node._world_matrix = None
+
+            self.objects[index] = None
+            self.parents[index] = -1
+            self.local[index] = NightMatrix.get_identity()
+            self.free.append(index)
+
+        self._levels = None
+        self.dirty = True
+
+    def set_parent(self, obj):
+        """updates the parent index after obj.parent changed."""
+        parent = obj.parent
+        self.parents[obj._store_index] = parent._store_index if parent is not None and parent._store is self else -1
+        self._levels = None
+        self.dirty = True
+
+    def _grow(self):
+        """doubles the capacity. member transforms are rebound to views
+        of the new array."""
+        capacity = 2 * len(self.objects)
+        local = np.tile(NightMatrix.get_identity(), (capacity, 1, 1))
+        local[:self.count] = self.local[:self.count]
+        parents = np.full(capacity, -1, dtype=np.int32)
+        parents[:self.count] = self.parents[:self.count]
+
+        self.local = local
+        self.world = local.copy()
+        self.parents = parents
+        self.objects.extend([None] * (capacity - len(self.objects)))
+        for index, obj in enumerate(self.objects[:self.count]):
+            if obj is not None:
+                obj._transform = self.local[index]
+        self.dirty = True
+
+    # ------------------------------------------------------------
+    # update
+    # ------------------------------------------------------------
+
+    def _build_levels(self):
+        parents = self.parents[:self.count]
+        depth = np.zeros(self.count, dtype=np.int32)
+        ancestor = parents.copy()
+        while True:
+            has_parent = ancestor >= 0
+            if not np.any(has_parent):
+                break
+            depth[has_parent] += 1
+            ancestor[has_parent] = parents[ancestor[has_parent]]
+        self._levels = [np.nonzero(depth == level)[0] for level in range(depth.max(initial=0) + 1)]
+        # roots whose parent is outside the store
+        self._external = [index for index in self._levels[0]
+                          if self.objects[index] is not None and self.objects[index].parent is not None]
+
+    def update(self):
+        """recomputes all world matrices if any member moved."""
+        if not self.dirty:
+            return
+        if self._levels is None:
+            self._build_levels()
+
+        local, world = self.local, self.world
+        roots = self._levels[0]
+        world[roots] = local[roots]
+        for index in self._external:
+            world[index] = self.objects[index].parent.get_world_matrix() @ local[index]
+        for indices in self._levels[1:]:
+            world[indices] = np.matmul(world[self.parents[indices]], local[indices])
+        self.dirty = False
+
+    def get_world_matrix(self, obj):
+        self.update()
+        return self.world[obj._store_index]
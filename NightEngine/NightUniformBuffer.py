@@ -0,0 +1,39 @@
+# NightUniformBuffer.py
+
+from OpenGL.GL import *
+import numpy as np
+
+class NightUniformBuffer:
+
+    """std140 uniform buffer bound to a fixed binding point. programs
+    declaring a block listed in BINDINGS get it bound automatically."""
+
+    # block name -> binding point
+    BINDINGS = {
+        "Camera": 0,
+        "Light": 1,
+    }
+
+    def __init__(self, block_name, size):
+
+        self.block_name = block_name
+        self.binding = NightUniformBuffer.BINDINGS[block_name]
+        self.size = size
+
+        # last uploaded contents, to skip identical uploads
+        self._data = None
+
+        self.ubo = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferData(GL_UNIFORM_BUFFER, size, None, GL_DYNAMIC_DRAW)
+        glBindBufferBase(GL_UNIFORM_BUFFER, self.binding, self.ubo)
+
+    def update(self, data:np.ndarray):
+        """uploads data to the buffer if it changed since the last
+        upload."""
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        if self._data is not None and np.array_equal(self._data, data):
+            return
+        self._data = data.copy()
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, data.nbytes, data)
@@ -1,6 +1,7 @@
 # NightUtils.py
 
 from OpenGL.GL import *
+from NightEngine.NightState import NightState
 import numpy as np
 
 class NightUtils:
@@ -24,8 +25,10 @@ class NightUtils:
         return shader
 
     @staticmethod
-    def create_program(vertex_shader_code, fragment_shader_code):
-        """creates and links program from shader code. returns program reference."""
+    def create_program(vertex_shader_code, fragment_shader_code, retrievable=False):
+        """creates and links program from shader code. returns program
+        reference. if retrievable, the driver is asked to keep the
+        linked binary available to glGetProgramBinary."""
 
         # ------------ create shaders ------------ #
         
@@ -38,6 +41,8 @@ class NightUtils:
 
         glAttachShader(program, shader_vertex)
         glAttachShader(program, shader_fragment)
+        if retrievable:
+            glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
         glLinkProgram(program)
 
         # ----------- check if success ----------- #
@@ -52,9 +57,16 @@ class NightUtils:
     def create_vao():
         """creates vbo, binds it and returns its reference."""
         vao = glGenVertexArrays(1)
-        glBindVertexArray(vao)
+        NightState.bind_vertex_array(vao)
         return vao
 
+    @staticmethod
+    def delete_vao(vao):
+        """deletes vao and forgets it if it is the bound one."""
+        if NightState._vao == vao:
+            NightState.bind_vertex_array(0)
+        glDeleteVertexArrays(1, [vao])
+
     @staticmethod
     def create_vbo(data):
         """creates vbo, binds it, sends data to it and returns reference. ."""
@@ -63,6 +75,15 @@ class NightUtils:
         glBufferData(GL_ARRAY_BUFFER, np.array(data, dtype=np.float32).ravel(), GL_STATIC_DRAW)
         return vbo
 
+    @staticmethod
+    def create_ebo(data):
+        """creates index buffer, binds it to the current vao, sends data
+        to it and returns reference."""
+        ebo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, np.array(data, dtype=np.uint32).ravel(), GL_STATIC_DRAW)
+        return ebo
+
     @staticmethod
     def set_attribute_pointer(program, buffer, variable_name, data_type, stride=0, offset=None):
         """sets the attribute pointer for variable in shader program."""
@@ -101,7 +122,7 @@ class NightUtils:
 
         # ------------- find uniform ------------- #
 
-        glUseProgram(program)
+        NightState.use_program(program)
         
         variable_reference = glGetUniformLocation(program, variable_name)
 
@@ -127,8 +148,7 @@ class NightUtils:
             glUniformMatrix4fv(variable_reference, 1, GL_TRUE, data)
         elif data_type == "sampler2D":
             texture, unit = data
-            glActiveTexture(GL_TEXTURE0 + unit)
-            glBindTexture(GL_TEXTURE_2D, texture)
+            NightState.bind_texture(unit, texture)
             glUniform1i(variable_reference, unit)
         else:
             raise Exception(f"Warning: Wrong uniform type {data_type}.")
@@ -0,0 +1,80 @@
+# NightWorld.py
+
+import pybullet as p
+
+class NightWorld:
+
+    # world of objects and meshes not given one, connected on first use
+    _default = None
+
+    def __init__(self, gravity=(0.0, 0.0, 0.0), time_step=1.0 / 240.0):
+
+        """one isolated pybullet world, identified by its physics client
+        id. bodies, collision shapes and gravity belong to the world
+        they were created in, so several worlds can be simulated side
+        by side in one process. plain p.* calls without a
+        physicsClientId act on the first world connected, which is
+        the default world unless another was created before it."""
+
+        self.client = p.connect(p.DIRECT)
+        self.gravity = tuple(gravity)
+        self.time_step = time_step
+
+        # collision shape arguments -> shape id in this world
+        self._shapes = {}
+
+        p.setGravity(*self.gravity, physicsClientId=self.client)
+        p.setTimeStep(time_step, physicsClientId=self.client)
+
+    @staticmethod
+    def get_default():
+        """returns the world used when none is given."""
+        if NightWorld._default is None:
+            NightWorld._default = NightWorld()
+        return NightWorld._default
+
+    def get_collision_shape(self, mesh):
+        """returns the collision shape of mesh in this world, or None.
+        shapes recorded with mesh.create_collision_shape are created on
+        first use, once per distinct set of arguments."""
+
+        if mesh is None:
+            return None
+
+        if mesh.collision_shape_args is None:
+            # a shape id set directly exists in the default world only
+            if mesh._collision_shape is not None and self is not NightWorld._default:
+                raise Exception("NightWorld: collision shape was set with set_collision_shape and only exists in the default world.")
+            return mesh._collision_shape
+
+        key = repr(sorted(mesh.collision_shape_args.items()))
+        shape = self._shapes.get(key)
+        if shape is None:
+            shape = p.createCollisionShape(**mesh.collision_shape_args, physicsClientId=self.client)
+            self._shapes[key] = shape
+        return shape
+
+    def create_multibody(self, **kwargs):
+        return p.createMultiBody(**kwargs, physicsClientId=self.client)
+
+    def set_gravity(self, x=0.0, y=-9.8, z=0.0):
+        self.gravity = (x, y, z)
+        p.setGravity(x, y, z, physicsClientId=self.client)
+
+    def set_time_step(self, time_step):
+        self.time_step = time_step
+        p.setTimeStep(time_step, physicsClientId=self.client)
+
+    def step(self):
+        p.stepSimulation(physicsClientId=self.client)
+
+    def call(self, name, *args, **kwargs):
+        """returns p.<name>(*args, **kwargs) run in this world."""
+        return getattr(p, name)(*args, physicsClientId=self.client, **kwargs)
+
+    def disconnect(self):
+        """removes the world with all its bodies and shapes."""
+        p.disconnect(physicsClientId=self.client)
+        self._shapes = {}
+        if NightWorld._default is self:
+            NightWorld._default = None
@@ -1,16 +1,26 @@
 # NightObject.py
 
 from NightEngine.NightMatrix import NightMatrix
+from NightEngine.NightQuaternion import NightQuaternion
 from NightEngine.NightUtils import NightUtils
-from NightEngine.Materials.NightMaterialDefault import NightMaterialDefault
-from NightEngine.Materials.NightMaterialLight import NightMaterialLight
-from scipy.spatial.transform import Rotation as R
+from NightEngine.Meshes.NightMeshCache import NightMeshCache
+from NightEngine.NightWorld import NightWorld
 from OpenGL.GL import *
 import pybullet as p
 import numpy as np
 import glfw
 
 class NightObject:
+
+    # objects drawing the same mesh buffer with the same program share
+    # one vao. subclasses that add their own attributes to the vao
+    # must own it.
+    share_vao = True
+
+    # physics_update calls per simulated second, None for every
+    # physics step
+    physics_update_rate = None
+
     def __init__(self, mesh=None, material=None, mass=0.0):
 
         """initializes the object by locating the mesh attributes in
@@ -18,23 +28,57 @@ class NightObject:
 
         # ---------- initial transform ---------- #
 
-        self.transform = NightMatrix.get_identity()
+        self._transform = NightMatrix.get_identity()
+
+        # cached product of the ancestors' transforms and this one,
+        # None while dirty
+        self._world_matrix = None
+
+        # NightTransformStore holding the transform, if any
+        self._store = None
+        self._store_index = -1
 
         # -------------- hierarchy -------------- #
 
         self.parent = None
         self.children = []
 
+        # bvh this object is a leaf of, and the bvh over this object's
+        # descendants if it is a scene root
+        self._bvh = None
+        self.scene_bvh = None
+
+        # cached depth-first lists of descendants (all, and visible
+        # only), dropped whenever the subtree or a visibility changes
+        self._traversal = None
+        self._traversal_visible = None
+
         # -------------- properties -------------- #
 
-        self.visible = True
+        self._visible = True
+
+        # static objects never move and can be merged into a static
+        # batch with others whose materials draw alike. opt in, as
+        # mass 0 objects such as the camera are often moved by code.
+        self.static = False
+        self._static_batch = None
         
         self.mass = mass
+        # physics world of the body, set by init_multibody
+        self.world = None
         self.physics_id = None
+        self.multibody_args = None
 
         self.mesh = mesh
         self.material = material
 
+        # gpu resources, created by init_buffers before the first draw
+        self.layout = None
+        self.mesh_buffer = None
+        self.vao = None
+        # vbos and ebo owned by this object, for meshes not interleaved
+        self._owned_buffers = []
+
         # ------------ check if data ------------ #
 
         # if this object has no mesh or material (such as scene), exit
@@ -43,31 +87,6 @@ class NightObject:
         if not mesh or not material:
             return
 
-        # ------------- vertex array ------------- #
-
-        self.vao = NightUtils.create_vao()
-
-        # ----------------- mesh ----------------- #
-
-        # for each attrib in mesh, create vbo and set attrib pointer
-        # on material program
-
-        for variable_name, attribute_dict in mesh.attributes.items():
-            # --------- material point light --------- #
-            if isinstance(self.material, NightMaterialLight) and variable_name not in ["vertex_position"]:
-                continue
-            # ----------- material default ----------- #
-            if isinstance(self.material, NightMaterialDefault) and variable_name not in ["vertex_position", "vertex_color", "vertex_normal"]:
-                continue
-            # ----------- material texture ----------- #
-            if isinstance(self.material, NightMaterialDefault) and variable_name not in ["vertex_position", "vertex_color", "vertex_normal", "vertex_uv"]:
-                continue
-            vbo = NightUtils.create_vbo(attribute_dict["data"])
-            NightUtils.set_attribute_pointer(material.program,
-                                             vbo,
-                                             variable_name,
-                                             attribute_dict["data_type"])
-
         self.linkMasses = []
         self.linkCollisionShapeIndices = []
         self.linkVisualShapeIndices = []
@@ -80,11 +99,18 @@ class NightObject:
         self.linkJointAxis = []
         self.linkReferences = []
         
-    def init_multibody(self):
-        if self.mesh and self.mesh.collision_shape != None:
-            self.physics_id = p.createMultiBody(
+    def init_multibody(self, world=None):
+        """creates the pybullet body in world (the default world if
+        None). the arguments are kept in multibody_args so the body can
+        be created again in another physics world."""
+        world = world or NightWorld.get_default()
+        shape = world.get_collision_shape(self.mesh)
+        if shape is not None:
+            # link shapes are looked up in the same world
+            self.linkCollisionShapeIndices = [world.get_collision_shape(link.mesh) for link in self.linkReferences]
+            self.multibody_args = dict(
                 baseMass=self.mass,
-                baseCollisionShapeIndex=self.mesh.collision_shape,
+                baseCollisionShapeIndex=shape,
                 basePosition=self.get_position(),
                 baseOrientation=self.get_orientation(),
                 linkMasses=self.linkMasses,
@@ -98,11 +124,48 @@ class NightObject:
                 linkJointTypes=self.linkJointTypes,
                 linkJointAxis=self.linkJointAxis,
                 useMaximalCoordinates=False)
+            self.world = world
+            self.physics_id = world.create_multibody(**self.multibody_args)
+
+    def init_buffers(self):
+        """uploads the mesh and creates the vao. called by the engine
+        before the object is first drawn, so objects can be created
+        without a gl context."""
+
+        mesh = self.mesh
+        material = self.material
+
+        # only the attributes the material program actually reads are
+        # uploaded.
+
+        variable_names = [name for name in mesh.attributes if name in material.program.attributes]
+
+        if mesh.interleaved:
+            # one interleaved vbo for all attributes, shared through
+            # the mesh cache by every object with the same mesh data
+            self.layout = mesh.get_vertex_layout(variable_names)
+            self.mesh_buffer = NightMeshCache.acquire(mesh, self.layout)
+            if self.share_vao:
+                self.vao = NightMeshCache.acquire_vao(self.mesh_buffer, material.program)
+            else:
+                self.vao = NightMeshCache.create_vao(self.mesh_buffer, material.program)
+        else:
+            # one vbo per attribute, owned by this object
+            self.vao = NightUtils.create_vao()
+            for variable_name in variable_names:
+                attribute_dict = mesh.attributes[variable_name]
+                vbo = NightUtils.create_vbo(attribute_dict["data"])
+                material.program.set_attribute_pointer(vbo,
+                                                       variable_name,
+                                                       attribute_dict["data_type"])
+                self._owned_buffers.append(vbo)
+            if mesh.indices is not None:
+                self.ebo = NightUtils.create_ebo(mesh.indices)
+                self._owned_buffers.append(self.ebo)
 
     def add_link(self, obj, joint_type, inertial_frame_position=[0, 0, 0], inertial_frame_orientation=[0, 0, 0, 1], axis=[1, 0, 0]):
         link_index_new = len(self.linkParentIndices)
         self.linkMasses.append(obj.mass)
-        self.linkCollisionShapeIndices.append(obj.mesh.collision_shape)
         self.linkVisualShapeIndices.append(-1)
         self.linkPositions.append(obj.get_position())
         self.linkOrientations.append(obj.get_orientation().tolist())
@@ -114,22 +177,104 @@ class NightObject:
         self.linkReferences.append(obj)
         return link_index_new
         
+    def release(self):
+        """releases this object's gpu resources: its references to
+        shared buffers, or the buffers it owns. remove() calls it for
+        the removed subtree. if the object is drawn again, draw_scene
+        creates them again with init_buffers."""
+        if self.vao is None:
+            return
+        if self.mesh_buffer is None:
+            # not interleaved, the vao and buffers are this object's
+            NightUtils.delete_vao(self.vao)
+            if self._owned_buffers:
+                glDeleteBuffers(len(self._owned_buffers), self._owned_buffers)
+            self._owned_buffers = []
+        else:
+            if self.share_vao:
+                NightMeshCache.release_vao(self.mesh_buffer, self.material.program)
+            else:
+                NightUtils.delete_vao(self.vao)
+            NightMeshCache.release(self.mesh_buffer)
+            self.mesh_buffer = None
+        self.vao = None
+
     def check_pressed(self, window, glfw_key):
+        # no keys are pressed without a window (headless)
+        if window is None:
+            return False
         return glfw.get_key(window, glfw_key) == glfw.PRESS
 
     def move(self, window, time_delta: float):
         # override
         pass
 
+    def physics_update(self, dt: float):
+        # override. called by NightBase.run in the fixed step loop,
+        # before the physics step, at physics_update_rate. dt is
+        # the simulated time since the last call. apply forces here:
+        # pybullet clears them after every step.
+        pass
+
+    @property
+    def transform(self):
+        return self._transform
+
+    @transform.setter
+    def transform(self, matrix):
+        if self._store is not None:
+            # keep the view into the store
+            self._transform[...] = matrix
+        else:
+            self._transform = matrix
+        self._on_transform_changed()
+
+    @property
+    def visible(self):
+        return self._visible
+
+    @visible.setter
+    def visible(self, value):
+        if value != self._visible:
+            self._visible = value
+            self._invalidate_traversal()
+
     def add(self, child):
         """adds child to object hierarchy."""
         self.children.append(child)
         child.parent = self
+        if child._store is not None:
+            child._store.set_parent(child)
+        if self._store is not None:
+            self._store.add_tree(child)
+        child._on_transform_changed()
+        self._invalidate_traversal()
+        bvh = self.get_root().scene_bvh
+        if bvh is not None:
+            for node in child.get_descendants():
+                bvh.insert(node)
 
     def remove(self, child):
-        """removes child to object hierarchy."""
+        """removes child to object hierarchy. the gpu resources of the
+        subtree are released, and created again if it is drawn
+        again."""
         self.children.remove(child)
         child.parent = None
+        # the subtree leaves the store it shared with the scene
+        if child._store is not None:
+            child._store.remove(child)
+        child._on_transform_changed()
+        self._invalidate_traversal()
+        for node in child.get_descendants():
+            if node._bvh is not None:
+                node._bvh.remove(node)
+            node.release()
+
+    def get_root(self):
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
 
     def get_descendants(self, include_self=True):
         """returns a list of all descendants."""
@@ -141,11 +286,58 @@ class NightObject:
             nodes_to_process.extend(reversed(node.children))
         return descendants
 
+    def get_traversal(self, visible_only=False):
+        """returns the descendants (without self) in the same order as
+        get_descendants. the list is cached until the hierarchy or a
+        visibility changes, so it must not be modified."""
+        if self._traversal is None:
+            self._traversal = self.get_descendants(include_self=False)
+        if not visible_only:
+            return self._traversal
+        if self._traversal_visible is None:
+            self._traversal_visible = [node for node in self._traversal if node._visible]
+        return self._traversal_visible
+
+    def _invalidate_traversal(self):
+        """drops the cached traversals of this object and its
+        ancestors."""
+        node = self
+        while node is not None:
+            node._traversal = None
+            node._traversal_visible = None
+            node = node.parent
+
     def get_world_matrix(self):
-        if self.parent == None:
-            return self.transform
-        else:
-            return self.parent.get_world_matrix() @ self.transform
+        """returns the cached world matrix, recomputing it if this
+        object or an ancestor moved. the result must not be modified."""
+        if self._store is not None:
+            return self._store.get_world_matrix(self)
+        if self._world_matrix is None:
+            if self.parent is None:
+                self._world_matrix = self._transform
+            else:
+                self._world_matrix = self.parent.get_world_matrix() @ self._transform
+        return self._world_matrix
+
+    def get_local_bounds(self):
+        """returns the bounding sphere (center, radius) in object space,
+        or None if the object has no geometry."""
+        if not self.mesh or self.mesh.bounds_center is None:
+            return None
+        return self.mesh.bounds_center, self.mesh.bounds_radius
+
+    def get_world_bounds(self):
+        """returns the bounding sphere (center, radius) in world space,
+        or None if the object has no geometry."""
+        bounds = self.get_local_bounds()
+        if bounds is None:
+            return None
+        center, radius = bounds
+        world = self.get_world_matrix()
+        center_world = world[0:3, 0:3] @ center + world[0:3, 3]
+        # largest axis scale of the world matrix
+        scale = np.sqrt(np.max(np.sum(world[0:3, 0:3]**2, axis=0)))
+        return center_world, radius * scale
 
     def get_position(self, world=False):
         """returns the object's position (local or world)."""
@@ -166,7 +358,7 @@ class NightObject:
 
     def get_orientation(self):
         """returns quaternion"""
-        orn = R.from_matrix(self.get_rotation()).as_quat()
+        orn = NightQuaternion.from_matrix(self.get_rotation())
         return orn
 
     def get_yaw_pitch_roll(self):
@@ -192,6 +384,7 @@ class NightObject:
         self.transform[0, 3] = position[0]
         self.transform[1, 3] = position[1]
         self.transform[2, 3] = position[2]
+        self._on_transform_changed()
         if reset_base:
             self._update_physics_pos_orn()
 
@@ -207,6 +400,7 @@ class NightObject:
         self.transform[2, 0] = rotation_matrix[2, 0]
         self.transform[2, 1] = rotation_matrix[2, 1]
         self.transform[2, 2] = rotation_matrix[2, 2]
+        self._on_transform_changed()
         if reset_base:
             self._update_physics_pos_orn()
 
@@ -240,8 +434,32 @@ class NightObject:
         else:
             self.transform = matrix @ self.transform
 
+    def _on_transform_changed(self):
+        """must be called whenever transform is modified in place.
+        this object and its descendants moved in world space."""
+        # already dirty: computing any descendant's world matrix goes
+        # through this one, so nothing below was read since the last
+        # walk. store members always walk, their matrices live in the
+        # store. the bvh is told anyway: an object without bounds never
+        # had its matrix computed, and may have gained bounds.
+        if self._world_matrix is None and self._store is None:
+            if self._bvh is not None:
+                self._bvh.mark_dirty(self)
+            return
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+            node._world_matrix = None
+            if node._store is not None:
+                node._store.dirty = True
+            if node._bvh is not None:
+                node._bvh.mark_dirty(node)
+            if node._static_batch is not None:
+                node._static_batch.dirty = True
+            nodes.extend(node.children)
+
     def _update_physics_pos_orn(self):
         if self.physics_id != None:
             pos = self.get_position()
-            orn = R.from_matrix(self.get_rotation()).as_quat()
-            p.resetBasePositionAndOrientation(self.physics_id, pos, orn)
+            orn = NightQuaternion.from_matrix(self.get_rotation())
+            p.resetBasePositionAndOrientation(self.physics_id, pos, orn, physicsClientId=self.world.client)
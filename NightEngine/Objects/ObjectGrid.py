@@ -2,9 +2,11 @@
 
 from NightEngine.Objects.NightObject import NightObject
 from NightEngine.Meshes.NightMesh import NightMesh
+from NightEngine.Meshes.NightGeometryCache import NightGeometryCache
 from NightEngine.Materials.NightMaterialDefault import NightMaterialDefault
 from OpenGL.GL import *
 import pybullet as p
+import numpy as np
 
 class ObjectGrid(NightObject):
     def __init__(self,
@@ -13,31 +15,33 @@ class ObjectGrid(NightObject):
                  color=[1, 1, 1],
                  line_width=1):
 
-        positions = []
-        colors = []
+        mesh = NightMesh()
+        key = ("grid", float(width), int(divisions), tuple(color))
 
-        values = []
-        for n in range(divisions + 1):
-            values.append(-width/2 + n*(width / divisions))
+        if not NightGeometryCache.load(key, mesh):
 
-        for x in values:
-            positions.append([x, 0, -width/2])
-            positions.append([x, 0,  width/2])
-            colors.append(color)
-            colors.append(color)
+            # one line along z per x value, then one along x per z value
+            values = np.linspace(-width/2, width/2, divisions + 1, dtype=np.float32)
+            count = len(values)
+            positions = np.zeros((4 * count, 3), dtype=np.float32)
+            positions[0:2*count:2, 0] = values
+            positions[1:2*count:2, 0] = values
+            positions[0:2*count:2, 2] = -width/2
+            positions[1:2*count:2, 2] = width/2
+            positions[2*count::2, 0] = -width/2
+            positions[2*count+1::2, 0] = width/2
+            positions[2*count::2, 2] = values
+            positions[2*count+1::2, 2] = values
+            colors = np.tile(np.array(color, dtype=np.float32), (len(positions), 1))
 
-        for z in values:
-            positions.append([-width/2, 0, z])
-            positions.append([ width/2, 0, z])
-            colors.append(color)
-            colors.append(color)
-        
-        mesh = NightMesh()
-        mesh.add_attribute("vertex_position", "vec3", positions)
-        mesh.add_attribute("vertex_color", "vec3", colors)
-        mesh.vertex_count = len(positions)
-        mesh.set_collision_shape(p.createCollisionShape(p.GEOM_BOX,
-                                                        halfExtents=[width/2, 0, width/2]))
+            mesh.add_attribute("vertex_position", "vec3", positions)
+            mesh.add_attribute("vertex_color", "vec3", colors)
+            mesh.vertex_count = len(positions)
+
+            NightGeometryCache.store(key, mesh)
+
+        mesh.create_collision_shape(shapeType=p.GEOM_BOX,
+                                    halfExtents=[width/2, 0, width/2])
         
         material = NightMaterialDefault(gl_draw_style=GL_LINES,
                                         gl_line_width=line_width,
@@ -0,0 +1,194 @@
+# ObjectInstanced.py
+
+from NightEngine.Objects.NightObject import NightObject
+from NightEngine.NightMatrix import NightMatrix
+from NightEngine.NightQuaternion import NightQuaternion
+from NightEngine.NightState import NightState
+from NightEngine.NightWorld import NightWorld
+from OpenGL.GL import *
+import numpy as np
+
+class ObjectInstanced(NightObject):
+
+    # the vao holds the instance attributes too
+    share_vao = False
+
+    def __init__(self, mesh, material, mass=0.0):
+
+        """draws many copies of one mesh with a single instanced draw
+        call. the material must be created with instanced=True. each
+        instance has its own model matrix (relative to this object's
+        world matrix) and color."""
+
+        if not getattr(material, "instanced", False):
+            raise Exception("ObjectInstanced: material must be created with instanced=True.")
+
+        super().__init__(mesh, material, mass)
+
+        # ------------------------------------------------------------
+        # instance data
+        # ------------------------------------------------------------
+
+        # the arrays grow by doubling; only the first instance_count
+        # rows are instances.
+
+        self.instance_count = 0
+        self._matrices = np.zeros((0, 4, 4), dtype=np.float32)
+        self._colors = np.zeros((0, 3), dtype=np.float32)
+        self.instance_physics_ids = []
+        self.instance_multibody_args = []
+
+        self._instances_dirty = True
+        self._instance_capacity = 0
+
+        # ------------------------------------------------------------
+        # instance buffers
+        # ------------------------------------------------------------
+
+        # matrices are uploaded column major, so the buffer is kept
+        # separately from the row major instance_matrices. the gpu
+        # buffers are sized to _instance_capacity instances.
+
+        self._instance_data = np.zeros((0, 4, 4), dtype=np.float32)
+        self._vbo_matrices = None
+        self._vbo_colors = None
+
+    def init_buffers(self):
+        """creates the vao and the instance buffers."""
+        super().init_buffers()
+
+        self._vbo_matrices = glGenBuffers(1)
+        self._vbo_colors = glGenBuffers(1)
+
+        NightState.bind_vertex_array(self.vao)
+        self.material.program.set_attribute_pointer(self._vbo_matrices, "instance_model", "mat4", divisor=1)
+        self.material.program.set_attribute_pointer(self._vbo_colors, "instance_color", "vec3", divisor=1)
+
+    @property
+    def instance_matrices(self):
+        """(instance_count, 4, 4) view of the instance matrices."""
+        return self._matrices[:self.instance_count]
+
+    @property
+    def instance_colors(self):
+        """(instance_count, 3) view of the instance colors."""
+        return self._colors[:self.instance_count]
+
+    def add_instance(self, position=[0, 0, 0], rotation=None, color=[1.0, 1.0, 1.0]):
+        """adds a copy of the mesh. returns the instance index."""
+
+        matrix = NightMatrix.get_translation(*position)
+        if rotation is not None:
+            matrix[0:3, 0:3] = rotation
+
+        index = self.instance_count
+        if index == len(self._matrices):
+            capacity = max(16, 2 * index)
+            matrices = np.zeros((capacity, 4, 4), dtype=np.float32)
+            colors = np.zeros((capacity, 3), dtype=np.float32)
+            matrices[:index] = self._matrices
+            colors[:index] = self._colors
+            self._matrices, self._colors = matrices, colors
+
+        self._matrices[index] = matrix
+        self._colors[index] = color
+        self.instance_count += 1
+        self._instances_dirty = True
+        self._on_transform_changed()
+        return self.instance_count - 1
+
+    def set_instance_matrix(self, index, matrix:np.ndarray):
+        """sets the matrix of an instance, and moves its body there, so
+        the next physics sync does not move it back."""
+        self.instance_matrices[index] = matrix
+        self._instances_dirty = True
+        self._on_transform_changed()
+        if index < len(self.instance_physics_ids):
+            matrix = self.instance_matrices[index]
+            self.world.call("resetBasePositionAndOrientation", self.instance_physics_ids[index],
+                            matrix[0:3, 3].tolist(), NightQuaternion.from_matrix(matrix).tolist())
+
+    def set_instance_color(self, index, color):
+        self.instance_colors[index] = color
+        self._instances_dirty = True
+
+    def get_local_bounds(self):
+        """returns a bounding sphere around all instances."""
+        if self.instance_count == 0 or self.mesh.bounds_center is None:
+            return None
+        matrices = self.instance_matrices
+        centers = matrices[:, 0:3, 0:3] @ self.mesh.bounds_center + matrices[:, 0:3, 3]
+        scales = np.sqrt(np.max(np.sum(matrices[:, 0:3, 0:3]**2, axis=1), axis=1))
+        center = (centers.min(axis=0) + centers.max(axis=0)) / 2
+        radius = np.max(np.linalg.norm(centers - center, axis=1) + self.mesh.bounds_radius * scales)
+        return center, float(radius)
+
+    # ------------------------------------------------------------
+    # physics
+    # ------------------------------------------------------------
+
+    def init_multibody(self, world=None):
+        """creates one rigid body per instance."""
+        world = world or NightWorld.get_default()
+        shape = world.get_collision_shape(self.mesh)
+        if shape is None:
+            return
+        self.world = world
+        self.instance_physics_ids = []
+        self.instance_multibody_args = []
+        for matrix in self.instance_matrices:
+            args = dict(baseMass=self.mass,
+                        baseCollisionShapeIndex=shape,
+                        basePosition=matrix[0:3, 3].tolist(),
+                        baseOrientation=NightQuaternion.from_matrix(matrix[0:3, 0:3]).tolist())
+            self.instance_physics_ids.append(world.create_multibody(**args))
+            self.instance_multibody_args.append(args)
+
+    def set_instance_poses(self, positions, orientations):
+        """sets all instance matrices from (N, 3) positions and (N, 4)
+        quaternions."""
+        NightQuaternion.to_matrix(orientations, out=self.instance_matrices[:, 0:3, 0:3])
+        self.instance_matrices[:, 0:3, 3] = positions
+        self._instances_dirty = True
+        self._on_transform_changed()
+
+    def release(self):
+        """releases the vao and the instance buffers."""
+        if self._vbo_matrices is not None:
+            glDeleteBuffers(2, [self._vbo_matrices, self._vbo_colors])
+            self._vbo_matrices = self._vbo_colors = None
+            self._instance_capacity = 0
+            self._instances_dirty = True
+        super().release()
+
+    # ------------------------------------------------------------
+    # drawing
+    # ------------------------------------------------------------
+
+    def upload_instances(self):
+        """uploads the instance buffers if they changed."""
+
+        if not self._instances_dirty or self.instance_count == 0:
+            return
+        self._instances_dirty = False
+
+        count = self.instance_count
+        if len(self._instance_data) != len(self._matrices):
+            self._instance_data = np.empty_like(self._matrices)
+        data = self._instance_data[:count]
+        np.copyto(data, self.instance_matrices.transpose(0, 2, 1))
+        colors = self.instance_colors
+
+        # reallocate to the array capacity only when the instance count
+        # outgrows the buffers, then upload the used part
+        if count > self._instance_capacity:
+            self._instance_capacity = len(self._matrices)
+            glBindBuffer(GL_ARRAY_BUFFER, self._vbo_matrices)
+            glBufferData(GL_ARRAY_BUFFER, self._instance_data.nbytes, None, GL_DYNAMIC_DRAW)
+            glBindBuffer(GL_ARRAY_BUFFER, self._vbo_colors)
+            glBufferData(GL_ARRAY_BUFFER, self._colors.nbytes, None, GL_DYNAMIC_DRAW)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self._vbo_matrices)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
+        glBindBuffer(GL_ARRAY_BUFFER, self._vbo_colors)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, colors.nbytes, colors)
@@ -0,0 +1,127 @@
+# ObjectLOD.py
+
+from NightEngine.Objects.NightObject import NightObject
+from NightEngine.Meshes.NightMeshCache import NightMeshCache
+from NightEngine.Meshes.MeshSphere import MeshSphere
+import numpy as np
+
+class ObjectLOD(NightObject):
+    def __init__(self, meshes, material, mass=0.0, thresholds=None, hysteresis=0.15):
+
+        """object with several mesh levels, ordered from finest to
+        coarsest. the engine picks a level every frame from the
+        projected size. thresholds[i] is the screen diameter in pixels
+        below which level i + 1 is used instead of level i. a level
+        only changes once the size is past the threshold by the
+        hysteresis fraction, to avoid popping. the default thresholds
+        halve per level and know nothing about the meshes; pass
+        thresholds matched to the geometric error of the levels, as
+        from_sphere does. the physics body uses the collision shape of
+        the finest mesh."""
+
+        if len(meshes) == 0:
+            raise Exception("ObjectLOD: at least one mesh is needed.")
+        if not all(mesh.interleaved for mesh in meshes):
+            raise Exception("ObjectLOD: meshes must be interleaved.")
+
+        super().__init__(meshes[0], material, mass)
+
+        if thresholds is None:
+            thresholds = [400.0 / 2**i for i in range(len(meshes) - 1)]
+        if len(thresholds) != len(meshes) - 1:
+            raise Exception("ObjectLOD: thresholds needs one entry less than meshes.")
+
+        self.thresholds = thresholds
+        self.hysteresis = hysteresis
+
+        # ------------------------------------------------------------
+        # levels
+        # ------------------------------------------------------------
+
+        # (mesh, mesh buffer, vao) per level. the buffers are acquired
+        # by init_buffers.
+
+        self.levels = [(mesh, None, None) for mesh in meshes]
+        self.level = 0
+
+    def init_buffers(self):
+        """uploads every level. level 0 is uploaded by NightObject, the
+        others are acquired from the mesh cache the same way."""
+
+        self.mesh = self.levels[0][0]
+        super().init_buffers()
+
+        levels = [(self.mesh, self.mesh_buffer, self.vao)]
+        variable_names = [name for name, _, _ in self.layout.attributes]
+
+        for mesh, _, _ in self.levels[1:]:
+            layout = mesh.get_vertex_layout(variable_names)
+            mesh_buffer = NightMeshCache.acquire(mesh, layout)
+            vao = NightMeshCache.acquire_vao(mesh_buffer, self.material.program)
+            levels.append((mesh, mesh_buffer, vao))
+
+        self.levels = levels
+        self.set_level(self.level)
+
+    @classmethod
+    def from_sphere(cls, material, radius=1.0, segments=(32, 16, 8, 4), color=[1.0, 1.0, 1.0], mass=0.0, **kwargs):
+        """creates a sphere with one level per segment count. unless
+        thresholds are given, a level is only used while its error is
+        below half a pixel, see get_sphere_thresholds."""
+        meshes = [MeshSphere(radius, count, color=color, collision=(i == 0))
+                  for i, count in enumerate(segments)]
+        if kwargs.get("thresholds") is None:
+            kwargs["thresholds"] = cls.get_sphere_thresholds(segments, kwargs.get("hysteresis", 0.15))
+        return cls(meshes, material, mass, **kwargs)
+
+    @staticmethod
+    def get_sphere_thresholds(segments, hysteresis=0.15, max_error=0.5):
+        """returns thresholds for sphere levels with the given segment
+        counts, so that a level is only used while its error is at most
+        max_error pixels. a sphere of n segments deviates most from the
+        true surface in the middle of the quads at the equator, by
+        radius * (1 - cos(pi / n) * cos(pi / 2n)), so with a screen
+        diameter d the error is d / 2 times that in pixels. the
+        thresholds are lowered by the hysteresis, which keeps a coarse
+        level until the size exceeds the threshold by that fraction."""
+        thresholds = []
+        for count in segments[1:]:
+            error = 1.0 - np.cos(np.pi / count) * np.cos(np.pi / (2 * count))
+            size = 2.0 * max_error / error
+            thresholds.append(float(size / (1.0 + hysteresis)))
+        return thresholds
+
+    def get_level_count(self):
+        return len(self.levels)
+
+    def get_triangle_count(self, level=None):
+        mesh = self.levels[self.level if level is None else level][0]
+        if mesh.indices is not None:
+            return mesh.index_count // 3
+        return mesh.vertex_count // 3
+
+    def select_level(self, screen_size):
+        """returns the level for a projected diameter in pixels,
+        starting from the current level."""
+        level = self.level
+        while level > 0 and screen_size > self.thresholds[level - 1] * (1 + self.hysteresis):
+            level -= 1
+        while level < len(self.levels) - 1 and screen_size < self.thresholds[level] * (1 - self.hysteresis):
+            level += 1
+        return level
+
+    def set_level(self, level):
+        self.level = level
+        self.mesh, self.mesh_buffer, self.vao = self.levels[level]
+
+    def release(self):
+        """releases the buffers of every level. the meshes are kept, so
+        the levels are uploaded again if the object is drawn again."""
+        for mesh, mesh_buffer, vao in self.levels:
+            if mesh_buffer is None:
+                continue
+            NightMeshCache.release_vao(mesh_buffer, self.material.program)
+            NightMeshCache.release(mesh_buffer)
+        self.levels = [(mesh, None, None) for mesh, _, _ in self.levels]
+        self.mesh_buffer = None
+        self.vao = None
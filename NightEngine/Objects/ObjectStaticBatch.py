@@ -0,0 +1,70 @@
+# ObjectStaticBatch.py
+
+from NightEngine.Objects.NightObject import NightObject
+from NightEngine.Meshes.NightMesh import NightMesh
+import numpy as np
+
+class ObjectStaticBatch(NightObject):
+    def __init__(self, members, material):
+
+        """one mesh holding the geometry of several static objects that
+        share a material, pre-transformed to world space, so they are
+        drawn with a single call. members must have the same mesh
+        attributes."""
+
+        self.members = members
+        self.member_ids = tuple(id(obj) for obj in members)
+        self.dirty = False
+
+        mesh = ObjectStaticBatch.merge(members)
+
+        super().__init__(mesh, material, mass=0)
+
+        for obj in members:
+            obj._static_batch = self
+
+    @staticmethod
+    def merge(objects):
+        """returns a mesh with the geometry of objects in world space."""
+
+        mesh = NightMesh()
+        names = list(objects[0].mesh.attributes.keys())
+        columns = {name: [] for name in names}
+        indices = []
+        offset = 0
+
+        for obj in objects:
+            world = np.asarray(obj.get_world_matrix(), dtype=np.float32)
+            rotation = world[0:3, 0:3]
+            # normals are transformed by the inverse transpose
+            rotation_normal = np.linalg.inv(rotation).T
+
+            source = obj.mesh
+            for name in names:
+                attribute = source.attributes[name]
+                data = np.array(attribute["data"], dtype=np.float32).reshape(source.vertex_count, -1)
+                if name == "vertex_position":
+                    data = data @ rotation.T + world[0:3, 3]
+                elif name == "vertex_normal":
+                    data = data @ rotation_normal.T
+                    data /= np.maximum(np.linalg.norm(data, axis=1), 1e-12)[:, None]
+                columns[name].append(data)
+
+            if source.indices is not None:
+                indices.append(source.indices + offset)
+            else:
+                indices.append(np.arange(source.vertex_count, dtype=np.uint32) + offset)
+            offset += source.vertex_count
+
+        for name in names:
+            mesh.add_attribute(name, objects[0].mesh.attributes[name]["data_type"], np.concatenate(columns[name]))
+        mesh.vertex_count = offset
+        mesh.set_indices(np.concatenate(indices))
+        return mesh
+
+    def release(self):
+        for obj in self.members:
+            if obj._static_batch is self:
+                obj._static_batch = None
+        self.members = []
+        super().release()
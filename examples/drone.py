@@ -44,15 +44,21 @@ class ControllerPID:
         return result
 
 class Quadcopter(NightObject):
-    def __init__(self, scene):
+    def __init__(self, engine, scene):
 
-        self.base_force = 5
-        # self.base_force = 20
+        # forces are sent through the engine, which forwards them to
+        # the physics process if there is one
+        self.engine = engine
+
+        # forces act on every physics step, so the base force about
+        # balances the weight: (0.06 + 4 * 0.05) * 40 / 4 rotors
+        self.base_force = 2.6
 
         self.target_altitude = 30
         self.target_pitch = 0
         self.target_roll = 0
         self.target_yaw = 0
+        self.target_yaw_rate = 0
         self.target_velocity_forward = 0
         self.target_velocity_right = 0
         
@@ -62,6 +68,16 @@ class Quadcopter(NightObject):
         self.rot4_force = 0
         self.rotational_force = 0
 
+        self.time_total = 0
+
+        # velocities estimated from the pose, the only state shared by
+        # a physics process
+        self.linear_velocity = np.zeros(3)
+        self.yaw_rate = 0.0
+        self._last_position = None
+        self._last_yaw = 0.0
+        self._velocity_time = 0.0
+
         # ------------------------------------------------------------
         # controllers
         # ------------------------------------------------------------
@@ -145,31 +161,31 @@ class Quadcopter(NightObject):
         force3 = np.array([0.0, self.rot3_force, 0.0])
         force4 = np.array([0.0, self.rot4_force, 0.0])
 
-        p.applyExternalForce(self.physics_id,
-                             linkIndex=self.rot1_id,
-                             forceObj=force1,
-                             posObj=self.rot1_pos_local,
-                             flags=p.LINK_FRAME)
-        p.applyExternalForce(self.physics_id,
-                             linkIndex=self.rot2_id,
-                             forceObj=force2,
-                             posObj=self.rot2_pos_local,
-                             flags=p.LINK_FRAME)
-        p.applyExternalForce(self.physics_id,
-                             linkIndex=self.rot3_id,
-                             forceObj=force3,
-                             posObj=self.rot3_pos_local,
-                             flags=p.LINK_FRAME)
-        p.applyExternalForce(self.physics_id,
-                             linkIndex=self.rot4_id,
-                             forceObj=force4,
-                             posObj=self.rot4_pos_local,
-                             flags=p.LINK_FRAME)
+        self.engine.physics_call("applyExternalForce", self.physics_id,
+                                 linkIndex=self.rot1_id,
+                                 forceObj=force1,
+                                 posObj=self.rot1_pos_local,
+                                 flags=p.LINK_FRAME)
+        self.engine.physics_call("applyExternalForce", self.physics_id,
+                                 linkIndex=self.rot2_id,
+                                 forceObj=force2,
+                                 posObj=self.rot2_pos_local,
+                                 flags=p.LINK_FRAME)
+        self.engine.physics_call("applyExternalForce", self.physics_id,
+                                 linkIndex=self.rot3_id,
+                                 forceObj=force3,
+                                 posObj=self.rot3_pos_local,
+                                 flags=p.LINK_FRAME)
+        self.engine.physics_call("applyExternalForce", self.physics_id,
+                                 linkIndex=self.rot4_id,
+                                 forceObj=force4,
+                                 posObj=self.rot4_pos_local,
+                                 flags=p.LINK_FRAME)
         
-        p.applyExternalTorque(self.physics_id,
-                              linkIndex=-1,
-                              torqueObj=[0.0, self.rotational_force, 0.0],
-                              flags=p.WORLD_FRAME)
+        self.engine.physics_call("applyExternalTorque", self.physics_id,
+                                 linkIndex=-1,
+                                 torqueObj=[0.0, self.rotational_force, 0.0],
+                                 flags=p.WORLD_FRAME)
 
     def _get_altitude(self):
         return self.get_position()[1]
@@ -187,11 +203,32 @@ class Quadcopter(NightObject):
         return -yaw # ?
 
     def _get_yaw_rate(self):
-        _, angular_velocity = p.getBaseVelocity(self.physics_id)
-        return angular_velocity[1] # ?
+        return self.yaw_rate
+
+    def _update_velocity(self, dt):
+        # the pose may not change on every call with a physics process,
+        # so the velocity is taken over the time since it last did
+        position = np.array(self.get_position())
+        yaw = self._get_yaw()
+        self._velocity_time += dt
+        if self._last_position is not None and np.array_equal(position, self._last_position):
+            return
+        if self._last_position is not None:
+            self.linear_velocity = (position - self._last_position) / self._velocity_time
+            yaw_change = (yaw - self._last_yaw + math.pi) % (2 * math.pi) - math.pi
+            self.yaw_rate = yaw_change / self._velocity_time
+        self._last_position = position
+        self._last_yaw = yaw
+        self._velocity_time = 0.0
         
+    def physics_update(self, dt):
+        # pybullet clears external forces after each step
+        self._update_rotor_forces()
+
     def move(self, window, time_delta: float, time_total):
 
+        self.time_total = time_total
+
         # ------------------------------------------------------------
         # check key inputs
         # ------------------------------------------------------------
@@ -223,32 +260,35 @@ class Quadcopter(NightObject):
         else:
             self.target_yaw_rate = 0.0
 
+    def control(self, dt):
+        """updates the rotor forces. registered as a physics callback,
+        so it runs at a fixed simulated rate."""
+
         # ------------------------------------------------------------
         # control
         # ------------------------------------------------------------
 
         # first apply corrections to pitch and roll values
 
-        linear_velocity, _ = p.getBaseVelocity(self.physics_id)
+        self._update_velocity(dt)
         # linear velocity is global, need to transform to local
-        _, orientation_quaternion = p.getBasePositionAndOrientation(self.physics_id)
-        rotation_matrix = np.array(p.getMatrixFromQuaternion(orientation_quaternion)).reshape(3, 3)
-        local_velocity = np.dot(rotation_matrix.T, linear_velocity)
+        rotation_matrix = self.get_rotation()
+        local_velocity = np.dot(rotation_matrix.T, self.linear_velocity)
         velocity_forward = -local_velocity[2]
         velocity_right = -local_velocity[0]
         
-        velocity_forward_correction = self.pid_velocity_forward.compute(-self.target_velocity_forward, velocity_forward, 1/240)
-        velocity_right_correction = self.pid_velocity_right.compute(self.target_velocity_right, velocity_right, 1/240)
+        velocity_forward_correction = self.pid_velocity_forward.compute(-self.target_velocity_forward, velocity_forward, dt)
+        velocity_right_correction = self.pid_velocity_right.compute(self.target_velocity_right, velocity_right, dt)
 
         self.target_pitch = velocity_forward_correction
         self.target_roll = -velocity_right_correction
 
         # then, based on current values, apply corrections to motors
 
-        correction_altitude = self.pid_altitude.compute(self.target_altitude, self._get_altitude(), 1/240)
-        correction_pitch = self.pid_pitch.compute(self.target_pitch, self._get_pitch(), 1/240)
-        correction_roll = self.pid_roll.compute(self.target_roll, self._get_roll(), 1/240)
-        correction_yaw = self.pid_yaw.compute(self.target_yaw_rate, self._get_yaw_rate(), 1/240)
+        correction_altitude = self.pid_altitude.compute(self.target_altitude, self._get_altitude(), dt)
+        correction_pitch = self.pid_pitch.compute(self.target_pitch, self._get_pitch(), dt)
+        correction_roll = self.pid_roll.compute(self.target_roll, self._get_roll(), dt)
+        correction_yaw = self.pid_yaw.compute(self.target_yaw_rate, self._get_yaw_rate(), dt)
 
         self.rot1_force = self.base_force + correction_altitude
         self.rot2_force = self.base_force + correction_altitude
@@ -267,16 +307,12 @@ class Quadcopter(NightObject):
 
         self.rotational_force = correction_yaw 
 
-        data_queue.put([time_total,
+        data_queue.put([self.time_total,
                         self.target_altitude, self._get_altitude(),
                         self.target_pitch, self._get_pitch(),
                         self.target_roll, self._get_roll(),
                         self.target_yaw_rate, self._get_yaw_rate()])
 
-        # --------- update rotor forces --------- #
-
-        self._update_rotor_forces()
-
 class Example(NightBase):
     def setup(self):
 
@@ -290,9 +326,10 @@ class Example(NightBase):
         self.plane = NightObject(MeshBox(100, 0, 100, color=[0.5, 0.2, 0.1]), NightMaterialDefault())
         self.scene.add(self.plane)      
 
-        self.drone = Quadcopter(self.scene)
+        self.drone = Quadcopter(self, self.scene)
         self.drone.set_position([0, 30, 0])
         self.scene.add(self.drone)
+        self.add_physics_callback(self.drone.control, rate=120)
 
         # ------- lemniscate of bernoulli ------- #
 
@@ -420,5 +457,10 @@ if __name__ == "__main__":
     plotting_process = Process(target=start_plotting, args=(data_queue,))
     plotting_process.start()
     
-    engine = Example()
+    # with --headless there is no window, and the simulation runs ten
+    # times faster than real time
+    headless = "--headless" in sys.argv
+    engine = Example(headless=headless)
+    if headless:
+        engine.time_scale = 10.0
     engine.run()
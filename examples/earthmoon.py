@@ -5,6 +5,7 @@ from NightEngine.NightCamera import NightCamera
 from NightEngine.Objects.NightObject import NightObject
 from NightEngine.Materials.NightMaterialTexture import NightMaterialTexture
 from NightEngine.Meshes.MeshSphere import MeshSphere
+from NightEngine.Objects.ObjectLOD import ObjectLOD
 import pybullet as p
 
 class Example(NightBase):
@@ -17,11 +18,11 @@ class Example(NightBase):
         self.light_directional["direction"] = [1.0, 1.0, 0.0]
         self.light_directional["specular"] = [0.3, 0.3, 0.3]
 
-        self.earth = NightObject(MeshSphere(10, 32), NightMaterialTexture("images/earth.jpg"), mass=150)
+        self.earth = ObjectLOD.from_sphere(NightMaterialTexture("images/earth.jpg"), 10, mass=150)
         self.earth.set_position([0, 0, 0])
         self.scene.add(self.earth)
 
-        self.moon = NightObject(MeshSphere(3, 32), NightMaterialTexture("images/moon.jpg"), mass=1)
+        self.moon = ObjectLOD.from_sphere(NightMaterialTexture("images/moon.jpg"), 3, mass=1)
         self.moon.set_position([40, 0, 0])
         self.scene.add(self.moon)
 
@@ -29,13 +30,13 @@ class Example(NightBase):
 
     def update(self):
         
-        sun_pos, _ = p.getBasePositionAndOrientation(self.earth.physics_id)
-        moon_pos, _ = p.getBasePositionAndOrientation(self.moon.physics_id)
+        sun_pos = self.earth.get_position()
+        moon_pos = self.moon.get_position()
 
-        p.changeDynamics(self.moon.physics_id, -1, linearDamping=0, angularDamping=0)
+        self.physics_call("changeDynamics", self.moon.physics_id, -1, linearDamping=0, angularDamping=0)
 
         if not self.initial_velocity:
-            p.resetBaseVelocity(self.moon.physics_id, linearVelocity=[0, 0, 5])
+            self.physics_call("resetBaseVelocity", self.moon.physics_id, linearVelocity=[0, 0, 5])
             self.initial_velocity = True
             
         G = 30
@@ -49,11 +50,12 @@ class Example(NightBase):
         fy = force * dy / dist
         fz = force * dz / dist
 
-        p.applyExternalForce(objectUniqueId=self.moon.physics_id,
-                             linkIndex=-1,
-                             forceObj=[fx, fy, fz],
-                             posObj=moon_pos,
-                             flags=p.WORLD_FRAME)
+        self.physics_call("applyExternalForce",
+                          objectUniqueId=self.moon.physics_id,
+                          linkIndex=-1,
+                          forceObj=[fx, fy, fz],
+                          posObj=moon_pos,
+                          flags=p.WORLD_FRAME)
         
         self.camera.move(self.window, self.time_delta)
         self.draw_scene(self.camera)
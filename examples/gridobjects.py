@@ -8,6 +8,7 @@ from NightEngine.Meshes.MeshBox import MeshBox
 from NightEngine.Meshes.MeshSphere import MeshSphere
 from NightEngine.Objects.ObjectGrid import ObjectGrid
 from NightEngine.Objects.ObjectAxes import ObjectAxes
+from NightEngine.Objects.ObjectInstanced import ObjectInstanced
 import pybullet as p
 import glfw
 
@@ -28,15 +29,15 @@ class MyObject(NightObject):
         side = force * self.camera.get_right_vector()
 
         if self.check_pressed(window, glfw.KEY_I):
-            p.applyExternalForce(self.physics_id, -1, forward, self.get_position(), p.WORLD_FRAME)
+            self.world.call("applyExternalForce", self.physics_id, -1, forward, self.get_position(), p.WORLD_FRAME)
         if self.check_pressed(window, glfw.KEY_K):
-            p.applyExternalForce(self.physics_id, -1, -forward, self.get_position(), p.WORLD_FRAME)
+            self.world.call("applyExternalForce", self.physics_id, -1, -forward, self.get_position(), p.WORLD_FRAME)
         if self.check_pressed(window, glfw.KEY_J):
-            p.applyExternalForce(self.physics_id, -1, side, self.get_position(), p.WORLD_FRAME)
+            self.world.call("applyExternalForce", self.physics_id, -1, side, self.get_position(), p.WORLD_FRAME)
         if self.check_pressed(window, glfw.KEY_L):
-            p.applyExternalForce(self.physics_id, -1, -side, self.get_position(), p.WORLD_FRAME)
+            self.world.call("applyExternalForce", self.physics_id, -1, -side, self.get_position(), p.WORLD_FRAME)
         if self.check_pressed(window, glfw.KEY_Y):
-            p.applyExternalForce(self.physics_id, -1, [0, 4000, 0], self.get_position(), p.WORLD_FRAME)
+            self.world.call("applyExternalForce", self.physics_id, -1, [0, 4000, 0], self.get_position(), p.WORLD_FRAME)
 
 class Example(NightBase):
     def setup(self):
@@ -65,16 +66,24 @@ class Example(NightBase):
 
         w = 5
         hor = 5
+        # static pillars, merged into one draw call
+        self.static_batching = True
+        for i in range(16):
+            pillar = NightObject(MeshBox(2, 8, 2, color=[0.3, 0.3, 0.6]), NightMaterialDefault(), 0)
+            pillar.set_position([i*6 - 45, 4, -30])
+            pillar.static = True
+            self.scene.add(pillar)
+
+        self.cubes = ObjectInstanced(MeshBox(w, w, w), NightMaterialDefault(instanced=True), mass=1)
         for i in range(-hor, hor+1):
             for j in range(2, 6):
-                cube = NightObject(MeshBox(w, w, w, color=[0.7, 0, 0]), NightMaterialDefault(), mass=1)
-                cube.set_position([i*w+ i, j*w + 2*j, 0])
-                self.scene.add(cube)
+                self.cubes.add_instance([i*w+ i, j*w + 2*j, 0], color=[0.7, 0, 0])
+        self.scene.add(self.cubes)
 
     def update(self):
         self.sphere.move(self.window, self.time_delta)
-        p.changeDynamics(self.sphere.physics_id, -1, restitution=0.9)
-        p.changeDynamics(self.grid.physics_id, -1, restitution=0.8)
+        self.physics_call("changeDynamics", self.sphere.physics_id, -1, restitution=0.9)
+        self.physics_call("changeDynamics", self.grid.physics_id, -1, restitution=0.8)
         self.camera.move(self.window, self.time_delta)
         self.draw_scene(self.camera)
 
@@ -19,7 +19,6 @@ setup(
         "PyOpenGL==3.1.9",
         "PyOpenGL-accelerate==3.1.9",
         "pyright==1.1.396",
-        "scipy==1.15.2",
         "typing_extensions==4.12.2",
     ],
     classifiers=[
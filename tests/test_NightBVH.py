@@ -0,0 +1,183 @@
+# test_NightBVH.py
+
+from NightEngine.NightBVH import NightBVH
+from NightEngine.Objects.NightObject import NightObject
+from NightEngine.Meshes.MeshBox import MeshBox
+import numpy as np
+
+def create_objects(count, seed=0, spread=50.0):
+    rng = np.random.default_rng(seed)
+    objects = []
+    for _ in range(count):
+        obj = NightObject(MeshBox(*rng.uniform(0.2, 3.0, size=3), collision=False))
+        obj.set_position(rng.uniform(-spread, spread, size=3).tolist())
+        objects.append(obj)
+    return objects
+
+def get_sphere_aabb(obj):
+    center, radius = obj.get_world_bounds()
+    return center - radius, center + radius
+
+def overlaps(a_min, a_max, b_min, b_max):
+    return bool(np.all(a_max >= b_min) and np.all(b_max >= a_min))
+
+def check_tree(bvh):
+    """every node encloses its children and every leaf its object."""
+    leaves = 0
+    stack = [bvh.root] if bvh.root is not None else []
+    while stack:
+        node = stack.pop()
+        if node.is_leaf():
+            leaves += 1
+            assert bvh.leaves[node.obj] is node
+            aabb_min, aabb_max = get_sphere_aabb(node.obj)
+            assert np.all(node.aabb_min <= aabb_min + 1e-4) and np.all(aabb_max - 1e-4 <= node.aabb_max)
+            continue
+        for child in (node.left, node.right):
+            assert child.parent is node
+            assert np.all(node.aabb_min <= child.aabb_min) and np.all(child.aabb_max <= node.aabb_max)
+            stack.append(child)
+    assert leaves == len(bvh.leaves)
+
+def check_aabb_query(bvh, objects, aabb_min, aabb_max):
+    # results are tested on fat aabbs: everything overlapping the
+    # region is found, nothing farther than the margin is
+    found = set(bvh.query_aabb(aabb_min, aabb_max))
+    for obj in objects:
+        sphere_min, sphere_max = get_sphere_aabb(obj)
+        if overlaps(sphere_min, sphere_max, aabb_min, aabb_max):
+            assert obj in found
+        if not overlaps(sphere_min - 2 * bvh.margin, sphere_max + 2 * bvh.margin, aabb_min, aabb_max):
+            assert obj not in found
+
+# ------------------------------------------------------------
+# building
+# ------------------------------------------------------------
+
+def test_rebuild():
+    objects = create_objects(100)
+    bvh = NightBVH()
+    bvh.rebuild(objects)
+    check_tree(bvh)
+    assert set(bvh.leaves) == set(objects)
+    assert all(obj._bvh is bvh for obj in objects)
+
+def test_insert_and_remove():
+    objects = create_objects(60, seed=1)
+    bvh = NightBVH()
+    for obj in objects:
+        bvh.insert(obj)
+    check_tree(bvh)
+
+    for obj in objects[::2]:
+        bvh.remove(obj)
+    check_tree(bvh)
+    assert set(bvh.leaves) == set(objects[1::2])
+    assert all(obj._bvh is None for obj in objects[::2])
+
+    for obj in objects[1::2]:
+        bvh.remove(obj)
+    assert bvh.root is None
+
+def test_unbounded_objects_enter_on_refit():
+    bvh = NightBVH()
+    obj = NightObject()
+    bvh.insert(obj)
+    assert obj in bvh.unbounded and bvh.root is None
+
+    obj.mesh = MeshBox(collision=False)
+    obj.set_position([1, 2, 3])
+    bvh.refit()
+    assert obj not in bvh.unbounded and bvh.leaves[obj] is bvh.root
+
+# ------------------------------------------------------------
+# refit
+# ------------------------------------------------------------
+
+def test_refit_after_moves():
+    rng = np.random.default_rng(2)
+    objects = create_objects(80, seed=2)
+    bvh = NightBVH()
+    bvh.rebuild(objects)
+
+    for _ in range(5):
+        for obj in rng.choice(objects, 30, replace=False):
+            # some stay inside their fat aabb, some leave it
+            obj.translate(*rng.normal(scale=rng.choice([0.1, 10.0]), size=3), local=False)
+        bvh.refit()
+        check_tree(bvh)
+        assert not bvh.dirty
+
+def test_small_moves_keep_the_leaf():
+    obj = create_objects(1)[0]
+    bvh = NightBVH(margin=0.5)
+    bvh.rebuild([obj])
+    leaf_min = bvh.root.aabb_min.copy()
+    obj.translate(0.2, 0.0, 0.0, local=False)
+    bvh.refit()
+    np.testing.assert_array_equal(bvh.root.aabb_min, leaf_min)
+
+# ------------------------------------------------------------
+# queries
+# ------------------------------------------------------------
+
+def test_query_aabb():
+    rng = np.random.default_rng(3)
+    objects = create_objects(150, seed=3)
+    bvh = NightBVH()
+    bvh.rebuild(objects)
+    for _ in range(20):
+        center = rng.uniform(-50, 50, size=3)
+        size = rng.uniform(1, 30, size=3)
+        check_aabb_query(bvh, objects, center - size, center + size)
+
+def test_query_frustum_box():
+    objects = create_objects(150, seed=4, spread=20.0)
+    bvh = NightBVH()
+    bvh.rebuild(objects)
+
+    # inward planes of the box -10..10 on every axis
+    planes = np.array([[ 1, 0, 0, 10], [-1, 0, 0, 10],
+                       [ 0, 1, 0, 10], [ 0, -1, 0, 10],
+                       [ 0, 0, 1, 10], [ 0, 0, -1, 10]], dtype=np.float32)
+    found = set(bvh.query_frustum(planes))
+    assert 10 < len(found) < len(objects)
+    check_aabb_query(bvh, objects, np.full(3, -10.0), np.full(3, 10.0))
+    assert found == set(bvh.query_aabb(np.full(3, -10.0), np.full(3, 10.0)))
+
+def test_query_ray_nearest_first():
+    rng = np.random.default_rng(5)
+    objects = create_objects(150, seed=5, spread=20.0)
+    bvh = NightBVH()
+    bvh.rebuild(objects)
+
+    for _ in range(20):
+        # aimed near an object, through the others
+        origin = rng.uniform(-40, 40, size=3)
+        direction = objects[rng.integers(len(objects))].get_world_bounds()[0] - origin + rng.normal(size=3)
+        direction /= np.linalg.norm(direction)
+        hits = bvh.query_ray(origin, direction)
+
+        # brute force sphere intersection
+        expected = []
+        for obj in objects:
+            center, radius = obj.get_world_bounds()
+            offset = origin - center
+            b = np.dot(offset, direction)
+            c = np.dot(offset, offset) - radius * radius
+            if b * b - c >= 0 and not (c > 0 and b > 0):
+                expected.append((max(-b - np.sqrt(b * b - c), 0.0), obj))
+        expected.sort(key=lambda hit: hit[0])
+
+        assert [obj for _, obj in hits] == [obj for _, obj in expected]
+        np.testing.assert_allclose([distance for distance, _ in hits],
+                                   [distance for distance, _ in expected], atol=1e-3)
+
+def test_query_ray_max_distance():
+    obj = NightObject(MeshBox(collision=False))
+    obj.set_position([0, 0, 10])
+    bvh = NightBVH()
+    bvh.rebuild([obj])
+    assert bvh.query_ray([0, 0, 0], [0, 0, 1], max_distance=5) == []
+    assert [hit[1] for hit in bvh.query_ray([0, 0, 0], [0, 0, 1], max_distance=20)] == [obj]
+    assert bvh.query_ray([0, 0, 0], [0, 0, -1]) == []
@@ -0,0 +1,110 @@
+# test_NightGeometryCache.py
+
+from NightEngine.Meshes.NightGeometryCache import NightGeometryCache
+from NightEngine.Meshes.MeshBox import MeshBox
+from NightEngine.Meshes.MeshSphere import MeshSphere
+import numpy as np
+import pytest
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    # the cache is process wide
+    enabled = NightGeometryCache.enabled
+    NightGeometryCache.enabled = True
+    NightGeometryCache.clear()
+    yield
+    NightGeometryCache.clear()
+    NightGeometryCache.enabled = enabled
+
+def generate(cls, *args, **kwargs):
+    """returns a mesh generated without the cache."""
+    NightGeometryCache.enabled = False
+    try:
+        return cls(*args, **kwargs)
+    finally:
+        NightGeometryCache.enabled = True
+
+def assert_same_geometry(a, b):
+    assert a.attributes.keys() == b.attributes.keys()
+    for name in a.attributes:
+        assert a.attributes[name]["data_type"] == b.attributes[name]["data_type"]
+        np.testing.assert_array_equal(a.attributes[name]["data"], b.attributes[name]["data"])
+    np.testing.assert_array_equal(a.indices, b.indices)
+    assert (a.vertex_count, a.index_count) == (b.vertex_count, b.index_count)
+    np.testing.assert_array_equal(a.bounds_min, b.bounds_min)
+    np.testing.assert_array_equal(a.bounds_max, b.bounds_max)
+    assert a.bounds_radius == b.bounds_radius
+
+# ------------------------------------------------------------
+# sharing
+# ------------------------------------------------------------
+
+@pytest.mark.parametrize("cls, args", [(MeshBox, (2, 3, 4)), (MeshSphere, (1.5, 12))])
+def test_hit_shares_arrays(cls, args):
+    first = cls(*args)
+    second = cls(*args)
+    assert NightGeometryCache.get_stats()["entries"] == 1
+    for name in first.attributes:
+        assert second.attributes[name]["data"] is first.attributes[name]["data"]
+    assert second.indices is first.indices
+    assert second._content_keys is first._content_keys
+    assert_same_geometry(second, generate(cls, *args))
+
+def test_arrays_are_read_only():
+    mesh = MeshBox()
+    with pytest.raises(ValueError):
+        mesh.attributes["vertex_position"]["data"][0, 0] = 5.0
+    with pytest.raises(ValueError):
+        mesh.indices[0] = 1
+
+def test_attribute_dicts_are_copied():
+    first = MeshBox()
+    first.add_attribute("vertex_extra", "float", np.zeros(24, dtype=np.float32))
+    first.attributes["vertex_color"]["data"] = np.zeros((24, 3), dtype=np.float32)
+    second = MeshBox()
+    assert "vertex_extra" not in second.attributes
+    np.testing.assert_array_equal(second.attributes["vertex_color"]["data"], 1.0)
+
+# ------------------------------------------------------------
+# keys
+# ------------------------------------------------------------
+
+def test_parameters_are_keys():
+    MeshBox(1, 1, 1)
+    MeshBox(1, 1, 2)
+    MeshBox(1, 1, 1, color=[1, 0, 0])
+    MeshSphere(1.0, 8)
+    MeshSphere(1.0, 16)
+    MeshSphere(2.0, 8)
+    assert NightGeometryCache.get_stats()["entries"] == 6
+    # equal values of other types hit
+    MeshBox(1.0, 1.0, 1.0, color=(1.0, 1.0, 1.0))
+    MeshSphere(1, 8.0)
+    assert NightGeometryCache.get_stats()["entries"] == 6
+
+def test_collision_is_not_cached():
+    with_shape = MeshSphere(1.0, 8, collision=True)
+    without_shape = MeshSphere(1.0, 8, collision=False)
+    assert NightGeometryCache.get_stats()["entries"] == 1
+    assert with_shape.collision_shape_args is not None
+    assert without_shape.collision_shape_args is None
+
+# ------------------------------------------------------------
+# switches
+# ------------------------------------------------------------
+
+def test_disabled():
+    NightGeometryCache.enabled = False
+    first = MeshBox()
+    second = MeshBox()
+    assert NightGeometryCache.get_stats()["entries"] == 0
+    assert second.attributes["vertex_position"]["data"] is not first.attributes["vertex_position"]["data"]
+    first.attributes["vertex_position"]["data"][0, 0] = 5.0
+
+def test_clear():
+    first = MeshSphere(1.0, 8)
+    NightGeometryCache.clear()
+    assert NightGeometryCache.get_stats()["entries"] == 0
+    second = MeshSphere(1.0, 8)
+    assert second.attributes["vertex_position"]["data"] is not first.attributes["vertex_position"]["data"]
+    assert_same_geometry(first, second)
@@ -0,0 +1,101 @@
+# test_NightMesh.py
+
+from NightEngine.Meshes.NightMesh import NightMesh
+from NightEngine.Meshes.MeshBox import MeshBox
+from NightEngine.Meshes.MeshSphere import MeshSphere
+import numpy as np
+
+def expand(mesh, name):
+    """returns the attribute per drawn vertex, as the gpu reads it."""
+    data = np.asarray(mesh.attributes[name]["data"], dtype=np.float32).reshape(mesh.vertex_count, -1)
+    if mesh.indices is None:
+        return data
+    return data[mesh.indices]
+
+def create_soup(vertex_count, pool_size, seed=0):
+    """non indexed mesh drawing vertices picked from a small pool, so
+    many are identical."""
+    rng = np.random.default_rng(seed)
+    pool_positions = rng.normal(size=(pool_size, 3)).astype(np.float32)
+    pool_colors = rng.random(size=(pool_size, 3)).astype(np.float32)
+    picks = rng.integers(pool_size, size=vertex_count)
+    mesh = NightMesh()
+    mesh.add_attribute("vertex_position", "vec3", pool_positions[picks])
+    mesh.add_attribute("vertex_color", "vec3", pool_colors[picks])
+    mesh.vertex_count = vertex_count
+    return mesh
+
+# ------------------------------------------------------------
+# weld
+# ------------------------------------------------------------
+
+def test_weld_soup():
+    mesh = create_soup(300, 20)
+    expected = {name: expand(mesh, name) for name in mesh.attributes}
+    mesh.weld()
+
+    assert mesh.vertex_count <= 20
+    assert mesh.index_count == 300
+    assert mesh.indices.dtype == np.uint32
+    for name in mesh.attributes:
+        np.testing.assert_array_equal(expand(mesh, name), expected[name])
+    # no two vertices left alike
+    vertices = np.hstack([mesh.attributes[name]["data"] for name in mesh.attributes])
+    assert len(np.unique(vertices, axis=0)) == mesh.vertex_count
+
+def test_weld_keeps_first_occurrence_order():
+    mesh = NightMesh()
+    mesh.add_attribute("vertex_position", "vec3", [[2, 0, 0], [1, 0, 0], [2, 0, 0], [0, 0, 0], [1, 0, 0], [3, 0, 0]])
+    mesh.vertex_count = 6
+    mesh.weld()
+    np.testing.assert_array_equal(mesh.attributes["vertex_position"]["data"][:, 0], [2, 1, 0, 3])
+    np.testing.assert_array_equal(mesh.indices, [0, 1, 0, 2, 1, 3])
+
+def test_weld_only_merges_identical_vertices():
+    # the box repeats each corner on three faces, with different normals
+    mesh = MeshBox(collision=False)
+    indices = mesh.indices.copy()
+    mesh.weld()
+    assert mesh.vertex_count == 24
+    np.testing.assert_array_equal(mesh.indices, indices)
+
+def test_weld_indexed_mesh():
+    # positions only, so the corners of the box merge
+    box = MeshBox(2, 4, 6, collision=False)
+    mesh = NightMesh()
+    mesh.add_attribute("vertex_position", "vec3", box.attributes["vertex_position"]["data"])
+    mesh.vertex_count = box.vertex_count
+    mesh.set_indices(box.indices)
+    expected = expand(mesh, "vertex_position")
+    mesh.weld()
+    assert mesh.vertex_count == 8
+    assert mesh.index_count == 36
+    np.testing.assert_array_equal(expand(mesh, "vertex_position"), expected)
+
+def test_weld_sphere_seam():
+    # the sphere's seam and poles differ only in uvs
+    sphere = MeshSphere(1.0, 8, collision=False)
+    expected = expand(sphere, "vertex_position")
+    count = sphere.vertex_count
+    sphere.weld()
+    assert sphere.vertex_count == count
+    del sphere.attributes["vertex_uv"]
+    sphere.weld()
+    assert sphere.vertex_count < count
+    np.testing.assert_array_equal(expand(sphere, "vertex_position"), expected)
+
+def test_weld_keeps_bounds():
+    mesh = create_soup(60, 10, seed=1)
+    mesh._content_keys = {"layout": "content"}
+    bounds = (mesh.bounds_min.copy(), mesh.bounds_max.copy(), mesh.bounds_radius)
+    mesh.weld()
+    # new geometry for the mesh cache, same bounds
+    assert mesh._content_keys == {}
+    np.testing.assert_array_equal(mesh.bounds_min, bounds[0])
+    np.testing.assert_array_equal(mesh.bounds_max, bounds[1])
+    assert mesh.bounds_radius == bounds[2]
+
+def test_weld_without_attributes():
+    mesh = NightMesh()
+    mesh.weld()
+    assert mesh.indices is None and mesh.vertex_count == 0
@@ -0,0 +1,156 @@
+# test_NightQuaternion.py
+
+from NightEngine.NightQuaternion import NightQuaternion
+import pybullet as p
+import numpy as np
+import pytest
+
+def random_quaternions(count, seed=0):
+    rng = np.random.default_rng(seed)
+    q = rng.normal(size=(count, 4))
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+def axis_angle(axis, angle):
+    axis = np.asarray(axis, dtype=np.float64) / np.linalg.norm(axis)
+    return np.append(axis * np.sin(angle / 2), np.cos(angle / 2))
+
+def assert_same_rotation(a, b):
+    # q and -q are the same rotation
+    a, b = np.asarray(a), np.asarray(b)
+    sign = np.where(np.sum(a * b, axis=-1, keepdims=True) < 0, -1.0, 1.0)
+    np.testing.assert_allclose(a, sign * b, atol=1e-6)
+
+# ------------------------------------------------------------
+# matrices
+# ------------------------------------------------------------
+
+def test_to_matrix_matches_pybullet():
+    q = random_quaternions(200)
+    matrices = NightQuaternion.to_matrix(q)
+    expected = np.array([p.getMatrixFromQuaternion(x) for x in q]).reshape(-1, 3, 3)
+    np.testing.assert_allclose(matrices, expected, atol=1e-9)
+
+def test_to_matrix_is_a_rotation():
+    matrices = NightQuaternion.to_matrix(random_quaternions(100))
+    identity = np.broadcast_to(np.eye(3), matrices.shape)
+    np.testing.assert_allclose(matrices @ np.swapaxes(matrices, -1, -2), identity, atol=1e-9)
+    np.testing.assert_allclose(np.linalg.det(matrices), 1.0, atol=1e-9)
+
+def test_from_matrix_round_trip():
+    q = random_quaternions(200)
+    assert_same_rotation(NightQuaternion.from_matrix(NightQuaternion.to_matrix(q)), q)
+
+def test_from_matrix_single_matches_batch():
+    q = random_quaternions(50)
+    matrices = NightQuaternion.to_matrix(q)
+    single = np.array([NightQuaternion.from_matrix(m) for m in matrices])
+    np.testing.assert_allclose(single, NightQuaternion.from_matrix(matrices), atol=1e-9)
+
+def test_from_matrix_half_turns():
+    # w is 0, each branch built on a different largest component
+    q = np.array([axis_angle(axis, np.pi) for axis in ([1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0], [0, 1, -1])])
+    matrices = NightQuaternion.to_matrix(q)
+    assert_same_rotation(NightQuaternion.from_matrix(matrices), q)
+    for m, expected in zip(matrices, q):
+        assert_same_rotation(NightQuaternion.from_matrix(m), expected)
+
+def test_from_matrix_matches_scipy():
+    # scipy is no dependency, only checked against when installed
+    transform = pytest.importorskip("scipy.spatial.transform")
+    matrices = NightQuaternion.to_matrix(random_quaternions(200, seed=8))
+    expected = transform.Rotation.from_matrix(matrices).as_quat()
+    assert_same_rotation(NightQuaternion.from_matrix(matrices), expected)
+
+def test_from_matrix_reads_4x4():
+    q = random_quaternions(10)
+    matrices = np.tile(np.eye(4), (10, 1, 1))
+    matrices[:, 0:3, 0:3] = NightQuaternion.to_matrix(q)
+    matrices[:, 0:3, 3] = 5.0
+    assert_same_rotation(NightQuaternion.from_matrix(matrices), q)
+
+# ------------------------------------------------------------
+# products
+# ------------------------------------------------------------
+
+def test_multiply_composes_rotations():
+    a = random_quaternions(100, seed=1)
+    b = random_quaternions(100, seed=2)
+    np.testing.assert_allclose(NightQuaternion.to_matrix(NightQuaternion.multiply(a, b)),
+                               NightQuaternion.to_matrix(a) @ NightQuaternion.to_matrix(b), atol=1e-9)
+
+def test_multiply_matches_pybullet():
+    a = random_quaternions(20, seed=1)
+    b = random_quaternions(20, seed=2)
+    for x, y in zip(a, b):
+        _, expected = p.multiplyTransforms([0, 0, 0], x, [0, 0, 0], y)
+        assert_same_rotation(NightQuaternion.multiply(x, y), expected)
+
+def test_conjugate_inverts():
+    q = random_quaternions(50)
+    identity = NightQuaternion.get_identity(50)
+    np.testing.assert_allclose(NightQuaternion.multiply(q, NightQuaternion.conjugate(q)), identity, atol=1e-9)
+
+def test_out_is_written():
+    q = random_quaternions(8)
+    out = np.empty((8, 3, 3))
+    assert NightQuaternion.to_matrix(q, out=out) is out
+    np.testing.assert_allclose(out, NightQuaternion.to_matrix(q))
+
+# ------------------------------------------------------------
+# transforms
+# ------------------------------------------------------------
+
+def test_compose_decompose_round_trip():
+    rng = np.random.default_rng(3)
+    positions = rng.uniform(-10, 10, size=(30, 3))
+    q = random_quaternions(30)
+    scales = rng.uniform(0.5, 3, size=(30, 3))
+
+    matrices = NightQuaternion.compose(positions, q, scales)
+    assert matrices.dtype == np.float32
+    np.testing.assert_array_equal(matrices[:, 3], np.tile([0, 0, 0, 1], (30, 1)))
+
+    decomposed_positions, decomposed_q, decomposed_scales = NightQuaternion.decompose(matrices)
+    np.testing.assert_allclose(decomposed_positions, positions, atol=1e-4)
+    np.testing.assert_allclose(decomposed_scales, scales, atol=1e-4)
+    assert_same_rotation(np.asarray(decomposed_q, dtype=np.float64), q)
+
+def test_compose_into_out_clears_bottom_row():
+    out = np.full((4, 4, 4), 7.0, dtype=np.float32)
+    NightQuaternion.compose(np.zeros((4, 3)), NightQuaternion.get_identity(4), out=out)
+    np.testing.assert_array_equal(out, np.tile(np.eye(4, dtype=np.float32), (4, 1, 1)))
+
+# ------------------------------------------------------------
+# interpolation
+# ------------------------------------------------------------
+
+def test_slerp_endpoints():
+    a = random_quaternions(20, seed=4)
+    b = random_quaternions(20, seed=5)
+    assert_same_rotation(NightQuaternion.slerp(a, b, 0.0), a)
+    assert_same_rotation(NightQuaternion.slerp(a, b, 1.0), b)
+
+def test_slerp_follows_the_arc():
+    axis = [0.3, -1.0, 0.5]
+    for t in (0.1, 0.25, 0.5, 0.9):
+        result = NightQuaternion.slerp(NightQuaternion.get_identity(), axis_angle(axis, 2.0), t)
+        assert_same_rotation(result, axis_angle(axis, 2.0 * t))
+
+def test_slerp_takes_the_shortest_arc():
+    a = random_quaternions(20, seed=6)
+    b = random_quaternions(20, seed=7)
+    assert_same_rotation(NightQuaternion.slerp(a, b, 0.3), NightQuaternion.slerp(a, -b, 0.3))
+
+def test_slerp_nearly_parallel():
+    a = axis_angle([0, 1, 0], 0.5)
+    b = axis_angle([0, 1, 0], 0.5 + 1e-5)
+    result = NightQuaternion.slerp(a, b, 0.5)
+    assert np.all(np.isfinite(result))
+    assert_same_rotation(result, axis_angle([0, 1, 0], 0.5 + 0.5e-5))
+
+def test_slerp_per_pair_t():
+    a = NightQuaternion.get_identity(3)
+    b = np.array([axis_angle([0, 0, 1], 1.0)] * 3)
+    t = np.array([0.0, 0.5, 1.0])
+    expected = np.array([axis_angle([0, 0, 1], angle) for angle in (0.0, 0.5, 1.0)])
+    assert_same_rotation(NightQuaternion.slerp(a, b, t), expected)
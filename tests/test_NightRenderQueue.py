@@ -0,0 +1,107 @@
+# test_NightRenderQueue.py
+
+from NightEngine.NightRenderQueue import NightRenderQueue
+from NightEngine.Objects.NightObject import NightObject
+from types import SimpleNamespace
+import numpy as np
+
+def create_material(program, texture=None, transparent=False):
+    """stands in for a material, only the fields the queue reads."""
+    material = SimpleNamespace(program=SimpleNamespace(id=program), transparent=transparent)
+    if texture is not None:
+        material.gl_texture = texture
+    return material
+
+def create_object(material, vao, position):
+    obj = NightObject(None, material)
+    obj.vao = vao
+    obj.set_position(position)
+    return obj
+
+def get_order(queue):
+    queue.sort()
+    return [obj for _, obj, _ in queue]
+
+# ------------------------------------------------------------
+# sort keys
+# ------------------------------------------------------------
+
+def test_opaque_grouped_by_state():
+    rng = np.random.default_rng(0)
+    queue = NightRenderQueue()
+    objects = []
+    for _ in range(100):
+        material = create_material(int(rng.integers(1, 4)), int(rng.integers(0, 3)))
+        obj = create_object(material, int(rng.integers(1, 5)), rng.uniform(-20, 20, size=3).tolist())
+        objects.append(obj)
+        queue.add(obj, np.zeros(3))
+
+    order = get_order(queue)
+    assert sorted(order, key=id) == sorted(objects, key=id)
+    states = [(obj.material.program.id, obj.material.gl_texture, obj.vao) for obj in order]
+    # program, then texture, then vao
+    assert states == sorted(states)
+    # front to back within a state
+    for a, b, state_a, state_b in zip(order, order[1:], states, states[1:]):
+        if state_a == state_b:
+            assert np.linalg.norm(a.get_position()) <= np.linalg.norm(b.get_position())
+
+def test_blended_after_opaque_back_to_front():
+    rng = np.random.default_rng(1)
+    queue = NightRenderQueue()
+    for i in range(60):
+        transparent = i % 3 == 0
+        material = create_material(int(rng.integers(1, 4)), int(rng.integers(0, 3)), transparent)
+        queue.add(create_object(material, int(rng.integers(1, 5)), rng.uniform(-20, 20, size=3).tolist()), np.zeros(3))
+
+    queue.sort()
+    passes = [render_pass for render_pass, _, _ in queue]
+    assert passes == sorted(passes)
+    assert passes.count(NightRenderQueue.PASS_BLENDED) == 20
+
+    # whatever their state
+    blended = [obj for render_pass, obj, _ in queue if render_pass == NightRenderQueue.PASS_BLENDED]
+    distances = [np.linalg.norm(obj.get_position()) for obj in blended]
+    assert distances == sorted(distances, reverse=True)
+
+def test_depth_from_camera():
+    queue = NightRenderQueue()
+    material = create_material(1)
+    near = create_object(material, 1, [0, 0, 9])
+    far = create_object(material, 1, [0, 0, -5])
+    queue.add(far, np.array([0.0, 0.0, 10.0]))
+    queue.add(near, np.array([0.0, 0.0, 10.0]))
+    assert get_order(queue) == [near, far]
+
+def test_texture_defaults_to_zero():
+    queue = NightRenderQueue()
+    untextured = create_object(create_material(1), 2, [0, 0, 0])
+    textured = create_object(create_material(1, texture=1), 1, [0, 0, 0])
+    queue.add(textured, np.zeros(3))
+    queue.add(untextured, np.zeros(3))
+    assert get_order(queue) == [untextured, textured]
+
+# ------------------------------------------------------------
+# items
+# ------------------------------------------------------------
+
+def test_world_matrices():
+    queue = NightRenderQueue()
+    obj = create_object(create_material(1), 1, [1, 2, 3])
+    given = np.eye(4, dtype=np.float32)
+    given[0:3, 3] = [50, 0, 0]
+    queue.add(obj, np.zeros(3))
+    queue.add(obj, np.zeros(3), given)
+    queue.sort()
+
+    (_, _, computed), (_, _, used) = list(queue)
+    np.testing.assert_array_equal(computed, obj.get_world_matrix())
+    # the given matrix is used for the depth too, so it sorts last
+    assert used is given
+
+def test_clear():
+    queue = NightRenderQueue()
+    queue.add(create_object(create_material(1), 1, [0, 0, 0]), np.zeros(3))
+    assert len(queue) == 1
+    queue.clear()
+    assert len(queue) == 0 and list(queue) == []
@@ -0,0 +1,156 @@
+# test_NightTransformStore.py
+
+from NightEngine.NightTransformStore import NightTransformStore
+from NightEngine.NightQuaternion import NightQuaternion
+from NightEngine.Objects.NightObject import NightObject
+import numpy as np
+
+def random_transform(rng):
+    q = rng.normal(size=4)
+    return NightQuaternion.compose(rng.uniform(-5, 5, size=3), q / np.linalg.norm(q), rng.uniform(0.8, 1.2, size=3))
+
+def expected_world_matrix(obj):
+    """product of the local transforms up the parent chain."""
+    matrix = np.array(obj.transform, dtype=np.float64)
+    node = obj.parent
+    while node is not None:
+        matrix = np.array(node.transform, dtype=np.float64) @ matrix
+        node = node.parent
+    return matrix
+
+def check_world_matrices(objects):
+    for obj in objects:
+        np.testing.assert_allclose(obj.get_world_matrix(), expected_world_matrix(obj), rtol=1e-4, atol=1e-3)
+
+def is_ancestor(node, obj):
+    while obj is not None:
+        if obj is node:
+            return True
+        obj = obj.parent
+    return False
+
+# ------------------------------------------------------------
+# membership
+# ------------------------------------------------------------
+
+def test_members_are_views():
+    root = NightObject()
+    store = NightTransformStore(capacity=2)
+    store.add_tree(root)
+    objects = [NightObject() for _ in range(20)]
+    for obj in objects:
+        root.add(obj)
+    # grown past the capacity, transforms rebound to the new array
+    assert len(store.objects) >= 21
+    for obj in objects:
+        assert obj._store is store
+        assert np.shares_memory(obj.transform, store.local)
+
+def test_transform_kept_on_add_and_remove():
+    rng = np.random.default_rng(0)
+    root = NightObject()
+    store = NightTransformStore()
+    store.add_tree(root)
+    child = NightObject()
+    matrix = random_transform(rng)
+    child.transform = matrix
+    root.add(child)
+    np.testing.assert_allclose(child.transform, matrix)
+
+    root.remove(child)
+    assert child._store is None
+    assert not np.shares_memory(child.transform, store.local)
+    np.testing.assert_allclose(child.transform, matrix)
+    # the freed slot is reused
+    other = NightObject()
+    root.add(other)
+    assert other._store_index == 1
+
+def test_parent_outside_the_store():
+    rng = np.random.default_rng(1)
+    parent = NightObject()
+    child = NightObject()
+    parent.add(child)
+    child.transform = random_transform(rng)
+    store = NightTransformStore()
+    store.add(child)
+    check_world_matrices([child])
+    parent.transform = random_transform(rng)
+    check_world_matrices([child])
+
+def test_store_root_added_under_outside_parent():
+    rng = np.random.default_rng(3)
+    subtree = NightObject()
+    child = NightObject()
+    subtree.add(child)
+    child.transform = random_transform(rng)
+    store = NightTransformStore()
+    store.add_tree(subtree)
+    check_world_matrices([subtree, child])
+
+    parent = NightObject()
+    parent.transform = random_transform(rng)
+    parent.add(subtree)
+    check_world_matrices([subtree, child])
+
+# ------------------------------------------------------------
+# randomized
+# ------------------------------------------------------------
+
+def test_randomized_hierarchy():
+    rng = np.random.default_rng(2)
+    root = NightObject()
+    store = NightTransformStore(capacity=4)
+    store.add_tree(root)
+    objects = []
+    detached = []
+
+    for _ in range(400):
+        action = rng.integers(6)
+        if action == 0 or len(objects) < 5:
+            # new object under a random parent
+            obj = NightObject()
+            obj.transform = random_transform(rng)
+            parent = objects[rng.integers(len(objects))] if objects and rng.random() < 0.7 else root
+            parent.add(obj)
+            objects.append(obj)
+        elif action == 1:
+            obj = objects[rng.integers(len(objects))]
+            obj.transform = random_transform(rng)
+        elif action == 2:
+            # changed in place
+            obj = objects[rng.integers(len(objects))]
+            obj.translate(*rng.normal(size=3))
+            obj.rotate_y(rng.normal())
+        elif action == 3:
+            # moved to another parent outside its subtree
+            obj = objects[rng.integers(len(objects))]
+            parent = objects[rng.integers(len(objects))]
+            if is_ancestor(obj, parent):
+                parent = root
+            obj.parent.remove(obj)
+            parent.add(obj)
+        elif action == 4 and len(objects) > 10:
+            # subtree taken out of the scene
+            obj = objects[rng.integers(len(objects))]
+            obj.parent.remove(obj)
+            subtree = obj.get_descendants()
+            objects = [node for node in objects if node not in subtree]
+            detached.append(obj)
+            assert all(node._store is None for node in subtree)
+        elif action == 5 and detached:
+            # and put back
+            obj = detached.pop(rng.integers(len(detached)))
+            parent = objects[rng.integers(len(objects))]
+            parent.add(obj)
+            objects.extend(obj.get_descendants())
+
+        if rng.random() < 0.3:
+            check_world_matrices(objects)
+            for obj in detached:
+                check_world_matrices(obj.get_descendants())
+
+    check_world_matrices(objects)
+    assert all(obj._store is store for obj in objects)
+    members = [obj for obj in store.objects[:store.count] if obj is not None]
+    assert set(members) == set(objects) | {root}
@@ -0,0 +1,97 @@
+# test_NightVertexLayout.py
+
+from NightEngine.Meshes.NightVertexLayout import NightVertexLayout
+from NightEngine.Meshes.NightMesh import NightMesh
+from NightEngine.Meshes.MeshBox import MeshBox
+import numpy as np
+import pytest
+
+class RecordingProgram:
+    """stands in for a NightProgram, records the attribute pointers."""
+    def __init__(self):
+        self.pointers = []
+
+    def set_attribute_pointer(self, buffer, variable_name, data_type, stride, offset):
+        self.pointers.append((buffer, variable_name, data_type, stride, offset))
+
+def create_mesh(count=5, seed=0):
+    rng = np.random.default_rng(seed)
+    mesh = NightMesh()
+    mesh.add_attribute("vertex_position", "vec3", rng.normal(size=(count, 3)).astype(np.float32))
+    mesh.add_attribute("vertex_uv", "vec2", rng.normal(size=(count, 2)).astype(np.float32))
+    mesh.add_attribute("vertex_weight", "float", rng.normal(size=count).astype(np.float32))
+    mesh.vertex_count = count
+    return mesh
+
+# ------------------------------------------------------------
+# layout
+# ------------------------------------------------------------
+
+def test_offsets_and_stride():
+    layout = NightVertexLayout([("a", "vec3"), ("b", "vec2"), ("c", "float"), ("d", "vec4")])
+    assert layout.attributes == [("a", "vec3", 0), ("b", "vec2", 12), ("c", "float", 20), ("d", "vec4", 24)]
+    assert layout.stride == 40
+
+def test_stride_alignment():
+    attributes = [("a", "vec3"), ("b", "vec2")]
+    assert NightVertexLayout(attributes).stride == 20
+    assert NightVertexLayout(attributes, alignment=16).stride == 32
+    assert NightVertexLayout([("a", "vec4")], alignment=16).stride == 16
+
+def test_key():
+    attributes = [("a", "vec3"), ("b", "vec2")]
+    assert NightVertexLayout(attributes).key == NightVertexLayout(list(attributes)).key
+    assert NightVertexLayout(attributes).key != NightVertexLayout(attributes, alignment=16).key
+    assert NightVertexLayout(attributes).key != NightVertexLayout(attributes[::-1]).key
+    hash(NightVertexLayout(attributes).key)
+
+def test_wrong_type_raises():
+    with pytest.raises(Exception):
+        NightVertexLayout([("a", "mat4")])
+
+def test_apply():
+    layout = NightVertexLayout([("a", "vec3"), ("b", "vec2")], alignment=8)
+    program = RecordingProgram()
+    layout.apply(program, 7)
+    assert program.pointers == [(7, "a", "vec3", 24, 0), (7, "b", "vec2", 24, 12)]
+
+# ------------------------------------------------------------
+# mesh
+# ------------------------------------------------------------
+
+def test_mesh_layout_keeps_attribute_order():
+    mesh = create_mesh()
+    assert [name for name, _, _ in mesh.get_vertex_layout().attributes] == ["vertex_position", "vertex_uv", "vertex_weight"]
+    # only the requested attributes, still in mesh order
+    layout = mesh.get_vertex_layout(["vertex_weight", "vertex_position"])
+    assert layout.attributes == [("vertex_position", "vec3", 0), ("vertex_weight", "float", 12)]
+    assert layout.stride == 16
+
+def test_interleaved_columns():
+    mesh = create_mesh()
+    mesh.vertex_alignment = 16
+    layout = mesh.get_vertex_layout()
+    data = mesh.get_interleaved(layout)
+    assert data.dtype == np.float32
+    assert data.shape == (mesh.vertex_count, layout.stride // 4)
+    np.testing.assert_array_equal(data[:, 0:3], mesh.attributes["vertex_position"]["data"])
+    np.testing.assert_array_equal(data[:, 3:5], mesh.attributes["vertex_uv"]["data"])
+    np.testing.assert_array_equal(data[:, 5], mesh.attributes["vertex_weight"]["data"])
+    # padding up to the aligned stride
+    np.testing.assert_array_equal(data[:, 6:], 0.0)
+
+def test_interleaved_from_lists():
+    mesh = NightMesh()
+    mesh.add_attribute("vertex_position", "vec3", [[0, 1, 2], [3, 4, 5]])
+    mesh.add_attribute("vertex_color", "vec3", [0.5] * 6)
+    mesh.vertex_count = 2
+    data = mesh.get_interleaved(mesh.get_vertex_layout())
+    np.testing.assert_array_equal(data, [[0, 1, 2, 0.5, 0.5, 0.5], [3, 4, 5, 0.5, 0.5, 0.5]])
+
+def test_interleaved_box():
+    mesh = MeshBox(2, 3, 4, collision=False)
+    layout = mesh.get_vertex_layout(["vertex_position", "vertex_normal"])
+    data = mesh.get_interleaved(layout)
+    assert data.shape == (24, 6)
+    np.testing.assert_array_equal(np.abs(data[:, 0:3]).max(axis=0), [1.0, 1.5, 2.0])
+    np.testing.assert_allclose(np.linalg.norm(data[:, 3:6], axis=1), 1.0)
@@ -0,0 +1,92 @@
+# test_ObjectLOD.py
+
+from NightEngine.Objects.ObjectLOD import ObjectLOD
+from NightEngine.Meshes.MeshSphere import MeshSphere
+import numpy as np
+import pytest
+
+SEGMENTS = (32, 16, 8, 4)
+
+def get_sphere_error(segments):
+    """largest distance of a quad center of a unit MeshSphere from the
+    true surface."""
+    mesh = MeshSphere(1.0, segments, collision=False)
+    grid = np.asarray(mesh.attributes["vertex_position"]["data"]).reshape(segments + 1, segments + 1, 3)
+    centers = (grid[:-1, :-1] + grid[1:, :-1] + grid[:-1, 1:] + grid[1:, 1:]) / 4
+    return 1.0 - float(np.linalg.norm(centers, axis=-1).min())
+
+def get_pixel_error(segments, screen_size):
+    return screen_size / 2 * (1.0 - np.cos(np.pi / segments) * np.cos(np.pi / (2 * segments)))
+
+# ------------------------------------------------------------
+# thresholds
+# ------------------------------------------------------------
+
+def test_error_bounds_the_mesh():
+    # the error the thresholds are derived from is an upper bound,
+    # and close to the measured one
+    for segments in (8, 16, 32, 64):
+        measured = get_sphere_error(segments)
+        bound = 1.0 - np.cos(np.pi / segments) * np.cos(np.pi / (2 * segments))
+        assert measured <= bound + 1e-6
+        assert measured > 0.9 * bound
+
+def test_thresholds_shape():
+    thresholds = ObjectLOD.get_sphere_thresholds(SEGMENTS)
+    assert len(thresholds) == len(SEGMENTS) - 1
+    assert all(isinstance(threshold, float) for threshold in thresholds)
+    assert thresholds == sorted(thresholds, reverse=True)
+
+def test_thresholds_hold_max_error():
+    hysteresis = 0.15
+    for max_error in (0.25, 0.5, 2.0):
+        thresholds = ObjectLOD.get_sphere_thresholds(SEGMENTS, hysteresis, max_error)
+        for threshold, segments in zip(thresholds, SEGMENTS[1:]):
+            # the coarse level is kept up to threshold * (1 + hysteresis)
+            assert get_pixel_error(segments, threshold * (1 + hysteresis)) == pytest.approx(max_error)
+
+def test_thresholds_scale():
+    a = ObjectLOD.get_sphere_thresholds(SEGMENTS, 0.0, 0.5)
+    b = ObjectLOD.get_sphere_thresholds(SEGMENTS, 0.0, 1.0)
+    c = ObjectLOD.get_sphere_thresholds(SEGMENTS, 0.25, 1.0)
+    np.testing.assert_allclose(b, 2 * np.array(a))
+    np.testing.assert_allclose(c, np.array(b) / 1.25)
+
+def test_from_sphere_thresholds():
+    lod = ObjectLOD.from_sphere(None, 2.0, segments=SEGMENTS, hysteresis=0.2)
+    assert lod.get_level_count() == len(SEGMENTS)
+    assert lod.thresholds == ObjectLOD.get_sphere_thresholds(SEGMENTS, 0.2)
+    # only the finest level has a collision shape
+    assert lod.levels[0][0].collision_shape_args is not None
+    assert all(mesh.collision_shape_args is None for mesh, _, _ in lod.levels[1:])
+    lod = ObjectLOD.from_sphere(None, 2.0, segments=SEGMENTS, thresholds=[300, 200, 100])
+    assert lod.thresholds == [300, 200, 100]
+
+# ------------------------------------------------------------
+# selection
+# ------------------------------------------------------------
+
+def test_selected_levels_stay_below_max_error():
+    lod = ObjectLOD.from_sphere(None, 1.0, segments=SEGMENTS)
+    sizes = np.concatenate([np.geomspace(1, 3000, 400), np.geomspace(3000, 1, 400)])
+    for size in sizes:
+        lod.set_level(lod.select_level(size))
+        if lod.level > 0:
+            assert get_pixel_error(SEGMENTS[lod.level], size) <= 0.5 + 1e-9
+
+def test_selection_hysteresis():
+    lod = ObjectLOD.from_sphere(None, 1.0, segments=SEGMENTS)
+    threshold = lod.thresholds[0]
+    # near the threshold the current level is kept
+    lod.set_level(0)
+    assert lod.select_level(threshold * 0.95) == 0
+    assert lod.select_level(threshold * (1 - lod.hysteresis) * 0.99) == 1
+    lod.set_level(1)
+    assert lod.select_level(threshold * 1.05) == 1
+    assert lod.select_level(threshold * (1 + lod.hysteresis) * 1.01) == 0
+
+def test_selection_jumps_levels():
+    lod = ObjectLOD.from_sphere(None, 1.0, segments=SEGMENTS)
+    assert lod.select_level(0.5) == len(SEGMENTS) - 1
+    lod.set_level(len(SEGMENTS) - 1)
+    assert lod.select_level(1e5) == 0